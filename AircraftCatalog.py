@@ -1,4 +1,6 @@
 from Aircraft import Aircraft
+from reference_snapshot import get_snapshot_filename, load_or_compile_snapshot
+from array import array
 import csv
 
 class AircraftCatalog:
@@ -14,8 +16,11 @@ class AircraftCatalog:
     Column 5: Range (in km or miles).
     """
 
-    def __init__(self, csvFile='aircraft_code.csv'):
-        self.__dictionary = self.__build_aircraft_dict(csvFile)
+    def __init__(self, csvFile='aircraft_code.csv', use_snapshot=False):
+        if use_snapshot:
+            self.__dictionary = self.__load_aircraft_dict(csvFile)
+        else:
+            self.__dictionary = self.__build_aircraft_dict(csvFile)
 
     def __build_aircraft_dict(self, csvFile):
         """
@@ -29,6 +34,34 @@ class AircraftCatalog:
                     dictionary[row[0]] = Aircraft(row[0].upper(), row[1], row[3], row[2], row[4])
         return dictionary
 
+    def __load_aircraft_dict(self, csvFile):
+        """
+        Builds the dictionary from a binary snapshot of the csv file (see reference_snapshot), which is
+        rebuilt whenever the csv file changes.
+        """
+        strings, arrays = load_or_compile_snapshot(get_snapshot_filename(csvFile), [csvFile],
+                                                   lambda: self.__compile_snapshot(csvFile))
+        return {code: Aircraft(code.upper(), type, manufacturer, units, arrays["ranges"][i])
+                for i, (code, type, manufacturer, units) in enumerate(zip(strings["codes"], strings["types"],
+                                                                          strings["manufacturers"],
+                                                                          strings["units"]))}
+
+    def __compile_snapshot(self, csvFile):
+        rows = {}
+        with open(csvFile, 'rt', encoding="utf8") as f:
+            for row in csv.reader(f):
+                if str(row[0]) != "code":
+                    rows[row[0]] = row
+        strings = {"codes": list(rows),
+                   "types": [row[1] for row in rows.values()],
+                   "manufacturers": [row[3] for row in rows.values()],
+                   "units": [row[2] for row in rows.values()]}
+        return strings, {"ranges": array('d', [float(row[4]) for row in rows.values()])}
+
+    def get_aircraft_codes(self):
+        """ Returns the codes of every aircraft in the catalog, in the order of the csv file. """
+        return list(self.__dictionary)
+
     def get_aircraft_range(self, aircraft_code):
         aircraft = self.__dictionary[aircraft_code]
         return aircraft.get_aircraft_range()
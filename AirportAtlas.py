@@ -1,7 +1,12 @@
 from Airport import Airport
+from DistanceMatrix import DistanceMatrix
+from AirportColumns import AirportColumns
 from math import sin, cos, acos, pi
+from array import array
+from collections import OrderedDict
 import csv
 EARTH_RADIUS = 6371
+DISTANCE_MATRIX_CACHE_SIZE = 256                      # the number of recently used distance matrices kept
 
 
 class AirportAtlas:
@@ -17,10 +22,28 @@ class AirportAtlas:
     Column 5: IATA code.
     Column 6: Latitude.
     Column 7: Longitude.
+
+    If use_snapshot is True, the airports are loaded from a binary snapshot of the csv file
+    (see reference_snapshot), which is rebuilt whenever the csv file changes.
+
+    If columnar is True, the airports are not stored as Airport objects but in an AirportColumns object,
+    whose arrays are memory-mapped from the snapshot and shared with any other process that loads it.
+
+    The distance matrices for the most recently used sets of airports are kept, so that an atlas which
+    is used for many itineraries (see SolverSession) doesn't calculate the same distances again.
     """
 
-    def __init__(self, csv_file="input files/airport.csv"):
-        self.__dictionary = self.__build_airport_dict(csv_file)
+    def __init__(self, csv_file="input files/airport.csv", use_snapshot=False, columnar=False):
+        if columnar:
+            self.__dictionary = None
+            self.__columns = AirportColumns(csv_file)
+        elif use_snapshot:
+            self.__dictionary = self.__load_airport_dict(csv_file)
+            self.__columns = None
+        else:
+            self.__dictionary = self.__build_airport_dict(csv_file)
+            self.__columns = None
+        self.__distance_matrices = OrderedDict()
 
     def __build_airport_dict(self, csv_file):
         dictionary = {}
@@ -31,15 +54,35 @@ class AirportAtlas:
                 dictionary[key] = Airport(key, row[1], row[3], row[5], row[6])
         return dictionary
 
+    def __load_airport_dict(self, csv_file):
+        strings, arrays = AirportColumns.load_snapshot(csv_file)
+        countries = strings["countries"]
+        country_ids = arrays["country_ids"]
+        latitudes = arrays["latitudes"]
+        longitudes = arrays["longitudes"]
+        return {code: Airport(code, name, countries[country_ids[i]], latitudes[i], longitudes[i])
+                for i, (code, name) in enumerate(zip(strings["codes"], strings["names"]))}
+
     def is_in_airport_dictionary(self, airport_code):
-        if airport_code in self.__dictionary:
+        if airport_code in self.__get_airports():
             return True
         else:
             return False
 
     def get_country(self, code):
+        if self.__columns is not None:
+            return self.__columns.get_country(code)
         return self.__dictionary[code].get_country()
 
+    def __get_coordinates(self, code):
+        if self.__columns is not None:
+            return self.__columns.get_coordinates(code)
+        return self.__dictionary[code].get_coordinates()
+
+    def __get_airports(self):
+        """ Returns the dictionary of Airport objects or the AirportColumns, whichever is in use. """
+        return self.__dictionary if self.__columns is None else self.__columns
+
     @staticmethod
     def great_circle_dist(lat1, long1, lat2, long2):
         """
@@ -63,12 +106,75 @@ class AirportAtlas:
         Inputs: two IATA airport codes (strings).
         Output: the distance in kilometers (float).
         """
-        lat1, long1 = self.__dictionary[code1].get_coordinates()
-        lat2, long2 = self.__dictionary[code2].get_coordinates()
+        lat1, long1 = self.__get_coordinates(code1)
+        lat2, long2 = self.__get_coordinates(code2)
         return self.great_circle_dist(lat1, long1, lat2, long2)
 
+    @staticmethod
+    def great_circle_dist_matrix(latitudes, longitudes):
+        """
+        Calculates the great circle distance between every pair of locations in a single pass.
+
+        The sine and cosine of each location's phi are calculated once per location rather than once
+        per pair, and each distance is calculated once and mirrored, so an n-airport matrix needs
+        n * (n - 1) / 2 cos/acos evaluations.  Each distance is calculated with exactly the same
+        arithmetic as great_circle_dist(), so the results are identical.
+
+        Inputs: two equal-length sequences of latitude and longitude coordinates (floats).
+        Output: a list of rows (arrays of floats), where rows[i][j] is the distance in kilometers
+        between location i and location j.
+        """
+        phis = [(90 - lat) * 2 * pi / 360 for lat in latitudes]
+        thetas = [long * 2 * pi / 360 for long in longitudes]
+        sin_phis = [sin(phi) for phi in phis]
+        cos_phis = [cos(phi) for phi in phis]
+        size = len(phis)
+        rows = [array('d', bytes(8 * size)) for _ in range(size)]         # the diagonal is left at zero
+        for i in range(size):
+            row = rows[i]
+            for j in range(i + 1, size):
+                distance = float(EARTH_RADIUS * acos((sin_phis[i] * sin_phis[j] * cos(thetas[i] - thetas[j]))
+                                                     + cos_phis[i] * cos_phis[j]))
+                row[j] = distance
+                rows[j][i] = distance
+        return rows
+
+    def get_distance_matrix(self, airport_codes):
+        """
+        Returns a DistanceMatrix holding the distance between every pair of airports in a list.
+
+        Input: a list of IATA airport codes (strings).  Duplicate codes are ignored.
+        Output: a DistanceMatrix, in which each airport's id is its position in the list.
+        The DistanceMatrix is shared with anyone else who asks for the same list, so it must not be changed.
+        """
+        unique_codes = []
+        for code in airport_codes:
+            if code not in unique_codes:
+                unique_codes.append(code)
+        key = tuple(unique_codes)
+        if key in self.__distance_matrices:
+            self.__distance_matrices.move_to_end(key)
+            return self.__distance_matrices[key]
+        distance_matrix = self.__calculate_distance_matrix(unique_codes)
+        self.__distance_matrices[key] = distance_matrix
+        if len(self.__distance_matrices) > DISTANCE_MATRIX_CACHE_SIZE:
+            self.__distance_matrices.popitem(last=False)
+        return distance_matrix
+
+    def __calculate_distance_matrix(self, unique_codes):
+        coordinates = [self.__get_coordinates(code) for code in unique_codes]
+        latitudes = [lat for lat, long in coordinates]
+        longitudes = [long for lat, long in coordinates]
+        return DistanceMatrix(unique_codes, self.great_circle_dist_matrix(latitudes, longitudes))
+
+    def __getstate__(self):
+        # the cached distance matrices aren't sent to other processes
+        state = self.__dict__.copy()
+        state["_AirportAtlas__distance_matrices"] = OrderedDict()
+        return state
+
     def __str__(self):
-        string = "This atlas contains " + str(len(self.__dictionary)) + " airports"
+        string = "This atlas contains " + str(len(self.__get_airports())) + " airports"
         return string
 
     # @staticmethod
@@ -0,0 +1,82 @@
+from reference_snapshot import get_snapshot_filename, load_or_compile_snapshot
+from array import array
+import csv
+
+
+class AirportColumns:
+    """
+    AirportColumns: stores airports column by column rather than as one Airport object per airport.
+
+    The latitudes, longitudes and country ids are contiguous arrays in the memory-mapped snapshot of the
+    airport csv file (see reference_snapshot), so every process that loads the same snapshot shares one
+    copy of them.  Each country name is stored once, and each airport holds the index of its country.
+    The only per-airport Python objects are the codes and the dictionary from code to index.
+
+    When an AirportColumns object is sent to another process, only the file name is sent, and the
+    other process maps the same snapshot.
+
+    Input: the airport csv file (see AirportAtlas).
+    """
+
+    def __init__(self, csv_file):
+        self.__csv_file = csv_file
+        self.__load()
+
+    @staticmethod
+    def load_snapshot(csv_file):
+        """ Returns the strings and arrays in the snapshot of the csv file, compiling it if necessary. """
+        return load_or_compile_snapshot(get_snapshot_filename(csv_file), [csv_file],
+                                        lambda: AirportColumns.compile_snapshot(csv_file))
+
+    @staticmethod
+    def compile_snapshot(csv_file):
+        """
+        Reads the csv file and returns the strings and arrays for its snapshot: the airport codes and names,
+        the list of countries, each airport's index in the list of countries, and the coordinates.
+        """
+        rows = {}
+        with open(csv_file, 'rt', encoding="utf8") as f:
+            for row in csv.reader(f):
+                rows[row[4]] = row                    # as in AirportAtlas, the last row for a code is used
+        countries = []
+        country_index = {}
+        country_ids = array('i')
+        for row in rows.values():
+            if row[3] not in country_index:
+                country_index[row[3]] = len(countries)
+                countries.append(row[3])
+            country_ids.append(country_index[row[3]])
+        strings = {"codes": list(rows), "names": [row[1] for row in rows.values()], "countries": countries}
+        arrays = {"country_ids": country_ids,
+                  "latitudes": array('d', [float(row[6]) for row in rows.values()]),
+                  "longitudes": array('d', [float(row[7]) for row in rows.values()])}
+        return strings, arrays
+
+    def __load(self):
+        strings, arrays = self.load_snapshot(self.__csv_file)
+        self.__index = {code: i for i, code in enumerate(strings["codes"])}
+        self.__countries = strings["countries"]
+        self.__country_ids = arrays["country_ids"]
+        self.__latitudes = arrays["latitudes"]
+        self.__longitudes = arrays["longitudes"]
+
+    def __len__(self):
+        return len(self.__index)
+
+    def __contains__(self, code):
+        return code in self.__index
+
+    def get_country(self, code):
+        return self.__countries[self.__country_ids[self.__index[code]]]
+
+    def get_coordinates(self, code):
+        """ Returns the airport's latitude and longitude. """
+        i = self.__index[code]
+        return self.__latitudes[i], self.__longitudes[i]
+
+    def __getstate__(self):
+        return self.__csv_file
+
+    def __setstate__(self, state):
+        self.__csv_file = state
+        self.__load()
@@ -0,0 +1,83 @@
+import numpy
+
+
+class BatchRouteEvaluator:
+    """
+    BatchRouteEvaluator: prices many candidate routes for an itinerary at once with NumPy.
+
+    A batch is a 2-D array of airport ids (from an ItinerarySearchSpace) in which each row is a route and
+    every route has the same number of stops.  Leg distances and fuel prices for the whole batch are
+    gathered from precomputed arrays, routes with a leg beyond the aircraft's range are masked out, and the
+    fuel costs are calculated for every route together.
+
+    The refuelling plan in Route buys each kilometer of fuel at the cheapest airport whose spare capacity
+    can still be used, i.e. at the cheapest airport visited within the last tankful.  The cost of each leg
+    is therefore the sum, over the stretches between the points where earlier airports drop out of range,
+    of the stretch length times the lowest price among the airports still in range.  Fuel brought home is
+    valued in the same way over the tankful after the flight home.  The costs are the same as Route's,
+    apart from rounding.
+
+    NumPy is only needed for this class; the rest of the program does not use it.
+    """
+
+    def __init__(self, search_space):
+        self.fuel_prices = numpy.array(search_space.fuel_prices, dtype=float)
+        self.distances = numpy.array([list(row) for row in search_space.distances], dtype=float)
+        self.fuel_capacity = float(search_space.fuel_capacity)
+        self.empty_tank = search_space.empty_tank
+        self.stopover_cost = search_space.stopover_cost
+        self.itinerary_size = search_space.itinerary_size
+
+    def get_costs_of_routes(self, routes):
+        """
+        Returns an array of the net cost of each route in a batch (a 2-D array of airport ids).
+        Routes that cannot be completed cost infinity.
+        """
+        routes = numpy.asarray(routes, dtype=numpy.intp)
+        number_of_routes, number_of_stops = routes.shape
+        legs = self.distances[routes, numpy.roll(routes, -1, axis=1)]
+        fuel_prices = self.fuel_prices[routes]
+        is_possible = (legs <= self.fuel_capacity).all(axis=1)
+
+        # the distance from home at which each airport is reached, and at which it drops out of range
+        positions = numpy.zeros_like(legs)
+        numpy.cumsum(legs[:, :-1], axis=1, out=positions[:, 1:])
+        out_of_range = positions + self.fuel_capacity
+        previous_out_of_range = numpy.concatenate((numpy.full((number_of_routes, 1), -numpy.inf),
+                                                   out_of_range[:, :-1]), axis=1)
+
+        total_cost = numpy.zeros(number_of_routes)
+        for stop in range(number_of_stops):
+            # fuel for this leg bought while airport k is the earliest in range costs min(fuel_prices[k:stop + 1])
+            start = numpy.maximum(positions[:, stop:stop + 1], previous_out_of_range[:, :stop + 1])
+            end = numpy.minimum(positions[:, stop:stop + 1] + legs[:, stop:stop + 1], out_of_range[:, :stop + 1])
+            total_cost += (numpy.clip(end - start, 0, None) * self.__get_lowest_prices(fuel_prices, stop)).sum(axis=1)
+
+        total_cost_of_stopovers = self.stopover_cost * (number_of_stops - self.itinerary_size)
+        if self.empty_tank:
+            net_cost = total_cost + total_cost_of_stopovers + total_cost_of_stopovers
+        else:
+            # fuel bought after arriving home is worth the home fuel price
+            end_of_route = (positions[:, -1] + legs[:, -1])[:, numpy.newaxis]
+            start = numpy.maximum(end_of_route, previous_out_of_range)
+            saving = numpy.minimum(self.__get_lowest_prices(fuel_prices, number_of_stops - 1)
+                                   - fuel_prices[:, :1], 0)
+            net_cost = total_cost + (numpy.clip(out_of_range - start, 0, None) * saving).sum(axis=1) \
+                + total_cost_of_stopovers
+        return numpy.where(is_possible, net_cost, numpy.inf)
+
+    def get_cheapest_route(self, routes):
+        """
+        Returns the index of the cheapest route in a batch and its net cost.
+        Returns None, None if none of the routes can be completed.
+        """
+        costs = self.get_costs_of_routes(routes)
+        cheapest = int(numpy.argmin(costs))
+        if costs[cheapest] == numpy.inf:
+            return None, None
+        return cheapest, float(costs[cheapest])
+
+    @staticmethod
+    def __get_lowest_prices(fuel_prices, stop):
+        """ Returns, for each k up to stop, the lowest fuel price from airport k to airport stop of each route. """
+        return numpy.minimum.accumulate(fuel_prices[:, stop::-1], axis=1)[:, ::-1]
@@ -0,0 +1,186 @@
+from fuel_window import add_airport, buy_fuel_for_leg, get_lowest_possible_cost
+
+worker_solver = None                                  # the solver used for every shard in a worker process
+
+
+class BranchAndBoundSolver:
+    """
+    BranchAndBoundSolver: finds the cheapest route for an itinerary by extending routes one leg at a time
+    and abandoning any partial route that cannot beat the cheapest complete route found so far.
+
+    The bound for a partial route is its cost so far plus a lower bound on the cost of the rest of the
+    route: the shortest distance still to be flown (see ItinerarySearchSpace) bought at the lowest price
+    available from the current window or from any airport that may still be visited, less the most that
+    fuel brought home could be worth, plus the cost of any extra stopover already made.
+    Because the bound never overestimates, the solver finds a route that is exactly as cheap as the
+    cheapest route found by listing every route.
+
+    The solver counts the partial routes it expands and prunes and the complete routes it prices, so
+    that the effect of the pruning can be reported.
+
+    The search can also be split into shards, each starting with a different first stop (or first two
+    stops) after home, which are searched in separate processes by solve_in_parallel().  The processes
+    share the cost of the cheapest route found so far, so that each can prune with the others' routes.
+
+    Input: an ItinerarySearchSpace, and optionally a shared value (a multiprocessing.Value) holding the
+    lowest cost found by any process.
+    """
+
+    def __init__(self, search_space, shared_lowest_cost=None):
+        self.search_space = search_space
+        self.shared_lowest_cost = shared_lowest_cost
+        self.nodes_expanded = 0
+        self.nodes_pruned = 0
+        self.routes_priced = 0
+        self.__best_route = None
+        self.__lowest_cost = None
+
+    def solve(self):
+        """
+        Returns the cheapest route (a list of airport ids) and its net cost.
+        Returns None, None if the itinerary cannot be completed.
+        """
+        self.__extend(*self.__get_home_node())
+        return self.__best_route, self.__lowest_cost
+
+    def solve_shard(self, shard):
+        """
+        Returns the cheapest route that starts with a shard's partial route and its net cost (or None, None).
+        If a shared lowest cost is given, routes that cost more than it may not be found.
+        """
+        self.__best_route, self.__lowest_cost = None, None
+        route, visited, extra_stop_made, flags, cost, window = shard
+        self.__extend(route[:], visited, extra_stop_made, flags, cost, window)
+        return self.__best_route, self.__lowest_cost
+
+    def get_shards(self, workers):
+        """
+        Returns partial routes which together cover the search, in the order in which solve() searches them.
+        There is a shard for each possible first stop after home, or for each possible first two stops if
+        that would give fewer than two shards per worker.  Each shard is a tuple of (route, visited airports,
+        extra stop made, constraint flags, cost so far, window).
+        """
+        shards = self.__get_children(self.__get_home_node())
+        if len(shards) < 2 * workers and self.search_space.itinerary_size > 2:
+            # with more than two airports in the itinerary, no route can finish after just one stop
+            shards = [child for shard in shards for child in self.__get_children(shard)]
+        return shards
+
+    def solve_in_parallel(self, workers):
+        """
+        Searches the shards in a pool of worker processes and returns the cheapest route and its net cost.
+        The processes only prune routes that cost more than the cheapest route found so far, and ties are
+        resolved in favour of the earliest shard, so the result is the same as solve()'s however the work is
+        shared out.  The statistics from every shard are added together.
+        """
+        from concurrent.futures import ProcessPoolExecutor          # only imported when it is needed
+        import multiprocessing
+        shards = self.get_shards(workers)
+        shared_lowest_cost = multiprocessing.Value('d', float("inf"))
+        with ProcessPoolExecutor(max_workers=workers, initializer=start_worker,
+                                 initargs=(self.search_space, shared_lowest_cost)) as executor:
+            results = list(executor.map(solve_shard, shards))
+        self.__best_route, self.__lowest_cost = None, None
+        for route, cost, statistics in results:
+            self.nodes_expanded += statistics["nodes expanded"]
+            self.nodes_pruned += statistics["nodes pruned"]
+            self.routes_priced += statistics["routes priced"]
+            if cost is not None and (self.__lowest_cost is None or cost < self.__lowest_cost):
+                self.__best_route, self.__lowest_cost = route, cost
+        return self.__best_route, self.__lowest_cost
+
+    def get_statistics(self):
+        return {"nodes expanded": self.nodes_expanded,
+                "nodes pruned": self.nodes_pruned,
+                "routes priced": self.routes_priced}
+
+    def __get_home_node(self):
+        space = self.search_space
+        home_window = add_airport((), space.fuel_prices[0], space.fuel_capacity)
+        return [0], 1, False, space.get_constraint_flags(0, 0, 0), 0, home_window
+
+    def __get_children(self, node):
+        """ Returns the partial routes one stop longer than a partial route, nearest first. """
+        space = self.search_space
+        route, visited, extra_stop_made, flags, cost, window = node
+        airport = route[-1]
+        children = []
+        for next_airport, is_extra_stop in sorted(space.get_next_stops(airport, visited, extra_stop_made),
+                                                  key=lambda next_stop: space.distances[airport][next_stop[0]]):
+            leg_cost, next_window = buy_fuel_for_leg(window, space.distances[airport][next_airport])
+            children.append((route + [next_airport],
+                             visited | (1 << next_airport) if next_airport < space.itinerary_size else visited,
+                             extra_stop_made or is_extra_stop,
+                             space.get_constraint_flags(next_airport, visited, flags),
+                             cost + leg_cost,
+                             add_airport(next_window, space.fuel_prices[next_airport], space.fuel_capacity)))
+        return children
+
+    def __extend(self, route, visited, extra_stop_made, flags, cost, window):
+        space = self.search_space
+        airport = route[-1]
+        self.nodes_expanded += 1
+        if space.can_return_home(airport, visited, flags):
+            self.__price_complete_route(route, extra_stop_made, cost, window)
+
+        # try the nearest airports first, so that a cheap route is found early
+        next_stops = sorted(space.get_next_stops(airport, visited, extra_stop_made),
+                            key=lambda next_stop: space.distances[airport][next_stop[0]])
+        for next_airport, is_extra_stop in next_stops:
+            leg_cost, next_window = buy_fuel_for_leg(window, space.distances[airport][next_airport])
+            next_window = add_airport(next_window, space.fuel_prices[next_airport], space.fuel_capacity)
+            next_visited = visited | (1 << next_airport) if next_airport < space.itinerary_size else visited
+            next_extra_stop_made = extra_stop_made or is_extra_stop
+            next_cost = cost + leg_cost
+            if self.__can_be_pruned(self.__get_lower_bound(next_visited, next_extra_stop_made, next_cost,
+                                                           next_window)):
+                self.nodes_pruned += 1
+                continue
+            route.append(next_airport)
+            self.__extend(route, next_visited, next_extra_stop_made,
+                          space.get_constraint_flags(next_airport, visited, flags), next_cost, next_window)
+            route.pop()
+
+    def __can_be_pruned(self, lower_bound):
+        if self.__lowest_cost is not None and lower_bound >= self.__lowest_cost:
+            return True
+        # a route found by another process only prunes routes that are dearer, so that an equally cheap
+        # route in an earlier shard is still found; the value is read without taking the lock
+        return self.shared_lowest_cost is not None and lower_bound > self.shared_lowest_cost.get_obj().value
+
+    def __get_lower_bound(self, visited, extra_stop_made, cost, window):
+        space = self.search_space
+        total_cost_of_stopovers = space.get_total_cost_of_stopovers(extra_stop_made)
+        if space.empty_tank:
+            total_cost_of_stopovers *= 2                         # as in Route.calculate_cheapest_place_to_refuel()
+        return cost + total_cost_of_stopovers + \
+            get_lowest_possible_cost(window,
+                                     space.get_shortest_remaining_distance(visited),
+                                     space.get_lowest_remaining_fuel_price(visited, extra_stop_made),
+                                     space.home_fuel_price,
+                                     space.fuel_capacity,
+                                     space.empty_tank)
+
+    def __price_complete_route(self, route, extra_stop_made, cost, window):
+        self.routes_priced += 1
+        net_cost = self.search_space.get_net_cost_of_route(route[-1], extra_stop_made, cost, window)
+        if self.__lowest_cost is None or net_cost < self.__lowest_cost:
+            self.__best_route, self.__lowest_cost = route[:], net_cost
+            if self.shared_lowest_cost is not None:
+                with self.shared_lowest_cost.get_lock():
+                    if net_cost < self.shared_lowest_cost.value:
+                        self.shared_lowest_cost.value = net_cost
+
+
+def start_worker(search_space, shared_lowest_cost):
+    """ Creates the solver used by a worker process. """
+    global worker_solver
+    worker_solver = BranchAndBoundSolver(search_space, shared_lowest_cost)
+
+
+def solve_shard(shard):
+    """ Searches one shard in a worker process and returns the route, its cost and the statistics. """
+    before = worker_solver.get_statistics()
+    route, cost = worker_solver.solve_shard(shard)
+    statistics = {key: value - before[key] for key, value in worker_solver.get_statistics().items()}
+    return route, cost, statistics
@@ -0,0 +1,86 @@
+from RouteKernel import RouteKernel
+from array import array
+
+MAX_CANDIDATE_ROUTES = 500000                         # the most routes kept for one itinerary
+
+
+class TooManyCandidateRoutesError(Exception):
+    pass
+
+
+class CandidateRoutes:
+    """
+    CandidateRoutes: every route that an aircraft can fly for an itinerary, with its net cost, kept after the
+    itinerary has been solved so that the cheapest route can be found again quickly when exchange rates change.
+
+    The routes are lists of airport ids from an ItinerarySearchSpace, stored one after another in a single array
+    (with another array of where each route starts), and their costs are stored in an array of floats.  The cost of
+    a route only depends on the fuel prices at the airports on it, so when some prices change, only the routes
+    through those airports are priced again (with RouteKernel).  Every route visits every airport in the itinerary,
+    so a change at one of those airports means pricing every route again; for each hub, the routes that stop there
+    are listed, so a change at a hub only means pricing the routes through that hub.
+
+    Raises TooManyCandidateRoutesError if there are more than max_routes routes.
+    """
+
+    def __init__(self, search_space, routes, max_routes=MAX_CANDIDATE_ROUTES):
+        self.__search_space = search_space
+        self.__kernel = RouteKernel(search_space)
+        self.__stops = array('H')
+        self.__starts = array('L', [0])
+        self.__costs = array('d')
+        self.__routes_through_hub = {hub: array('L') for hub in range(search_space.itinerary_size,
+                                                                          search_space.size)}
+        for route in routes:
+            if len(self.__costs) == max_routes:
+                raise TooManyCandidateRoutesError("More than " + str(max_routes) + " routes")
+            route_number = len(self.__costs)
+            cost = self.__kernel.get_cost_of_route(route)
+            if cost is None:
+                continue                                      # a leg is beyond the aircraft's range
+            self.__stops.extend(route)
+            self.__starts.append(len(self.__stops))
+            self.__costs.append(cost)
+            for airport in route:
+                if airport in self.__routes_through_hub:
+                    self.__routes_through_hub[airport].append(route_number)
+
+    def __len__(self):
+        return len(self.__costs)
+
+    def get_route(self, route_number):
+        """ Returns a route as a list of airport ids. """
+        return list(self.__stops[self.__starts[route_number]:self.__starts[route_number + 1]])
+
+    def get_cheapest_route(self):
+        """ Returns the cheapest route (a list of airport ids) and its net cost, or (None, 10 ** 10). """
+        if not self.__costs:
+            return None, 10 ** 10
+        lowest_cost = min(self.__costs)
+        return self.get_route(self.__costs.index(lowest_cost)), lowest_cost
+
+    def update_fuel_prices(self, fuel_prices):
+        """
+        Changes the fuel price at each airport (a list indexed by airport id) and prices the routes through the
+        airports whose price has changed again.  Returns the number of routes priced.
+        """
+        current_prices = self.__search_space.fuel_prices       # shared with the kernel
+        changed_airports = [airport for airport in range(self.__search_space.size)
+                            if fuel_prices[airport] != current_prices[airport]]
+        for airport in changed_airports:
+            current_prices[airport] = fuel_prices[airport]
+        self.__search_space.home_fuel_price = current_prices[0]
+        if not changed_airports:
+            return 0
+        if min(changed_airports) < self.__search_space.itinerary_size:
+            route_numbers = range(len(self.__costs))
+        elif len(changed_airports) == 1:
+            route_numbers = self.__routes_through_hub[changed_airports[0]]
+        else:
+            route_numbers = sorted(set(route_number for airport in changed_airports
+                                       for route_number in self.__routes_through_hub[airport]))
+        get_cost_of_route = self.__kernel.get_cost_of_route
+        stops, starts, costs = self.__stops, self.__starts, self.__costs
+        for route_number in route_numbers:
+            costs[route_number] = get_cost_of_route(stops[starts[route_number]:starts[route_number + 1]])
+        return len(route_numbers)
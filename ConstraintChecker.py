@@ -0,0 +1,82 @@
+from itertools import permutations
+
+
+class ConstraintChecker:
+    """
+    ConstraintChecker: compiles an itinerary's valid constraints so that partial routes which can never
+    meet them are abandoned while the routes are being generated.
+
+    A constraint [a, b] (or [a, b, c]) is met when the route visits a, then b (then c), in that order,
+    though other airports may come in between.  Routes are built from a permutation of the non-home
+    airports, in which each airport appears once, plus one optional extra stop.  So, once the start of a
+    permutation is fixed, the only ways a constraint can still be met are by ordering the remaining
+    airports suitably or by making the extra stop at one of the constraint's airports.
+
+    For each constraint, the order in which its airports appear in a partial permutation is looked up in a
+    table of the extra stops that could still meet it.  If no single extra stop could meet every
+    constraint, no route built from the partial permutation can be valid.  The check is conservative:
+    it never rejects a partial permutation that could lead to a valid route, and every complete route is
+    still checked with is_met().
+    """
+
+    def __init__(self, constraints):
+        self.__constraints = [tuple(constraint) for constraint in constraints]
+        self.__constraint_airports = [set(constraint) for constraint in constraints]
+        self.__extra_stops = {}        # (constraint number, its airports so far, its airports to come) -> extra stops
+
+    def __len__(self):
+        return len(self.__constraints)
+
+    def can_be_met(self, partial_permutation, remaining_airports):
+        """
+        Returns False if no route built from partial_permutation (which starts with the home airport)
+        followed by a permutation of remaining_airports can meet every constraint.
+        """
+        extra_stops_needed = None
+        for i, airports in enumerate(self.__constraint_airports):
+            order_so_far = tuple(airport for airport in partial_permutation if airport in airports)
+            still_to_come = tuple(sorted(airport for airport in remaining_airports if airport in airports))
+            extra_stops = self.__get_extra_stops(i, order_so_far, still_to_come)
+            if extra_stops is None:                                  # no extra stop is needed for this constraint
+                continue
+            if extra_stops_needed is None:
+                extra_stops_needed = extra_stops
+            else:
+                extra_stops_needed = extra_stops_needed & extra_stops
+            if not extra_stops_needed:
+                return False
+        return True
+
+    def is_met(self, route):
+        """ Checks whether a complete route meets every constraint. """
+        for constraint in self.__constraints:
+            if not self.__is_in_order(constraint, route):
+                return False
+        return True
+
+    def __get_extra_stops(self, i, order_so_far, still_to_come):
+        """
+        Returns None if constraint i can be met without an extra stop, given the order in which its airports
+        have been visited so far and those still to come.  Otherwise returns the set of airports at which an
+        extra stop could meet it.
+        """
+        key = (i, order_so_far, still_to_come)
+        if key not in self.__extra_stops:
+            constraint = self.__constraints[i]
+            orders = [order_so_far + order for order in set(permutations(still_to_come))]
+            if any(self.__is_in_order(constraint, order) for order in orders):
+                extra_stops = None
+            else:
+                extra_stops = frozenset(airport for airport in self.__constraint_airports[i]
+                                        for order in orders
+                                        for position in range(len(order) + 1)
+                                        if self.__is_in_order(constraint, order[:position] + (airport,) +
+                                                              order[position:]))
+            self.__extra_stops[key] = extra_stops
+        return self.__extra_stops[key]
+
+    @staticmethod
+    def __is_in_order(constraint, route):
+        """ Returns True if the airports in the constraint appear in the route in that order. """
+        stops = iter(route)
+        return all(airport in stops for airport in constraint)
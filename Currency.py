@@ -1,8 +1,9 @@
-import urllib.request
-from urllib.error import URLError
+import socket
+from time import time
 URL = "https://www.google.com/finance/converter?a=1&from="
 START = "<span class=bld>"
 END = " "
+RETRY_FAILED_DOWNLOAD_AFTER = 300                     # seconds before a failed download is tried again
 
 class Currency:
     """
@@ -10,35 +11,83 @@ class Currency:
     It contains an accessor method, get_exchange_rate(), and two mutator methods,
     __find_real_time_sell_rate() and __find_real_time_exchange_rate().
     get_real_time_rate() is both an accessor and a mutator method.
+
+    The real-time rate is downloaded from url (followed by the currency codes), giving up after timeout
+    seconds.  CurrencyTable can download it with find_real_time_rate() and store it with set_real_time_rate(),
+    so that countries which share a currency share one download.  A rate can be given a time at which it
+    expires (e.g. from ExchangeRateCache), after which it is downloaded again.  If a download fails, the rate
+    from the file is used until the failure expires, and then the download is tried again.
     """
 
-    def __init__(self, country_name, currency_name, currency_code, buy_rate):
+    def __init__(self, country_name, currency_name, currency_code, buy_rate, url=URL, timeout=None):
         self.__country_name = country_name
         self.__currency_name = currency_name
         self.__currency_code = currency_code
         self.__exchange_rate = float(buy_rate)
         self.__real_time_rate = None
+        self.__real_time_rate_expires_at = None             # None if the real-time rate never expires
+        self.__url = url
+        self.__timeout = timeout
 
     def get_exchange_rate(self):
         """ Returns the exchange rate that was input from the csv file. """
         return self.__exchange_rate
 
-    def get_real_time_rate(self):
+    def set_exchange_rate(self, exchange_rate):
+        """ Replaces the exchange rate that was input from the csv file. """
+        self.__exchange_rate = float(exchange_rate)
+
+    def get_currency_code(self):
+        return self.__currency_code
+
+    def has_real_time_rate(self, now=None):
+        """
+        Returns True if a real-time rate has been downloaded (or has recently failed to download) and hasn't
+        expired by now (a time from time.time(), which is the current time if None).
+        """
+        if now is None:
+            now = time()
+        if self.__real_time_rate_expires_at is not None and self.__real_time_rate_expires_at <= now:
+            return False
+        return self.__real_time_rate is not None
+
+    def get_stored_real_time_rate(self):
+        """ Returns the real-time rate that has been stored and the time at which it expires, or None. """
+        if not self.has_real_time_rate():
+            return None
+        return self.__real_time_rate, self.__real_time_rate_expires_at
+
+    def find_real_time_rate(self):
+        """ Downloads and returns the real-time exchange rate without storing it.  Returns 0.0 if it fails. """
+        return self.__find_real_time_exchange_rate() or 0.0
+
+    def set_real_time_rate(self, real_time_rate, expires_at=None):
+        """
+        Stores a real-time exchange rate returned by find_real_time_rate(), which expires at expires_at (a time
+        from time.time()).  If no expiry time is given, a failed download (0.0) expires after
+        RETRY_FAILED_DOWNLOAD_AFTER seconds and a rate that was downloaded never expires.
+        """
+        self.__real_time_rate = real_time_rate
+        if expires_at is None and real_time_rate == 0.0:
+            expires_at = time() + RETRY_FAILED_DOWNLOAD_AFTER
+        self.__real_time_rate_expires_at = expires_at
+
+    def get_real_time_rate(self, now=None):
         """
-        Checks if the object contains real-time exchange rate.
+        Checks if the object contains real-time exchange rate (which hasn't expired by now, see has_real_time_rate()).
         If not, gets the real-time exchange rate from internet and saves it to self.__real_time_rate.
         Then returns the real-time exchange rate.
         """
-        if self.__real_time_rate == 0.0:
-            # if the object previously failed to download real-time rate, it won't try again
+        if self.has_real_time_rate(now) and self.__real_time_rate == 0.0:
+            # if the object recently failed to download real-time rate, it won't try again until the failure expires
             return self.__exchange_rate
-        elif self.__real_time_rate is not None:
+        elif self.has_real_time_rate(now):
             # if real-time rate has already been stored, return it
             return self.__real_time_rate
         else:
             # attempt to get real-time exchange rate from the internet
-            real_time_rate = self.__find_real_time_exchange_rate()
-            self.__real_time_rate = real_time_rate
+            real_time_rate = self.find_real_time_rate()
+            self.set_real_time_rate(real_time_rate)
             if real_time_rate == 0.0:
                 # if attempt to get real-time rate fails, return the exchange rate from the file
                 return self.__exchange_rate
@@ -48,11 +97,13 @@ class Currency:
     def __find_real_time_sell_rate(self):
         """ Saves and returns the sell rate between self.__currency_code and euros """
         code = self.__currency_code
-        url = URL + "EUR&to=" + code
+        url = self.__url + "EUR&to=" + code
+        import urllib.request                     # imported here because it is slow to import and often not needed
+        from urllib.error import URLError
         try:
-            with urllib.request.urlopen(url) as f:
+            with urllib.request.urlopen(url, timeout=self.__timeout) as f:
                 page = str(f.read())
-        except URLError:
+        except (URLError, socket.timeout):
             # if unable to connect to the website
             print("Unable to get real-time exchange rate for ", self.__country_name,
                   ". Using exchange rate from file", sep="")
@@ -90,11 +141,13 @@ class Currency:
                 # return the reciprocal of the sell rate
                 return 1 / sell_rate
 
-        url = URL + code + "&to=EUR"
+        url = self.__url + code + "&to=EUR"
+        import urllib.request                     # imported here because it is slow to import and often not needed
+        from urllib.error import URLError
         try:
-            with urllib.request.urlopen(url) as f:
+            with urllib.request.urlopen(url, timeout=self.__timeout) as f:
                 page = str(f.read())
-        except URLError:
+        except (URLError, socket.timeout):
             # if unable to connect to the website
             print("Unable to get real-time exchange rate for ", self.__country_name,
                   ". Using exchange rate from file", sep="")
@@ -1,5 +1,13 @@
 import csv
-from Currency import Currency
+import threading
+from contextlib import contextmanager
+from time import perf_counter, time
+from Currency import Currency, URL
+from reference_snapshot import get_snapshot_filename, load_or_compile_snapshot
+from array import array
+
+MAX_CONNECTIONS = 8                         # the most real-time exchange rates downloaded at the same time
+revalidating_lock = threading.Lock()        # guards each table's set of rates being downloaded in the background
 
 
 class CountryCurrencyFileError(Exception):
@@ -28,43 +36,124 @@ class CurrencyTable:
     The class raises two custom errors, CountryCurrencyFileError and ExchangeRateFileError,
     so that the main program can inform the user which file caused a FileNotFoundError.
 
-    The class has one mutator method, __build_currency_table(), and one accessor method,
-    get_exchange_rate(country).
+    If the exchange rate file has more than one row for a currency (e.g. historical rates), the last
+    row is used.
+
+    The class has four mutator methods, __build_currency_table(), prefetch_real_time_rates(countries),
+    update_exchange_rates(rates) and set_real_time_rates(real_time_rates), and two accessor methods,
+    get_exchange_rate(country) and get_real_time_rates(countries).  The time taken to read the files, in
+    seconds, is stored in load_time.
+
+    Real-time exchange rates are downloaded from exchange_rate_url, giving up after timeout seconds.
+    Each currency's rate is downloaded once and shared by every country that uses the currency.
+    If an ExchangeRateCache is given as rate_cache, it is checked before any rate is downloaded, and
+    downloaded rates are saved in it.  The rates then expire in memory when they go out of date in the cache,
+    so a table that is kept for a long time (e.g. by SolverSession) downloads them again.  Within a
+    real_time_rates_held() block they don't expire, so that a solve prices every route with the same rates.
+
+    If use_snapshot is True, the table is loaded from a binary snapshot of the two files (see
+    reference_snapshot), which is rebuilt whenever either file changes.
     """
 
     def __init__(self, currency_file='input files/countrycurrency.csv',
                  exchange_rate_file='input files/currencyrates.csv',
-                 real_exch_rates=True):
-        self.__dictionary = self.__build_currency_table(currency_file, exchange_rate_file)
+                 real_exch_rates=True, exchange_rate_url=URL, timeout=10, rate_cache=None, use_snapshot=False):
+        self.__exchange_rate_url = exchange_rate_url
+        self.__timeout = timeout
+        self.rate_cache = rate_cache
+        self.__revalidating = set()                # currency codes being downloaded in the background
+        self.__held_times = {}                     # the time at which each thread's rates were held, by thread id
+        start_time = perf_counter()
+        if use_snapshot:
+            self.__dictionary = self.__load_currency_table(currency_file, exchange_rate_file)
+        else:
+            self.__dictionary = self.__build_currency_table(currency_file, exchange_rate_file)
+        self.load_time = perf_counter() - start_time
         self.__real_time_exchange_rates = real_exch_rates
 
+        # the countries' currencies, indexed by currency code
+        self.__currencies = {}
+        for currency in self.__dictionary.values():
+            self.__currencies.setdefault(currency.get_currency_code(), []).append(currency)
+
     def __build_currency_table(self, currency_file, exchange_rate_file):
+        output = {}
+        for country_name, currency_name, currency_code, buy_rate in self.__read_currency_files(currency_file,
+                                                                                               exchange_rate_file):
+            output[country_name] = Currency(country_name, currency_name, currency_code, buy_rate,
+                                            self.__exchange_rate_url, self.__timeout)
+        return output
+
+    def __load_currency_table(self, currency_file, exchange_rate_file):
+        strings, arrays = load_or_compile_snapshot(get_snapshot_filename(currency_file),
+                                                   [currency_file, exchange_rate_file],
+                                                   lambda: self.__compile_snapshot(currency_file, exchange_rate_file))
+        currency_names = strings["currency_names"]
+        currency_codes = strings["currency_codes"]
+        currency_ids = arrays["currency_ids"]
+        buy_rates = arrays["buy_rates"]
+        output = {}
+        for i, country_name in enumerate(strings["countries"]):
+            currency = currency_ids[i]
+            output[country_name] = Currency(country_name, currency_names[currency], currency_codes[currency],
+                                            buy_rates[currency], self.__exchange_rate_url, self.__timeout)
+        return output
+
+    def __compile_snapshot(self, currency_file, exchange_rate_file):
+        """
+        Returns the strings and arrays for a snapshot of the two files: the countries, the currencies'
+        names and codes, each country's index in the list of currencies, and the currencies' buy rates.
+        """
+        countries = []
+        currency_index = {}
+        currency_ids = array('i')
+        currency_names, currency_codes, buy_rates = [], [], array('d')
+        for country_name, currency_name, currency_code, buy_rate in self.__read_currency_files(currency_file,
+                                                                                               exchange_rate_file):
+            key = (currency_name, currency_code, buy_rate)
+            if key not in currency_index:
+                currency_index[key] = len(currency_names)
+                currency_names.append(currency_name)
+                currency_codes.append(currency_code)
+                buy_rates.append(float(buy_rate))
+            countries.append(country_name)
+            currency_ids.append(currency_index[key])
+        strings = {"countries": countries, "currency_names": currency_names, "currency_codes": currency_codes}
+        return strings, {"currency_ids": currency_ids, "buy_rates": buy_rates}
+
+    def __read_currency_files(self, currency_file, exchange_rate_file):
+        """
+        Returns a list of (country name, currency name, currency code, buy rate) for every country whose
+        currency has an exchange rate.  Reads each file once, row by row.  The exchange rates are indexed
+        by currency code, so that each country's currency can be looked up directly.
+        """
         dictionary = {}                                 # a temporary variable to store the contents of the first file
 
         # read countries and currencies from file
         try:
             with open(currency_file, 'rt') as f:
-                reader = list(csv.reader(f))
+                for row in csv.reader(f):
+                    key = row[0]
+                    if key != "name":                                             # don't include header in dictionary
+                        dictionary[key] = [row[0], row[14]]
         except FileNotFoundError:
             raise CountryCurrencyFileError
-        else:
-            for row in reader:
-                key = row[0]
-                if key != "name":                                                 # don't include header in dictionary
-                    dictionary[key] = [row[0], row[14]]
 
-        # read exchange rates from file and return a dictionary
+        # read exchange rates from file, indexed by currency code
+        rates = {}
         try:
             with open(exchange_rate_file, 'rt') as f:
-                reader = list(csv.reader(f))
+                for row in csv.reader(f):
+                    rates[row[1]] = row                                  # a later row for a currency replaces an earlier one
         except FileNotFoundError:
             raise ExchangeRateFileError
-        else:
-            output = {}
-            for key in dictionary:
-                for row in reader:
-                    if row[1] == dictionary[key][1]:
-                        output[key] = Currency(dictionary[key][0], row[0], dictionary[key][1], row[2])
+
+        # join the two files on the currency code
+        output = []
+        for country_name, currency_code in dictionary.values():
+            row = rates.get(currency_code)
+            if row is not None:
+                output.append((country_name, row[0], currency_code, row[2]))
         return output
 
     def get_exchange_rate(self, country):
@@ -73,10 +162,152 @@ class CurrencyTable:
         Otherwise returns the exchange rate from the file.
         """
         if self.__real_time_exchange_rates:
-            return self.__dictionary[country].get_real_time_rate()
+            currency = self.__dictionary[country]
+            now = self.__get_held_time()
+            if not currency.has_real_time_rate(now):
+                self.prefetch_real_time_rates([country])
+            return currency.get_real_time_rate(now)
         else:
             return self.__dictionary[country].get_exchange_rate()
 
+    def update_exchange_rates(self, rates):
+        """
+        Changes the exchange rates of some currencies, e.g. when new rates are published during the day.
+        rates is a dictionary from currency code to the value in euros of one unit of the currency.  The new rate
+        replaces both the rate from the file and any real-time rate.
+        Returns the countries that use the currencies (see ItineraryRoster.reprice()).
+        """
+        changed_countries = [country for country, currency in self.__dictionary.items()
+                             if currency.get_currency_code() in rates]
+        for currency_code, rate in rates.items():
+            for currency in self.__currencies.get(currency_code, []):
+                currency.set_exchange_rate(rate)
+                if self.__real_time_exchange_rates:
+                    currency.set_real_time_rate(float(rate))
+        return changed_countries
+
+    def prefetch_real_time_rates(self, countries, max_connections=MAX_CONNECTIONS):
+        """
+        Downloads the real-time exchange rates for the currencies used in a list of countries, so that they
+        are ready before any route is priced.  Each currency is downloaded once, however many countries use
+        it, and up to max_connections currencies are downloaded at the same time.  Countries that are not
+        in the table, and currencies that have already been downloaded, are skipped.
+        Rates found in the rate cache are not downloaded; if the cache returns an out-of-date rate (see
+        ExchangeRateCache), the rate is used and a new one is downloaded into the cache in the background.
+        Does nothing if real-time exchange rates are not being used.
+        """
+        if not self.__real_time_exchange_rates:
+            return
+        now = self.__get_held_time()
+        currency_codes = []
+        for country in countries:
+            currency = self.__dictionary.get(country)
+            if currency is not None and not currency.has_real_time_rate(now) \
+                    and currency.get_currency_code() not in currency_codes:
+                currency_codes.append(currency.get_currency_code())
+
+        if self.rate_cache is not None:
+            not_cached = []
+            for currency_code in currency_codes:
+                cached_rate = self.rate_cache.get_rate(currency_code)
+                if cached_rate is None:
+                    not_cached.append(currency_code)
+                    continue
+                real_time_rate, expires_at = cached_rate
+                if expires_at <= time():
+                    self.__revalidate_in_background(currency_code)
+                    # the out-of-date rate is used until the new one has had time to download
+                    expires_at = time() + self.rate_cache.failed_time_to_live
+                self.__set_real_time_rate(currency_code, real_time_rate, expires_at)
+            currency_codes = not_cached
+
+        if not currency_codes:
+            return
+        if len(currency_codes) == 1:
+            real_time_rates = [self.__download_real_time_rate(currency_codes[0])]
+        else:
+            from concurrent.futures import ThreadPoolExecutor       # only imported when it is needed
+            with ThreadPoolExecutor(max_workers=min(max_connections, len(currency_codes))) as executor:
+                real_time_rates = list(executor.map(self.__download_real_time_rate, currency_codes))
+        for currency_code, (real_time_rate, expires_at) in zip(currency_codes, real_time_rates):
+            self.__set_real_time_rate(currency_code, real_time_rate, expires_at)
+
+    @contextmanager
+    def real_time_rates_held(self):
+        """
+        Holds the real-time exchange rates for the current thread within a with block (e.g. one solve): a rate's
+        expiry is checked against the time at which the block began, so a rate that expires during the block is
+        still used, rather than downloaded again part way through.  Nested blocks keep the outer block's time.
+        """
+        if self.__get_held_time() is not None:
+            yield self
+            return
+        self.__held_times[threading.get_ident()] = time()
+        try:
+            yield self
+        finally:
+            del self.__held_times[threading.get_ident()]
+
+    def __get_held_time(self):
+        """ Returns the time at which the current thread's rates were held, or None if they aren't held. """
+        return self.__held_times.get(threading.get_ident())
+
+    def get_real_time_rates(self, countries):
+        """
+        Returns the real-time exchange rates already stored for the currencies used in a list of countries, as a
+        dictionary from currency code to (rate, expiry time), so that they can be given to a copy of the table in
+        another process with set_real_time_rates() rather than downloaded again.
+        """
+        real_time_rates = {}
+        if not self.__real_time_exchange_rates:
+            return real_time_rates
+        for country in countries:
+            currency = self.__dictionary.get(country)
+            if currency is not None:
+                stored_rate = currency.get_stored_real_time_rate()
+                if stored_rate is not None:
+                    real_time_rates[currency.get_currency_code()] = stored_rate
+        return real_time_rates
+
+    def set_real_time_rates(self, real_time_rates):
+        """ Stores the real-time exchange rates returned by get_real_time_rates(). """
+        for currency_code, (real_time_rate, expires_at) in real_time_rates.items():
+            if currency_code in self.__currencies:
+                self.__set_real_time_rate(currency_code, real_time_rate, expires_at)
+
+    def __download_real_time_rate(self, currency_code):
+        """ Downloads a currency's rate and saves it in the rate cache.  Returns the rate and its expiry time. """
+        real_time_rate = self.__currencies[currency_code][0].find_real_time_rate()
+        if self.rate_cache is None:
+            return real_time_rate, None
+        return real_time_rate, self.rate_cache.store_rate(currency_code, real_time_rate)
+
+    def __set_real_time_rate(self, currency_code, real_time_rate, expires_at):
+        for currency in self.__currencies[currency_code]:
+            currency.set_real_time_rate(real_time_rate, expires_at)
+
+    def __revalidate_in_background(self, currency_code):
+        """
+        Downloads a new rate for a currency into the rate cache, in a background thread.  The rate in use is
+        not changed until it expires, and not within a real_time_rates_held() block, so that every route in a
+        solve is priced with the same rates.
+        """
+        with revalidating_lock:
+            if currency_code in self.__revalidating:
+                return
+            self.__revalidating.add(currency_code)
+
+        def revalidate():
+            try:
+                real_time_rate = self.__currencies[currency_code][0].find_real_time_rate()
+                if real_time_rate != 0.0:
+                    self.rate_cache.store_rate(currency_code, real_time_rate)
+            finally:
+                with revalidating_lock:
+                    self.__revalidating.discard(currency_code)
+
+        threading.Thread(target=revalidate, daemon=True).start()
+
 
 def main():
     currency_table = CurrencyTable()
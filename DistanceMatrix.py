@@ -0,0 +1,61 @@
+from LegFeasibilityGraph import LegFeasibilityGraph
+
+
+class DistanceMatrix:
+    """
+    DistanceMatrix class: holds the great circle distance between every pair of airports in a small
+    set of airports (typically the airports in an itinerary plus any hubs).
+
+    Each airport is given a small integer id, which is its position in the list of airport codes.
+    The distances are stored as one row of floats per airport, so that the distance between the
+    airports with ids i and j is rows[i][j].
+
+    The matrix is built by AirportAtlas.get_distance_matrix(), which calculates every distance in
+    a single pass.  The LegFeasibilityGraph for each aircraft range is built the first time it is asked for
+    and kept with the matrix.
+    """
+
+    def __init__(self, airport_codes, rows):
+        self.__airport_codes = list(airport_codes)
+        self.__index = {code: i for i, code in enumerate(self.__airport_codes)}
+        self.rows = rows
+        self.__feasibility_graphs = {}
+
+    def __len__(self):
+        return len(self.__airport_codes)
+
+    def __contains__(self, airport_code):
+        return airport_code in self.__index
+
+    def get_airport_codes(self):
+        return self.__airport_codes[:]
+
+    def get_index(self, airport_code):
+        """ Returns the integer id of an airport in the matrix. """
+        return self.__index[airport_code]
+
+    def get_code(self, index):
+        """ Returns the IATA code of the airport with the given integer id. """
+        return self.__airport_codes[index]
+
+    def get_distance(self, code1, code2):
+        """
+        Returns the great circle distance between two airports in the matrix.
+
+        Inputs: two IATA airport codes (strings).
+        Output: the distance in kilometers (float).
+        """
+        return self.rows[self.__index[code1]][self.__index[code2]]
+
+    def get_distance_by_index(self, index1, index2):
+        return self.rows[index1][index2]
+
+    def get_feasibility_graph(self, aircraft_range):
+        """ Returns the LegFeasibilityGraph showing which legs an aircraft with the given range can fly. """
+        if aircraft_range not in self.__feasibility_graphs:
+            self.__feasibility_graphs[aircraft_range] = LegFeasibilityGraph(self, aircraft_range)
+        return self.__feasibility_graphs[aircraft_range]
+
+    def __str__(self):
+        return "Distance matrix for " + str(len(self.__airport_codes)) + " airports: " + \
+               ", ".join(self.__airport_codes)
@@ -0,0 +1,98 @@
+from fuel_window import add_airport, buy_fuel_for_leg, get_extra_cost_limit
+
+
+class DynamicProgrammingSolver:
+    """
+    DynamicProgrammingSolver: finds the cheapest route for an itinerary without listing every route.
+
+    This is a Held-Karp style dynamic programme.  Routes are built one stop at a time from the home
+    airport, and partial routes that have visited the same set of airports, are at the same airport,
+    have (or have not) made the extra stop and have met the same constraints are grouped together.
+
+    The cost of the rest of a route depends on the fuel that can still be bought at the airports that
+    are within range (see fuel_window), so a partial route is only discarded if another partial route in
+    its group cost no more and can buy fuel at least as cheaply for the rest of the route.  The solver
+    therefore finds a route that is exactly as cheap as the cheapest route found by listing every route.
+
+    Input: an ItinerarySearchSpace.
+    """
+
+    def __init__(self, search_space):
+        self.search_space = search_space
+        self.__highest_fuel_price = max(search_space.fuel_prices)
+        self.states_stored = 0
+        self.states_discarded = 0
+
+    def solve(self):
+        """
+        Returns the cheapest route (a list of airport ids) and its net cost.
+        Returns None, None if the itinerary cannot be completed.
+        """
+        space = self.search_space
+        fuel_prices = space.fuel_prices
+        fuel_capacity = space.fuel_capacity
+        distances = space.distances
+
+        best_route, lowest_cost = None, None
+        home_window = add_airport((), fuel_prices[0], fuel_capacity)
+        home_flags = space.get_constraint_flags(0, 0, 0)
+
+        # each state is (visited airports, current airport, extra stop made, constraint flags) and maps to a
+        # list of (cost so far, window, previous stop) entries, none of which is better than another
+        states = {(1, 0, False, home_flags): [(0, home_window, None)]}
+        while states:
+            next_states = {}
+            for (visited, airport, extra_stop_made, flags), entries in states.items():
+                if space.can_return_home(airport, visited, flags):
+                    for entry in entries:
+                        cost = space.get_net_cost_of_route(airport, extra_stop_made, entry[0], entry[1])
+                        if lowest_cost is None or cost < lowest_cost:
+                            best_route, lowest_cost = self.__get_route(entry, airport), cost
+                for next_airport, is_extra_stop in space.get_next_stops(airport, visited, extra_stop_made):
+                    key = (visited | (1 << next_airport) if next_airport < space.itinerary_size else visited,
+                           next_airport,
+                           extra_stop_made or is_extra_stop,
+                           space.get_constraint_flags(next_airport, visited, flags))
+                    distance = distances[airport][next_airport]
+                    for entry in entries:
+                        leg_cost, window = buy_fuel_for_leg(entry[1], distance)
+                        window = add_airport(window, fuel_prices[next_airport], fuel_capacity)
+                        self.__store(next_states, key, (entry[0] + leg_cost, window, (airport, entry)))
+            states = next_states
+        return best_route, lowest_cost
+
+    def get_statistics(self):
+        return {"states stored": self.states_stored,
+                "states discarded": self.states_discarded}
+
+    def __store(self, states, key, new_entry):
+        """ Adds an entry to a state unless an existing entry is at least as good. """
+        entries = states.get(key)
+        if entries is None:
+            states[key] = [new_entry]
+            self.states_stored += 1
+            return
+        cost, window = new_entry[0], new_entry[1]
+        highest_fuel_price = self.__highest_fuel_price
+        for entry in entries:
+            if entry[0] <= cost and entry[0] + get_extra_cost_limit(entry[1], window, highest_fuel_price) <= cost:
+                self.states_discarded += 1
+                return
+        kept = [entry for entry in entries
+                if not (cost <= entry[0] and cost + get_extra_cost_limit(window, entry[1], highest_fuel_price) <= entry[0])]
+        self.states_discarded += len(entries) - len(kept)
+        kept.append(new_entry)
+        states[key] = kept
+        self.states_stored += 1
+
+    @staticmethod
+    def __get_route(entry, airport):
+        """ Follows the chain of previous stops back to the home airport. """
+        route = [airport]
+        previous = entry[2]
+        while previous is not None:
+            airport, entry = previous
+            route.append(airport)
+            previous = entry[2]
+        route.reverse()
+        return route
@@ -0,0 +1,67 @@
+import sqlite3
+from contextlib import closing
+from time import time
+
+
+class ExchangeRateCache:
+    """
+    ExchangeRateCache: keeps real-time exchange rates in an SQLite file between program runs, so that a
+    rate downloaded once is not downloaded again until it is out of date.
+
+    Each row holds a currency code, the exchange rate and the time it was downloaded.  A rate is fresh for
+    time_to_live seconds.  A download that failed is stored as a rate of 0.0, which is fresh for
+    failed_time_to_live seconds, so that the download is tried again later rather than never.
+
+    If stale_while_revalidate is True, a rate that is out of date is still returned (CurrencyTable then
+    downloads a new rate in the background for next time).  Rates for failed downloads are never returned
+    once they are out of date.
+
+    The file is opened for each lookup, so the cache can be shared by threads and processes.
+    """
+
+    def __init__(self, filename='exchangeratecache.sqlite', time_to_live=3600, failed_time_to_live=300,
+                 stale_while_revalidate=False):
+        self.filename = filename
+        self.time_to_live = time_to_live
+        self.failed_time_to_live = failed_time_to_live
+        self.stale_while_revalidate = stale_while_revalidate
+        self.__table_created = False
+
+    def get_rate(self, currency_code):
+        """
+        Returns the cached rate for a currency and the time at which it goes out of date,
+        or None if there is no rate that can be used.
+        """
+        with closing(self.__connect()) as connection:
+            row = connection.execute("SELECT rate, fetched_at FROM rates WHERE currency_code = ?",
+                                     (currency_code,)).fetchone()
+        if row is None:
+            return None
+        rate, fetched_at = row
+        expires_at = self.__get_expiry_time(rate, fetched_at)
+        if expires_at <= time() and not (self.stale_while_revalidate and rate != 0.0):
+            return None
+        return rate, expires_at
+
+    def store_rate(self, currency_code, rate):
+        """ Stores a downloaded rate (0.0 if the download failed) and returns the time at which it goes out of date. """
+        fetched_at = time()
+        with closing(self.__connect()) as connection:
+            with connection:
+                connection.execute("INSERT OR REPLACE INTO rates (currency_code, rate, fetched_at) VALUES (?, ?, ?)",
+                                   (currency_code, rate, fetched_at))
+        return self.__get_expiry_time(rate, fetched_at)
+
+    def __get_expiry_time(self, rate, fetched_at):
+        if rate == 0.0:
+            return fetched_at + self.failed_time_to_live
+        return fetched_at + self.time_to_live
+
+    def __connect(self):
+        connection = sqlite3.connect(self.filename, timeout=10)
+        if not self.__table_created:
+            with connection:
+                connection.execute("CREATE TABLE IF NOT EXISTS rates "
+                                   "(currency_code TEXT PRIMARY KEY, rate REAL, fetched_at REAL)")
+            self.__table_created = True
+        return connection
@@ -0,0 +1,170 @@
+from Itinerary import Itinerary, INSUFFICIENT_RANGE_ERROR
+from RouteKernel import RouteKernel
+
+
+class FleetEvaluator:
+    """
+    FleetEvaluator: finds the cheapest route for one itinerary with each aircraft in a fleet (every aircraft in
+    the AircraftCatalog, or a chosen few), and ranks the aircraft by the net cost of their cheapest routes.
+
+    Rather than solving the itinerary once for each aircraft, the routes are generated once, for the aircraft
+    with the longest range, and each route is priced for every aircraft that can fly it.  Whether a route can be
+    flown only depends on its longest leg, so a route that is too long for one aircraft is too long for every
+    aircraft with a shorter range, and the aircraft are priced in order of range until one can't fly the route.
+    The distances and fuel prices are shared (they come from one DistanceMatrix), aircraft with the same range
+    are only priced once, and aircraft that can't reach one of the airports at all (see LegFeasibilityGraph)
+    aren't priced.  The routes are priced with RouteKernel, as by the "kernel" solver, so each aircraft gets
+    the route that Itinerary.get_cheapest_route("kernel") would find.
+    """
+
+    def __init__(self, airport_atlas, currency_table, aircraft_catalog):
+        self.__airport_atlas = airport_atlas
+        self.__currency_table = currency_table
+        self.__aircraft_catalog = aircraft_catalog
+
+    def evaluate(self, airport_list, aircraft_codes=None, empty_tank=False, hubs=[], stopover_cost=0,
+                 constraints=[], result_cache=None):
+        """
+        Finds the cheapest route for the itinerary with each aircraft (every aircraft in the catalog if no codes
+        are given) and returns a list of (aircraft code, Itinerary), the cheapest first.  The aircraft that
+        can't complete the itinerary come last; itinerary.get_error_message() explains why.
+
+        If a ResultCache is given, the aircraft already solved for this itinerary are looked up in it, and the
+        others are stored in it.
+        """
+        if aircraft_codes is None:
+            aircraft_codes = self.__aircraft_catalog.get_aircraft_codes()
+        itineraries = [(aircraft_code, Itinerary(self.__airport_atlas, self.__currency_table, airport_list,
+                                                 aircraft_code, self.__get_aircraft_range(aircraft_code),
+                                                 empty_tank, hubs, stopover_cost, constraints))
+                       for aircraft_code in aircraft_codes]
+        unsolved = [(self.__get_aircraft_range(aircraft_code), itinerary) for aircraft_code, itinerary in itineraries
+                    if itinerary.get_error_message() is None]
+        if unsolved:
+            self.__currency_table.prefetch_real_time_rates(unsolved[0][1].get_countries())
+        if result_cache is not None:
+            unsolved = [(aircraft_range, itinerary) for aircraft_range, itinerary in unsolved
+                        if not self.__use_cached_result(itinerary, result_cache)]
+        if len(set(airport_list)) < len(airport_list):
+            # RouteKernel identifies airports by id, so it can't handle an airport that is listed twice
+            for aircraft_range, itinerary in unsolved:
+                itinerary.get_cheapest_route("enumerate", result_cache=result_cache)
+        elif unsolved:
+            self.__solve(unsolved, result_cache)
+        return self.rank(itineraries)
+
+    @staticmethod
+    def rank(itineraries):
+        """ Sorts a list of (aircraft code, Itinerary) by the net cost of the cheapest route, cheapest first. """
+        def get_net_cost(item):
+            itinerary = item[1]
+            if itinerary.get_error_message() is not None or not itinerary.cheapest_route:
+                return 10 ** 10
+            return itinerary.cheapest_route.get_cost_of_route()
+        return sorted(itineraries, key=get_net_cost)
+
+    def make_table_rows(self, results):
+        """
+        Returns a row for each aircraft in the results of evaluate(): its rank, aircraft code, range (km),
+        net fuel cost and cheapest route.  The rank, cost and route of an aircraft that can't complete the
+        itinerary are empty.
+        """
+        rows = []
+        rank = 0
+        for aircraft_code, itinerary in results:
+            aircraft_range = self.__get_aircraft_range(aircraft_code)
+            range_text = "" if aircraft_range is None else round(aircraft_range, 2)
+            if itinerary.get_error_message() is None and itinerary.cheapest_route:
+                rank += 1
+                rows.append([rank, aircraft_code, range_text, round(itinerary.cheapest_route.get_cost_of_route(), 2),
+                             " ".join(itinerary.cheapest_route.get_airport_codes())])
+            else:
+                rows.append(["", aircraft_code, range_text, "", ""])
+        return rows
+
+    def format_table(self, results):
+        """ Returns the results of evaluate() as a table that can be printed. """
+        lines = ["{:<5} {:<10} {:>12} {:>14}  {}".format("Rank", "Aircraft", "Range (km)", "Net cost", "Route")]
+        for rank, aircraft_code, aircraft_range, net_cost, route in self.make_table_rows(results):
+            if rank == "":
+                route = "cannot complete this itinerary"
+            lines.append("{:<5} {:<10} {:>12} {:>14}  {}".format(
+                rank, aircraft_code, "" if aircraft_range == "" else "{:,.0f}".format(aircraft_range),
+                "" if net_cost == "" else "{:,.2f}".format(net_cost), route))
+        return "\n".join(lines)
+
+    def __get_aircraft_range(self, aircraft_code):
+        try:
+            return self.__aircraft_catalog.get_aircraft_range(aircraft_code)
+        except KeyError:
+            return None                                     # Itinerary reports the unknown aircraft code
+
+    @staticmethod
+    def __use_cached_result(itinerary, result_cache):
+        cached_solution = result_cache.get_result(itinerary.get_signature())
+        if cached_solution is None:
+            return False
+        itinerary.set_solution(cached_solution)
+        return True
+
+    def get_cost_curve(self, airport_list, ranges=None, empty_tank=False, hubs=[], stopover_cost=0, constraints=[]):
+        """
+        Returns the cheapest route for the itinerary with aircraft of each of the given ranges (km), as a list of
+        (range, Itinerary), shortest range first.  If no ranges are given, the breakpoints from
+        Itinerary.get_range_breakpoints() are used: the critical range and each range at which more routes become
+        possible.  The ranges are all priced in one pass, as in evaluate().
+        """
+        itinerary = Itinerary(self.__airport_atlas, self.__currency_table, airport_list, None, 0, empty_tank, hubs,
+                              stopover_cost, constraints)
+        if itinerary.get_error_message() is not None:
+            return []
+        if ranges is None:
+            ranges = itinerary.get_range_breakpoints()
+        itineraries = [(aircraft_range, Itinerary(self.__airport_atlas, self.__currency_table, airport_list, None,
+                                                  aircraft_range, empty_tank, hubs, stopover_cost, constraints))
+                       for aircraft_range in sorted(set(ranges))]
+        if itineraries:
+            self.__currency_table.prefetch_real_time_rates(itinerary.get_countries())
+        if len(set(airport_list)) < len(airport_list):
+            for aircraft_range, same_range_itinerary in itineraries:
+                same_range_itinerary.get_cheapest_route("enumerate")
+        else:
+            self.__solve(itineraries, None)
+        return itineraries
+
+    @staticmethod
+    def __solve(itineraries, result_cache):
+        """
+        Finds the cheapest route for each of a list of (aircraft range, Itinerary), which only differ in the
+        aircraft, in one pass over the routes that the aircraft with the longest range can fly.
+        """
+        aircraft = {}                                       # range -> the itineraries for aircraft with that range
+        for aircraft_range, itinerary in itineraries:
+            aircraft.setdefault(aircraft_range, []).append(itinerary)
+        ranges = [aircraft_range for aircraft_range in sorted(aircraft, reverse=True)
+                  if not aircraft[aircraft_range][0].get_unreachable_airports()]
+        cheapest_routes = [None] * len(ranges)
+        if ranges:
+            search_spaces = [aircraft[aircraft_range][0].get_search_space() for aircraft_range in ranges]
+            kernels = [RouteKernel(search_space) for search_space in search_spaces]
+            airport_ids = {airport: i for i, airport in enumerate(search_spaces[0].airport_codes)}
+            distances = search_spaces[0].distances
+            lowest_costs = [10 ** 10] * len(ranges)
+            for route in aircraft[ranges[0]][0].iter_feasible_routes():
+                ids = [airport_ids[airport] for airport in route]
+                longest_leg = max(distances[ids[i - 1]][ids[i]] for i in range(len(ids)))
+                for i, aircraft_range in enumerate(ranges):
+                    if longest_leg > aircraft_range:
+                        break                               # and every aircraft after this has a shorter range
+                    cost = kernels[i].get_cost_of_route(ids)
+                    if cost is not None and cost < lowest_costs[i]:
+                        cheapest_routes[i] = route
+                        lowest_costs[i] = cost
+        cheapest_route_by_range = dict(zip(ranges, cheapest_routes))
+        for aircraft_range, same_range_itineraries in aircraft.items():
+            route = cheapest_route_by_range.get(aircraft_range)
+            solution = (route, None if route is not None else INSUFFICIENT_RANGE_ERROR, {})
+            for itinerary in same_range_itineraries:
+                itinerary.set_solution(solution)
+                if result_cache is not None:
+                    result_cache.store_result(itinerary.get_signature(), itinerary.get_solution())
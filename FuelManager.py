@@ -1,7 +1,10 @@
 #! python3
 from main import manage_list_of_routes, manage_single_route
+from SolverSession import SolverSession
 from tkinter import Tk, Frame, BOTH, RAISED, Button, Checkbutton, BooleanVar, filedialog, END, Label, LabelFrame, Entry
-from validate_inputs import validate_inputs_for_single_itinerary, validate_inputs_for_list_of_itineraries
+from tkinter import messagebox
+from validate_inputs import validate_inputs_for_single_itinerary, validate_inputs_for_list_of_itineraries, \
+    InvalidInputError
 
 class GraphicalUserInterface(Frame):
     def __init__(self, parent):
@@ -32,6 +35,10 @@ class GraphicalUserInterface(Frame):
         self.__constraints = "JFK AAL / JFK CDG"
         self.__aircraft_code = "747"
 
+        # the input files are loaded once and kept between runs, unless they change
+        self.__session = SolverSession(self.__airport_file, self.__aircraft_file, self.__currency_file,
+                                       self.__exchange_rate_file, self.__exchrate)
+
         # main frame
         frame = Frame(self, relief=RAISED, borderwidth=1)
         frame.pack(fill=BOTH, expand=True)
@@ -301,20 +308,24 @@ class GraphicalUserInterface(Frame):
 
     def __manage_list(self):
         # validate user inputs
-        hubs, stopover_cost = validate_inputs_for_list_of_itineraries(self.hubs_entry.get().upper().split(),
-                                                                      self.stopover_cost_entry.get())
-        print("Managing list of itineraries...")
-        manage_list_of_routes(self.__exchrate,
-                      self.__datetime,
-                      self.__empty_tank,
-                      hubs,
-                      stopover_cost,
-                      self.itinerary_entry.get(),
-                      self.airport_entry.get(),
-                      self.aircraft_file_entry.get(),
-                      self.currency_entry.get(),
-                      self.exchange_rate_entry.get(),
-                      self.output_entry.get())
+        try:
+            hubs, stopover_cost = validate_inputs_for_list_of_itineraries(self.hubs_entry.get().upper().split(),
+                                                                          self.stopover_cost_entry.get())
+            print("Managing list of itineraries...")
+            manage_list_of_routes(self.__exchrate,
+                          self.__datetime,
+                          self.__empty_tank,
+                          hubs,
+                          stopover_cost,
+                          self.itinerary_entry.get(),
+                          self.airport_entry.get(),
+                          self.aircraft_file_entry.get(),
+                          self.currency_entry.get(),
+                          self.exchange_rate_entry.get(),
+                          self.output_entry.get(),
+                          session=self.__session)
+        except InvalidInputError as error:
+            messagebox.showerror(error.title, error.message)
 
     def __manage_single_itinerary(self):
         # validate user inputs
@@ -326,24 +337,25 @@ class GraphicalUserInterface(Frame):
                                 self.home_airport_entry.get().upper(),
                                 self.other_airports_entry.get().upper().split(),
                                 self.aircraft_entry.get().upper())
-        except TypeError:
-            return
-
-        print("Managing single itinerary...")
-        manage_single_route(home_airport,
-                            other_airports,
-                            aircraft_code,
-                            self.__exchrate,
-                            self.__datetime,
-                            self.__empty_tank,
-                            hubs,
-                            stopover_cost,
-                            constraints_list,
-                            self.airport_entry.get(),
-                            self.aircraft_file_entry.get(),
-                            self.currency_entry.get(),
-                            self.exchange_rate_entry.get(),
-                            self.output_entry.get())
+
+            print("Managing single itinerary...")
+            manage_single_route(home_airport,
+                                other_airports,
+                                aircraft_code,
+                                self.__exchrate,
+                                self.__datetime,
+                                self.__empty_tank,
+                                hubs,
+                                stopover_cost,
+                                constraints_list,
+                                self.airport_entry.get(),
+                                self.aircraft_file_entry.get(),
+                                self.currency_entry.get(),
+                                self.exchange_rate_entry.get(),
+                                self.output_entry.get(),
+                                session=self.__session)
+        except InvalidInputError as error:
+            messagebox.showerror(error.title, error.message)
 
 
 def main():
@@ -1,5 +1,16 @@
 from Route import Route, ImpossibleRouteError
-from itertools import permutations
+from ItinerarySearchSpace import ItinerarySearchSpace
+from DynamicProgrammingSolver import DynamicProgrammingSolver
+from BranchAndBoundSolver import BranchAndBoundSolver
+from RouteKernel import RouteKernel
+from ConstraintChecker import ConstraintChecker
+from CandidateRoutes import CandidateRoutes, TooManyCandidateRoutesError
+from itertools import islice
+from hashlib import sha256
+
+ROUTES_PER_BATCH = 10000                          # the most routes held in memory at once by the "batch" solver
+INSUFFICIENT_RANGE_ERROR = "Aircraft has insufficient range to complete this itinerary." \
+                           "\nConsider using a larger aircraft or adding a fuel stop to the list of hubs."
 
 
 class Itinerary:
@@ -7,7 +18,7 @@ class Itinerary:
     A class to store a list of airports to be visited and an aircraft code.
     """
     def __init__(self, airport_atlas, currency_table, airport_list, aircraft_code, aircraft_range,
-                 empty_tank=False, hubs=[], stopover_cost=0, constraints=[]):
+                 empty_tank=False, hubs=[], stopover_cost=0, constraints=[], refuelling_algorithm="greedy"):
         self.__airport_list = airport_list
         self.__aircraft_code = aircraft_code  # maybe don't need this
         self.__aircraft_range = aircraft_range
@@ -26,11 +37,132 @@ class Itinerary:
                 self.__error = "Unable to find the airport code " + str(airport) + \
                                ".\nPlease check the code and try again."
         self.__constraints = self.get_valid_constraints(constraints, self.__airport_list)
+        self.__constraint_checker = ConstraintChecker(self.__constraints)
         self.__empty_tank = empty_tank
-        self.__route_list = []
         self.__stopover_cost = stopover_cost
+        self.__refuelling_algorithm = refuelling_algorithm          # "greedy" or "linear" (see Route)
+        self.__distance_matrix = None
         self.cheapest_route = 0
         self.__lowest_cost = 10 ** 10
+        self.search_statistics = {}
+        self.__candidate_routes = None                    # kept by get_cheapest_route(keep_candidates=True)
+        self.__candidate_routes_can_be_kept = True        # False once keeping them has failed
+
+    def get_aircraft_range(self):
+        return self.__aircraft_range
+
+    def get_distance_matrix(self):
+        """
+        Returns the matrix of distances between the airports in the itinerary and the hubs.
+        The matrix is built the first time it is needed and reused for every route after that.
+        """
+        if self.__distance_matrix is None:
+            self.__distance_matrix = self.__airport_atlas.get_distance_matrix(self.__airport_list + self.__hubs)
+        return self.__distance_matrix
+
+    def get_feasibility_graph(self, aircraft_range=None):
+        """
+        Returns the LegFeasibilityGraph showing which legs between the airports and hubs the aircraft (or an
+        aircraft with the given range) can fly.
+        """
+        if aircraft_range is None:
+            aircraft_range = self.__aircraft_range
+        return self.get_distance_matrix().get_feasibility_graph(aircraft_range)
+
+    def get_unreachable_airports(self, aircraft_range=None):
+        """
+        Returns the airports in the itinerary that the aircraft (or an aircraft with the given range) can't fly to
+        from home and back, even with stops at every hub.  If there are any, the itinerary can't be completed.
+        """
+        return self.get_feasibility_graph(aircraft_range).get_unreachable_airports(self.__airport_list[0],
+                                                                                   self.__airport_list)
+
+    def get_critical_range(self):
+        """
+        Returns the shortest range (km) with which an aircraft can complete the itinerary, or None if no route
+        meets the constraints.
+
+        A route can be flown if its longest leg is within the aircraft's range, so the shortest range is the
+        length of one of the legs between the airports and hubs, the longest leg of the route whose longest leg
+        is shortest.  The legs are searched by bisection: for each length, iter_feasible_routes() shows whether
+        any route can be flown, which is quick because it abandons a permutation as soon as a leg is too long.
+        No leg can be shorter than the shortest flight into each airport in the itinerary, so the search starts
+        from the longest of those.  An itinerary that only visits the home airport has no legs to fly, so its
+        critical range is 0.
+        """
+        rows = self.get_distance_matrix().rows
+        airport_ids = [self.get_distance_matrix().get_index(airport) for airport in self.__airport_list]
+        if len(set(airport_ids)) == 1:
+            lower_bound = 0
+        else:
+            lower_bound = max(min([distance for distance in rows[airport] if distance > 0], default=0)
+                              for airport in airport_ids)
+        leg_lengths = sorted(set(distance for row in rows for distance in row if distance >= lower_bound))
+        if not leg_lengths or not self.__can_be_completed(leg_lengths[-1]):
+            return None
+        low, high = 0, len(leg_lengths) - 1                 # the range leg_lengths[high] is always long enough
+        while low < high:
+            middle = (low + high) // 2
+            if self.__can_be_completed(leg_lengths[middle]):
+                high = middle
+            else:
+                low = middle + 1
+        return leg_lengths[high]
+
+    def get_range_breakpoints(self):
+        """
+        Returns the ranges (km) at which more routes become possible, shortest first: the critical range (see
+        get_critical_range()) and the length of every longer leg between the airports and hubs.  Between two
+        breakpoints the same routes can be flown, though their costs still change with the size of the tank.
+        """
+        critical_range = self.get_critical_range()
+        if critical_range is None:
+            return []
+        return sorted(set(distance for row in self.get_distance_matrix().rows for distance in row
+                          if distance >= critical_range))
+
+    def __can_be_completed(self, aircraft_range):
+        """ Returns True if an aircraft with the given range can fly at least one route. """
+        if self.get_unreachable_airports(aircraft_range):
+            return False
+        return next(self.iter_feasible_routes(aircraft_range), None) is not None
+
+    def get_countries(self):
+        """ Returns the countries of the airports in the itinerary and the hubs, without repeats. """
+        countries = []
+        for airport in self.__airport_list + self.__hubs:
+            if self.__airport_atlas.is_in_airport_dictionary(airport):
+                country = self.__airport_atlas.get_country(airport)
+                if country not in countries:
+                    countries.append(country)
+        return countries
+
+    def get_signature(self):
+        """
+        Returns a description of the itinerary that is the same for any itinerary with the same cheapest routes:
+        the home airport, the other airports (in any order), the aircraft's range, the hubs, the constraints,
+        the stopover cost, the empty tank option, the refuelling algorithm and a hash of the fuel price at each
+        airport and the distances between them.  It can be saved as JSON (see ResultCache).
+        """
+        distance_matrix = self.get_distance_matrix()
+        codes = sorted(distance_matrix.get_airport_codes())
+        fuel_prices = [self.__currency_table.get_exchange_rate(self.__airport_atlas.get_country(code))
+                       for code in codes]
+        distances = [distance_matrix.get_distance(code1, code2) for i, code1 in enumerate(codes)
+                     for code2 in codes[i + 1:]]
+        fingerprint = sha256(repr((codes, fuel_prices, distances)).encode("utf8")).hexdigest()
+        return [self.__airport_list[0], sorted(self.__airport_list[1:]), float(self.__aircraft_range),
+                sorted(self.__hubs), sorted(list(constraint) for constraint in self.__constraints),
+                float(self.__stopover_cost), bool(self.__empty_tank), self.__refuelling_algorithm, fingerprint]
+
+    def get_search_space(self):
+        """ Returns an ItinerarySearchSpace describing every possible route for this itinerary. """
+        distance_matrix = self.get_distance_matrix()
+        airport_codes = distance_matrix.get_airport_codes()
+        return ItinerarySearchSpace(airport_codes, len(self.__airport_list), self.__get_fuel_prices(airport_codes),
+                                    distance_matrix,
+                                    self.__aircraft_range, self.__empty_tank, self.__stopover_cost,
+                                    self.__constraints)
 
     def add_an_optional_extra_stop(self, route):
         """
@@ -42,42 +174,131 @@ class Itinerary:
         Note: The home airport will always be the same.
         Any one airport, including the home airport, may be revisited once.
         """
+        return list(self.iter_optional_extra_stops(route))
+
+    def iter_optional_extra_stops(self, route):
+        """ Yields the routes returned by add_an_optional_extra_stop(), one at a time. """
         visitable_airports = route[:]
         for airport in self.__hubs:  # don't hard-code this
             if airport not in visitable_airports:
                 visitable_airports.append(airport)
-        output_list = [route]
+        yield route
         for position in range(len(route) - 1):
             for airport in visitable_airports:
                 if airport != route[position] and airport != route[position + 1]:
                     new_list = route[:]
                     new_list.insert(position + 1, airport)
-                    output_list.append(new_list)
+                    yield new_list
         for airport in visitable_airports:
             if airport != route[0] and airport != route[-1]:
                 new_list = route[:]
                 new_list.append(airport)
-                output_list.append(new_list)
-        return output_list
+                yield new_list
 
     def build_route_list(self):
         """ Returns a list of every possible route for a given itinerary. """
+        return list(self.iter_routes())
+
+    def iter_routes(self):
+        """
+        Yields every possible route for a given itinerary, in the same order as build_route_list(),
+        without holding the whole list in memory.
+
+        Each permutation of the non-home airports is generated in turn, the optional extra fuel stop is
+        added to it, and the routes that don't meet the constraints are dropped.  The permutations are
+        built one airport at a time, and a partial permutation is abandoned as soon as the constraint
+        checker shows that no route built from it can meet the constraints.
+        """
+        home_airport, *non_home_airports = self.__airport_list
+        for route in self.__iter_permutations([home_airport], non_home_airports):
+            for route_with_extra_stop in self.iter_optional_extra_stops(route):
+                if self.__constraint_checker.is_met(route_with_extra_stop):
+                    yield route_with_extra_stop
+
+    def __iter_permutations(self, partial_route, remaining_airports):
+        """
+        Yields partial_route followed by each permutation of remaining_airports, in the same order as
+        itertools.permutations(), skipping the ones that cannot meet the constraints.
+        """
+        if not remaining_airports:
+            yield partial_route[:]
+            return
+        for i, airport in enumerate(remaining_airports):
+            partial_route.append(airport)
+            still_to_come = remaining_airports[:i] + remaining_airports[i + 1:]
+            if self.__constraint_checker.can_be_met(partial_route, still_to_come):
+                yield from self.__iter_permutations(partial_route, still_to_come)
+            partial_route.pop()
+
+    def iter_feasible_routes(self, aircraft_range=None):
+        """
+        Yields the routes from iter_routes() that the aircraft (or an aircraft with the given range) can fly, in the
+        same order, leaving out those with a leg beyond its range without building a Route for them.
+
+        A leg that is too long can only be flown by making the optional extra stop part of the way along it, so a
+        partial permutation is abandoned as soon as it has a leg that can't be split like that, or a second leg
+        that is too long.  If a permutation has a leg that is too long, the extra stop is only tried on that leg.
+        """
+        graph = self.get_feasibility_graph(aircraft_range)
         home_airport, *non_home_airports = self.__airport_list
-        route_permutations = permutations(non_home_airports)  # get all permutations of non-home airports
-
-        # add the optional extra fuel stop
-        route_list = []
-        for i in route_permutations:
-            i = list(i)
-            i.insert(0, home_airport)
-            extra_fuel_stops = self.add_an_optional_extra_stop(i)
-            for route in extra_fuel_stops:
-                route_list.append(route)
-
-        # apply __constraints
-        if len(self.__constraints) > 0:
-            route_list = self.apply_constraints(route_list, self.__constraints)
-        return route_list
+        for route, long_leg in self.__iter_feasible_permutations([home_airport], non_home_airports, None, graph):
+            for route_with_extra_stop in self.__iter_feasible_extra_stops(route, long_leg, graph):
+                if self.__constraint_checker.is_met(route_with_extra_stop):
+                    yield route_with_extra_stop
+
+    def __iter_feasible_permutations(self, partial_route, remaining_airports, long_leg, graph):
+        """
+        Yields (permutation, long leg) like __iter_permutations(), skipping the permutations that can't be flown
+        with one extra stop.  The long leg is the position of the leg that is too long (the last position is the
+        flight home), or None.
+        """
+        if not remaining_airports:
+            can_be_flown, long_leg = self.__check_leg(partial_route, partial_route[0], long_leg, graph)
+            if can_be_flown:
+                yield partial_route[:], long_leg
+            return
+        for i, airport in enumerate(remaining_airports):
+            can_be_flown, next_long_leg = self.__check_leg(partial_route, airport, long_leg, graph)
+            if not can_be_flown:
+                continue
+            partial_route.append(airport)
+            still_to_come = remaining_airports[:i] + remaining_airports[i + 1:]
+            if self.__constraint_checker.can_be_met(partial_route, still_to_come):
+                yield from self.__iter_feasible_permutations(partial_route, still_to_come, next_long_leg, graph)
+            partial_route.pop()
+
+    @staticmethod
+    def __check_leg(partial_route, next_airport, long_leg, graph):
+        """
+        Returns whether the leg from the end of a partial route to the next airport can be flown, making the extra
+        stop along it if necessary, and the position of the leg that is too long afterwards.
+        """
+        if graph.is_feasible(partial_route[-1], next_airport):
+            return True, long_leg
+        if long_leg is None and graph.can_be_bridged(partial_route[-1], next_airport):
+            return True, len(partial_route) - 1
+        return False, long_leg
+
+    def __iter_feasible_extra_stops(self, route, long_leg, graph):
+        """ Yields the routes from iter_optional_extra_stops() in which every leg can be flown. """
+        visitable_airports = route[:]
+        for airport in self.__hubs:
+            if airport not in visitable_airports:
+                visitable_airports.append(airport)
+        if long_leg is None:
+            yield route
+        for position in range(len(route)):
+            if long_leg is not None and position != long_leg:
+                continue
+            previous_airport = route[position]
+            next_airport = route[(position + 1) % len(route)]
+            destinations = graph.get_destinations(previous_airport)
+            for airport in visitable_airports:
+                if airport in destinations and airport != previous_airport and airport != next_airport \
+                        and next_airport in graph.get_destinations(airport):
+                    new_list = route[:]
+                    new_list.insert(position + 1, airport)
+                    yield new_list
 
     def is_valid_constraint(self, constraint, airport_list):
         """ Checks whether a constraint is valid. """
@@ -108,71 +329,278 @@ class Itinerary:
         return valid_constraints
 
     def apply_constraints(self, route_list, constraints):
-        valid_route_list = route_list                                # all routes that meet the constraints so far
+        """ Returns the routes in route_list that meet every constraint. """
+        constraint_checker = ConstraintChecker(constraints)
+        return [route for route in route_list if constraint_checker.is_met(route)]
 
-        # iterate through all constraints, eliminating routes from valid_route_list
-        for constraint in constraints:
-            new_route_list = []
-
-            if len(constraint) == 2:
-                for route in valid_route_list:
-                    airport0 = route.index(constraint[0])  # first visit to airport1
-                    airport1 = (len(route) - 1) - route[::-1].index(constraint[1])  # last visit to airport2
-
-                    # if route meets constraint, append to new_route_list
-                    if airport0 < airport1:
-                        new_route_list.append(route)
-
-            elif len(constraint) == 3:
-                for route in valid_route_list:
-                    airport0 = route.index(constraint[0])  # first visit to airport1
-                    airport2 = (len(route) - 1) - route[::-1].index(constraint[2])  # last visit to airport3
-
-                    # if route meets constraint, append to new_route_list
-                    if airport0 < airport2:
-                        if constraint[1] in route[airport0 + 1:airport2]:
-                            new_route_list.append(route)
-            valid_route_list = new_route_list
-        return valid_route_list
-
-    def get_cheapest_route(self):
-        # calculates the cost of each possible route and returns the cheapest route (and its cost)
+    @staticmethod
+    def meets_constraints(route, constraints):
+        """ Checks whether a route meets every constraint (see ConstraintChecker.is_met()). """
+        return ConstraintChecker(constraints).is_met(route)
+
+    def get_cheapest_route(self, solver="enumerate", workers=1, result_cache=None, keep_candidates=False):
+        """
+        Calculates the cost of the possible routes and returns the cheapest route (and its cost).
+
+        The solver parameter chooses how the routes are searched:
+        "enumerate" lists every possible route and prices each one.  This is the reference method.
+        "dynamic" uses DynamicProgrammingSolver, which finds an equally cheap route without listing
+        every route, so it can be used for itineraries with many more airports.
+        "kernel" lists every possible route like "enumerate", but prices each one with RouteKernel, which
+        works on arrays of airport ids.  A Route is only built for the cheapest route.
+        "batch" lists every possible route and prices all the routes with the same number of stops together
+        with BatchRouteEvaluator, which needs NumPy.
+        "branch_and_bound" uses BranchAndBoundSolver, which abandons partial routes that cannot beat the
+        cheapest route found so far.  The number of partial routes expanded and pruned is printed and
+        saved in self.search_statistics.  If workers is more than 1, the search is split by the first stops
+        after home and shared out among that many worker processes (see BranchAndBoundSolver); the route
+        found is the same.
+
+        If a ResultCache is given and it holds the result for an itinerary with the same signature, that
+        result is used instead of solving the itinerary; otherwise the result is stored in it.
+
+        If keep_candidates is True, every route that can be flown is priced and kept, with its cost, as
+        CandidateRoutes (whatever the solver), so that reprice() can find the cheapest route again when exchange
+        rates change.  The routes are priced as by the "kernel" solver.  If they can't be kept (an airport is
+        listed twice, or there are too many routes), the itinerary is solved with the solver instead, and keeping
+        them isn't tried again.
+
+        The real-time exchange rates are held (see CurrencyTable.real_time_rates_held()) until the itinerary is
+        solved, so the signature, the search and the cheapest route are all priced with the same rates.
+        """
+        with self.__currency_table.real_time_rates_held():
+            return self.__solve(solver, workers, result_cache, keep_candidates)
+
+    def __solve(self, solver, workers, result_cache, keep_candidates):
         if self.__error is not None:                                  # if there are no valid routes for this itinerary
             return None, 10 ** 10
-        lowest_cost = 10 ** 10                        # method will return this number if itinerary cannot be completed
-        self.route_list = self.build_route_list()
-        self.cheapest_route = None
-
-        for route in self.route_list:
-            total_cost_of_stopovers = self.__stopover_cost * (len(route) - len(self.__airport_list))
-            try:
-                current_route = Route(route,
-                                      self.__aircraft_range,
-                                      self.__airport_atlas,
-                                      self.__currency_table,
-                                      self.__empty_tank,
-                                      total_cost_of_stopovers)
-            except ImpossibleRouteError:
-                continue                                              # this route has a leg that cannot be completed
-            else:
-                current_route_cost = current_route.get_cost_of_route()
-                if current_route_cost < lowest_cost:
-                    self.cheapest_route = current_route
-                    lowest_cost = current_route_cost
+        unreachable_airports = self.get_unreachable_airports()
+        if not unreachable_airports:
+            self.__currency_table.prefetch_real_time_rates(self.get_countries())
+        signature = None if result_cache is None or unreachable_airports else self.get_signature()
+        cached_solution = None if signature is None else result_cache.get_result(signature)
+        if unreachable_airports:
+            print("Unable to reach", ", ".join(unreachable_airports), "and return home")
+            self.cheapest_route = None                                # so there is nothing to search
+        elif cached_solution is not None:
+            print("Found in the result cache")
+            self.set_solution(cached_solution)
+        elif keep_candidates and self.__candidate_routes_can_be_kept and self.__keep_candidate_routes():
+            self.cheapest_route = self.__find_cheapest_route_from_candidates()
+        elif solver == "enumerate":
+            self.cheapest_route = self.__find_cheapest_route_by_enumeration()
+        elif solver == "kernel":
+            self.cheapest_route = self.__find_cheapest_route_with_kernel()
+        elif solver == "batch":
+            self.cheapest_route = self.__find_cheapest_route_in_batches()
+        elif solver == "dynamic":
+            self.cheapest_route = self.__find_cheapest_route_with_solver(DynamicProgrammingSolver)
+        elif solver == "branch_and_bound":
+            self.cheapest_route = self.__find_cheapest_route_with_solver(BranchAndBoundSolver, workers)
+        else:
+            raise ValueError("Unknown solver: " + str(solver))
+        if self.cheapest_route is None:
+            lowest_cost = 10 ** 10                    # method will return this number if itinerary cannot be completed
+        else:
+            lowest_cost = self.cheapest_route.get_cost_of_route()
         if lowest_cost == 10 ** 10:                                   # if itinerary cannot be completed
-            print("Aircraft has insufficient range to complete this itinerary.")
-            print("Consider using a larger aircraft or adding a fuel stop to the list of hubs.")
-            self.__error = "Aircraft has insufficient range to complete this itinerary." \
-                           "\nConsider using a larger aircraft or adding a fuel stop to the list of hubs."
+            print(INSUFFICIENT_RANGE_ERROR)
+            self.__error = INSUFFICIENT_RANGE_ERROR
             self.cheapest_route = None
         else:
             print()
             print(self.cheapest_route)
             self.cheapest_route.print_costs()
             print()
+        if self.search_statistics:
+            print("Search statistics:", ", ".join(str(value) + " " + key
+                                                  for key, value in self.search_statistics.items()))
         self.lowest_cost = lowest_cost
+        if signature is not None and cached_solution is None:
+            result_cache.store_result(signature, self.get_solution())
         return self.cheapest_route, lowest_cost
 
+    def reprice(self, solver="enumerate"):
+        """
+        Finds the cheapest route again after some exchange rates have changed (see
+        CurrencyTable.update_exchange_rates()) and returns it and its cost, like get_cheapest_route().
+
+        Only the routes through airports whose fuel price has changed are priced again, using the routes kept by
+        get_cheapest_route(keep_candidates=True).  If they weren't kept (e.g. the itinerary was solved by a
+        worker process or found in a result cache), they are kept the first time the itinerary is repriced.  If
+        they can't be kept, the itinerary is solved again with the solver each time.  The routes that can be
+        flown don't depend on the exchange rates, so an itinerary that couldn't be completed still can't.
+        """
+        if self.__candidate_routes is None:
+            return self.get_cheapest_route(solver, result_cache=None, keep_candidates=True)
+        if self.__error is not None:
+            return None, 10 ** 10
+        airport_codes = self.get_distance_matrix().get_airport_codes()
+        with self.__currency_table.real_time_rates_held():
+            self.__currency_table.prefetch_real_time_rates(self.get_countries())
+            routes_priced = self.__candidate_routes.update_fuel_prices(self.__get_fuel_prices(airport_codes))
+        self.cheapest_route = self.__find_cheapest_route_from_candidates()
+        self.lowest_cost = self.cheapest_route.get_cost_of_route()
+        self.search_statistics = {"routes priced again": routes_priced}
+        return self.cheapest_route, self.lowest_cost
+
+    def __get_fuel_prices(self, airport_codes):
+        return [self.__currency_table.get_exchange_rate(self.__airport_atlas.get_country(airport))
+                for airport in airport_codes]
+
+    def __keep_candidate_routes(self):
+        """
+        Prices every route that can be flown and keeps them as CandidateRoutes.  Returns False if they can't be
+        kept: if an airport is listed twice (the routes are lists of airport ids) or there are too many of them,
+        in which case they aren't tried again.
+        """
+        if len(set(self.__airport_list)) < len(self.__airport_list):
+            self.__candidate_routes_can_be_kept = False
+            return False
+        search_space = self.get_search_space()
+        airport_ids = {airport: i for i, airport in enumerate(search_space.airport_codes)}
+        try:
+            self.__candidate_routes = CandidateRoutes(search_space, ([airport_ids[airport] for airport in route]
+                                                                     for route in self.iter_feasible_routes()))
+        except TooManyCandidateRoutesError:
+            print("Too many routes to keep for repricing")
+            self.__candidate_routes_can_be_kept = False
+            return False
+        return True
+
+    def __find_cheapest_route_from_candidates(self):
+        """ Returns the cheapest of the kept CandidateRoutes as a Route (or None). """
+        route, cost = self.__candidate_routes.get_cheapest_route()
+        if route is None:
+            return None
+        airport_codes = self.get_distance_matrix().get_airport_codes()
+        return self.__make_route([airport_codes[airport] for airport in route])
+
+    def __find_cheapest_route_by_enumeration(self):
+        """ Prices every possible route and returns the cheapest Route (or None). """
+        lowest_cost = 10 ** 10
+        cheapest_route = None
+        for route in self.iter_feasible_routes():
+            current_route = self.__make_route(route)
+            if current_route is not None and current_route.get_cost_of_route() < lowest_cost:
+                cheapest_route = current_route
+                lowest_cost = current_route.get_cost_of_route()
+        return cheapest_route
+
+    def __find_cheapest_route_with_kernel(self):
+        """ Prices every possible route with RouteKernel and returns the cheapest as a Route (or None). """
+        if len(set(self.__airport_list)) < len(self.__airport_list):
+            return self.__find_cheapest_route_by_enumeration()
+        search_space = self.get_search_space()
+        kernel = RouteKernel(search_space)
+        airport_ids = {airport: i for i, airport in enumerate(search_space.airport_codes)}
+        lowest_cost = 10 ** 10
+        cheapest_route = None
+        for route, cost in self.__price_routes(self.iter_feasible_routes(), kernel, airport_ids):
+            if cost < lowest_cost:
+                cheapest_route = route
+                lowest_cost = cost
+        if cheapest_route is None:
+            return None
+        return self.__make_route(cheapest_route)
+
+    @staticmethod
+    def __price_routes(routes, kernel, airport_ids):
+        """ Yields (route, net cost) for each route that can be completed. """
+        for route in routes:
+            cost = kernel.get_cost_of_route([airport_ids[airport] for airport in route])
+            if cost is not None:
+                yield route, cost
+
+    def __find_cheapest_route_in_batches(self):
+        """
+        Prices every possible route with BatchRouteEvaluator and returns the cheapest as a Route (or None).
+        The routes are generated in chunks of ROUTES_PER_BATCH, and each chunk is priced in one batch for
+        each route length.
+        """
+        from BatchRouteEvaluator import BatchRouteEvaluator               # NumPy is only needed for this solver
+        if len(set(self.__airport_list)) < len(self.__airport_list):
+            return self.__find_cheapest_route_by_enumeration()
+        search_space = self.get_search_space()
+        evaluator = BatchRouteEvaluator(search_space)
+        airport_ids = {airport: i for i, airport in enumerate(search_space.airport_codes)}
+        lowest_cost = 10 ** 10
+        cheapest_route = None
+        routes = self.iter_feasible_routes()
+        while True:
+            chunk = list(islice(routes, ROUTES_PER_BATCH))
+            if not chunk:
+                break
+            batches = {}
+            for route in chunk:
+                batches.setdefault(len(route), []).append([airport_ids[airport] for airport in route])
+            for batch in batches.values():
+                index, cost = evaluator.get_cheapest_route(batch)
+                if index is not None and cost < lowest_cost:
+                    cheapest_route = batch[index]
+                    lowest_cost = cost
+        if cheapest_route is None:
+            return None
+        return self.__make_route(search_space.get_route_codes(cheapest_route))
+
+    def __find_cheapest_route_with_solver(self, solver_class, workers=1):
+        """ Finds the cheapest route with a route solver and returns it as a Route (or None). """
+        if len(self.__airport_list) < 2 or len(set(self.__airport_list)) < len(self.__airport_list):
+            # the solvers identify airports by id, so they can't handle an airport that is listed twice
+            return self.__find_cheapest_route_by_enumeration()
+        search_space = self.get_search_space()
+        solver = solver_class(search_space)
+        if workers > 1:
+            route, cost = solver.solve_in_parallel(workers)
+        else:
+            route, cost = solver.solve()
+        self.search_statistics = solver.get_statistics()
+        if route is None:
+            return None
+        return self.__make_route(search_space.get_route_codes(route))
+
+    def __make_route(self, route):
+        """ Returns a Route for a list of airport codes, or None if a leg is beyond the aircraft's range. """
+        total_cost_of_stopovers = self.__stopover_cost * (len(route) - len(self.__airport_list))
+        try:
+            return Route(route,
+                         self.__aircraft_range,
+                         self.__airport_atlas,
+                         self.__currency_table,
+                         self.__empty_tank,
+                         total_cost_of_stopovers,
+                         self.get_distance_matrix(),
+                         self.__refuelling_algorithm)
+        except ImpossibleRouteError:
+            return None                                               # this route has a leg that cannot be completed
+
+    def get_solution(self):
+        """
+        Returns the result of get_cheapest_route() in a form that can be sent to another process: the airport
+        codes of the cheapest route (or None), the error message (or None) and the search statistics.
+        A Route refers to the airport atlas and currency table, so it is not sent itself.
+        """
+        if self.cheapest_route is None or self.cheapest_route == 0:
+            route = None
+        else:
+            route = self.cheapest_route.get_airport_codes()
+        return route, self.__error, self.search_statistics
+
+    def set_solution(self, solution):
+        """
+        Stores a solution returned by get_solution(), rebuilding the cheapest Route.  If the route can't be flown
+        by this itinerary's aircraft (e.g. a saved solution for an aircraft whose range has since changed), the
+        itinerary is not completed.
+        """
+        route, self.__error, self.search_statistics = solution
+        self.cheapest_route = None if route is None else self.__make_route(route)
+        if self.cheapest_route is None:
+            self.lowest_cost = 10 ** 10
+            if route is not None:
+                self.__error = INSUFFICIENT_RANGE_ERROR
+        else:
+            self.lowest_cost = self.cheapest_route.get_cost_of_route()
+
     def get_error_message(self):
         """ Returns an error message explaining that the itinerary could not be completed. """
         return self.__error
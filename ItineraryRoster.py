@@ -1,59 +1,336 @@
 from Itinerary import Itinerary
-import csv, os
+from ResultCache import ResultCache
+from contextlib import redirect_stdout
+from collections import deque
+from itertools import islice
+import csv, os, io
 from time import strftime
 
+STREAM_BATCH_SIZE = 100                                 # the most itineraries held in memory at once when streaming
+worker_itineraries = []                                 # the itineraries of the roster, in each worker process
+worker_roster = None                                    # the streaming roster, in each worker process
+
+
 class ItineraryRoster:
     """
     ItineraryRoster: reads itineraries from a csv file and stores them as Itinerary objects in a list.
     Also contains a method for writing the program output to a csv file.
+
+    If streaming is True, the itineraries are not read when the roster is created.  Instead,
+    stream_cheapest_routes() reads, solves and writes them a few at a time, so a roster of any length can be
+    managed in a fixed amount of memory.
     """
 
     def __init__(self, airport_atlas, currency_table, aircraft_catalogue,
                  input_file='testroutes.csv', output_file='bestroutes/bestroutes.csv',
-                 append_date_time=True, empty_tank=False, hubs=[], stopover_cost=0):
+                 append_date_time=True, empty_tank=False, hubs=[], stopover_cost=0, streaming=False):
         self.aircraft_catalogue = aircraft_catalogue
         self.airport_atlas = airport_atlas
         self.currency_table = currency_table
         self.empty_tank = empty_tank
         self.hubs = hubs
         self.stopover_cost = stopover_cost
-        self.itinerary_list = self.build_itinerary_list(input_file)
+        self.input_file = input_file
+        if streaming:
+            with open(input_file, 'rt'):            # so that a missing file is reported now, as when not streaming
+                pass
+            self.itinerary_rows = []
+            self.itinerary_list = []
+        else:
+            self.itinerary_rows = list(self.iter_rows(input_file))
+            self.itinerary_list = [self.make_itinerary(row) for row in self.itinerary_rows]
         self.output_file = self.make_output_filename(output_file, append_date_time)
+        self.itineraries_managed = 0                # the numbers written to the output file
+        self.itineraries_not_completed = 0
         # self.write_to_csv()
 
     def build_itinerary_list(self, inputFile):
-        itineraryList = []
-        with open(inputFile, 'rt') as f:
-            reader = list(csv.reader(f))
-            for row in reader:
-                # detect number of airports in row
-                row_backwards = row[::-1]
-                number_of_airports = len(row_backwards) - 1
-                for i in range(len(row_backwards)):
-                    if row_backwards[i] == "":
-                        number_of_airports = len(row) - (i + 2)
-
-                airport_list = []
-                for i in range(number_of_airports):
-                    airport_list.append(row[i].upper())
-                aircraft_code = row[number_of_airports].upper()
-
-                # try to get the aircraft range from aircraft_catalogue
-                try:
-                    aircraft_range = self.aircraft_catalogue.get_aircraft_range(aircraft_code)
-                except KeyError:
-                    aircraft_range = None
-                new_itinerary = Itinerary(self.airport_atlas, self.currency_table,
-                                          airport_list, aircraft_code, aircraft_range,
-                                          self.empty_tank, self.hubs, self.stopover_cost)
-                itineraryList.append(new_itinerary)
-        return itineraryList
-
-    def get_cheapest_routes(self):
+        return list(self.iter_itineraries(inputFile))
+
+    @staticmethod
+    def iter_rows(input_file):
+        """ Reads the rows of a csv file of itineraries one at a time. """
+        with open(input_file, 'rt') as f:
+            yield from csv.reader(f)
+
+    def iter_itineraries(self, input_file):
+        """ Reads the itineraries in a csv file one at a time. """
+        for row in self.iter_rows(input_file):
+            yield self.make_itinerary(row)
+
+    def make_itinerary(self, row):
+        """ Makes an Itinerary from a row of the csv file. """
+        # detect number of airports in row
+        row_backwards = row[::-1]
+        number_of_airports = len(row_backwards) - 1
+        for i in range(len(row_backwards)):
+            if row_backwards[i] == "":
+                number_of_airports = len(row) - (i + 2)
+
+        airport_list = []
+        for i in range(number_of_airports):
+            airport_list.append(row[i].upper())
+        aircraft_code = row[number_of_airports].upper()
+
+        # try to get the aircraft range from aircraft_catalogue
+        try:
+            aircraft_range = self.aircraft_catalogue.get_aircraft_range(aircraft_code)
+        except KeyError:
+            aircraft_range = None
+        return Itinerary(self.airport_atlas, self.currency_table,
+                         airport_list, aircraft_code, aircraft_range,
+                         self.empty_tank, self.hubs, self.stopover_cost)
+
+    def get_cheapest_routes(self, workers=1, solver="enumerate", checkpoint=None, result_cache=None,
+                            keep_candidates=False):
+        """
+        Finds the cheapest route for each itinerary.
+
+        If workers is more than 1, the itineraries are shared out among that many worker processes.
+        The results are stored in the itineraries in this process, and the console output is printed in
+        the same order as the itineraries, so the output is the same as when they are solved one by one.
+        The real-time exchange rates needed by every itinerary are downloaded together first.
+
+        If a RosterCheckpoint is given, each solution is saved in it as soon as it is found, and the itineraries
+        that were solved by an earlier run (if the checkpoint is being resumed) are not solved again.
+
+        Itineraries with the same signature (see Itinerary.get_signature()) are only solved once: the results
+        are kept in the given ResultCache, or in a new one for this roster.  The results stored in the cache's
+        file are committed in batches (see ResultCache.batched_commits()).
+
+        If keep_candidates is True, the itineraries solved in this process keep their possible routes (see
+        Itinerary.get_cheapest_route()), so that reprice() only has to price the routes through airports whose
+        fuel price has changed.  Itineraries solved by worker processes, or found in the result cache or the
+        checkpoint, don't keep them; they are kept the first time the itinerary is repriced.
+        """
+        if result_cache is None:
+            result_cache = ResultCache()
+        saved_solutions = self.__start_checkpoint(checkpoint, solver)
+        try:
+            with result_cache.batched_commits():
+                countries = []
+                for itinerary in self.itinerary_list:
+                    countries += itinerary.get_countries()
+                self.currency_table.prefetch_real_time_rates(countries)
+                saved = [self.__get_saved_solution(checkpoint, saved_solutions, row_number, row,
+                                                   self.itinerary_list[row_number])
+                         for row_number, row in enumerate(self.itinerary_rows)]
+                unsolved = [row_number for row_number, solution in enumerate(saved) if solution is None]
+                if workers > 1 and len(unsolved) > 1:
+                    self.__get_cheapest_routes_in_parallel(workers, solver, checkpoint, saved, unsolved, result_cache)
+                    return
+                for row_number, itinerary in enumerate(self.itinerary_list):
+                    print("\n", "*" * 75, sep="")
+                    print(itinerary)
+                    if saved[row_number] is not None:
+                        self.__restore_solution(itinerary, saved[row_number])
+                    else:
+                        itinerary.get_cheapest_route(solver, result_cache=result_cache,
+                                                     keep_candidates=keep_candidates)
+                        self.__save_solution(checkpoint, row_number, self.itinerary_rows[row_number], itinerary)
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+
+    def __get_cheapest_routes_in_parallel(self, workers, solver, checkpoint, saved, unsolved, result_cache):
+        # only the first itinerary with each signature is sent to the workers; the others are looked up in the
+        # result cache in this process, after the first one's result has been stored
+        signatures = {}
+        keys = set()
+        for row_number in unsolved:
+            itinerary = self.itinerary_list[row_number]
+            if itinerary.get_error_message() is None:
+                signature = itinerary.get_signature()
+                key = ResultCache.get_key(signature)
+                if key not in keys and not result_cache.has_result(signature):
+                    signatures[row_number] = signature
+                    keys.add(key)
+
+        # the itineraries are sent to each worker once, rather than with every task, because they all share
+        # the airport atlas and currency table
+        from concurrent.futures import ProcessPoolExecutor          # only imported when it is needed
+        with ProcessPoolExecutor(max_workers=max(1, min(workers, len(signatures))),
+                                 initializer=start_worker, initargs=(self.itinerary_list,)) as executor:
+            results = executor.map(solve_itinerary, list(signatures), [solver] * len(signatures))
+            for row_number, itinerary in enumerate(self.itinerary_list):
+                print("\n", "*" * 75, sep="")
+                print(itinerary)
+                if saved[row_number] is not None:
+                    self.__restore_solution(itinerary, saved[row_number])
+                elif row_number in signatures:
+                    solution, console_output = next(results)
+                    print(console_output, end="")
+                    itinerary.set_solution(solution)
+                    result_cache.store_result(signatures[row_number], solution)
+                    self.__save_solution(checkpoint, row_number, self.itinerary_rows[row_number], itinerary)
+                else:
+                    itinerary.get_cheapest_route(solver, result_cache=result_cache)
+                    self.__save_solution(checkpoint, row_number, self.itinerary_rows[row_number], itinerary)
+
+    def reprice(self, countries, solver="enumerate"):
+        """
+        Finds the cheapest routes again after the exchange rates of some countries have changed (see
+        CurrencyTable.update_exchange_rates()).  Only the itineraries that visit one of the countries are
+        priced again, with Itinerary.reprice(), and itineraries with the same signature are only priced once.
+        The solver is used for itineraries whose possible routes can't be kept.
+        Returns the number of itineraries priced again.  Call write_to_csv() to save the new routes.
+        """
+        countries = set(countries)
+        repriced = {}                                     # signature key -> the itinerary priced again
         for itinerary in self.itinerary_list:
-            print("\n", "*" * 75, sep="")
-            print(itinerary)
-            itinerary.get_cheapest_route()
+            if itinerary.get_error_message() is not None or countries.isdisjoint(itinerary.get_countries()):
+                continue
+            key = ResultCache.get_key(itinerary.get_signature())
+            if key in repriced:
+                itinerary.set_solution(repriced[key].get_solution())
+            else:
+                with redirect_stdout(io.StringIO()):
+                    itinerary.reprice(solver)
+                repriced[key] = itinerary
+        return len(repriced)
+
+    def stream_cheapest_routes(self, workers=1, solver="enumerate", batch_size=STREAM_BATCH_SIZE, checkpoint=None,
+                               result_cache=None):
+        """
+        Reads the itineraries from the input file, finds the cheapest route for each one and writes it to the
+        output file, without keeping the whole roster in memory.  The rows are written (and flushed) in the
+        same order as the itineraries as soon as they are ready, so the output file can be read while the
+        roster is being managed, and it ends up the same as the file written by write_to_csv().
+
+        At most batch_size itineraries are held in memory at once.  If workers is more than 1, the rows of the
+        csv file are sent to that many worker processes, which make and solve the itineraries, and up to
+        batch_size rows are being solved at a time.  Otherwise the itineraries are solved in batches of
+        batch_size.  Either way, the real-time exchange rates needed by the rows read together are downloaded
+        together first.
+
+        A RosterCheckpoint and a ResultCache can be given as in get_cheapest_routes().  The solutions saved by
+        an earlier run are held in memory while resuming.
+        """
+        if result_cache is None:
+            result_cache = ResultCache()
+        self.itineraries_managed = 0
+        self.itineraries_not_completed = 0
+        saved_solutions = self.__start_checkpoint(checkpoint, solver)
+        try:
+            with open(os.path.join(self.output_file), "wt", newline="") as output, \
+                    open(self.input_file, 'rt') as f, result_cache.batched_commits():
+                writer = csv.writer(output, delimiter=",")
+                self.__write_header(writer)
+                rows = enumerate(csv.reader(f))
+                if workers > 1:
+                    solved_itineraries = self.__stream_solutions_in_parallel(rows, workers, solver, batch_size,
+                                                                             checkpoint, saved_solutions,
+                                                                             result_cache)
+                else:
+                    solved_itineraries = self.__stream_solutions(rows, solver, batch_size,
+                                                                 checkpoint, saved_solutions, result_cache)
+                for itinerary in solved_itineraries:
+                    self.__write_itinerary(writer, itinerary)
+                    output.flush()
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+        print("Report successfully saved to", self.output_file)
+
+    def __stream_solutions(self, rows, solver, batch_size, checkpoint, saved_solutions, result_cache):
+        while True:
+            batch = [(row_number, row, self.make_itinerary(row)) for row_number, row in islice(rows, batch_size)]
+            if not batch:
+                return
+            countries = []
+            for row_number, row, itinerary in batch:
+                countries += itinerary.get_countries()
+            self.currency_table.prefetch_real_time_rates(countries)
+            for row_number, row, itinerary in batch:
+                print("\n", "*" * 75, sep="")
+                print(itinerary)
+                solution = self.__get_saved_solution(checkpoint, saved_solutions, row_number, row, itinerary)
+                if solution is not None:
+                    self.__restore_solution(itinerary, solution)
+                else:
+                    itinerary.get_cheapest_route(solver, result_cache=result_cache)
+                    self.__save_solution(checkpoint, row_number, row, itinerary)
+                yield itinerary
+
+    def __stream_solutions_in_parallel(self, rows, workers, solver, batch_size, checkpoint, saved_solutions,
+                                       result_cache):
+        # the roster (without any itineraries) is sent to each worker once, and then each task is just a row.
+        # A row is only sent if no other row with the same signature is being solved and its result isn't in
+        # the result cache; otherwise it is looked up in the result cache when its turn comes.
+        # Rows are read in windows of up to batch_size, whenever half of the rows in flight have been written, and
+        # the real-time exchange rates for each window are downloaded together before its rows are sent, with the
+        # rates that each row needs, so that neither this process nor the workers download them one at a time.
+        from concurrent.futures import ProcessPoolExecutor          # only imported when it is needed
+        with ProcessPoolExecutor(max_workers=workers, initializer=start_streaming_worker,
+                                 initargs=(self,)) as executor:
+            solving = deque()
+            being_solved = set()                        # the keys of the signatures of the rows sent to workers
+            while True:
+                if len(solving) <= batch_size // 2:
+                    window = [(row_number, row, self.make_itinerary(row))
+                              for row_number, row in islice(rows, batch_size - len(solving))]
+                    countries = []
+                    for row_number, row, itinerary in window:
+                        countries += itinerary.get_countries()
+                    self.currency_table.prefetch_real_time_rates(countries)
+                    for row_number, row, itinerary in window:
+                        solution = self.__get_saved_solution(checkpoint, saved_solutions, row_number, row,
+                                                             itinerary)
+                        signature = None
+                        future = None
+                        if solution is None and itinerary.get_error_message() is None:
+                            signature = itinerary.get_signature()
+                            key = ResultCache.get_key(signature)
+                            if key not in being_solved and not result_cache.has_result(signature):
+                                real_time_rates = self.currency_table.get_real_time_rates(itinerary.get_countries())
+                                future = executor.submit(solve_row, row, solver, real_time_rates)
+                                being_solved.add(key)
+                        solving.append((row_number, row, itinerary, signature, future, solution))
+                if not solving:
+                    return
+                yield self.__get_streamed_solution(solver, checkpoint, result_cache, being_solved,
+                                                   *solving.popleft())
+
+    def __get_streamed_solution(self, solver, checkpoint, result_cache, being_solved,
+                                row_number, row, itinerary, signature, future, saved_solution):
+        print("\n", "*" * 75, sep="")
+        print(itinerary)
+        if saved_solution is not None:
+            self.__restore_solution(itinerary, saved_solution)
+        elif future is not None:
+            solution, console_output = future.result()
+            print(console_output, end="")
+            itinerary.set_solution(solution)
+            result_cache.store_result(signature, solution)
+            being_solved.discard(ResultCache.get_key(signature))
+            self.__save_solution(checkpoint, row_number, row, itinerary)
+        else:
+            itinerary.get_cheapest_route(solver, result_cache=result_cache)
+            self.__save_solution(checkpoint, row_number, row, itinerary)
+        return itinerary
+
+    def __start_checkpoint(self, checkpoint, solver):
+        """ Starts the checkpoint (if there is one) and returns the solutions that can be reused. """
+        if checkpoint is None:
+            return {}
+        return checkpoint.start({"input_file": os.path.abspath(self.input_file), "empty_tank": self.empty_tank,
+                                 "hubs": self.hubs, "stopover_cost": self.stopover_cost, "solver": solver})
+
+    @staticmethod
+    def __get_saved_solution(checkpoint, saved_solutions, row_number, row, itinerary):
+        if checkpoint is None:
+            return None
+        return checkpoint.get_solution(saved_solutions, row_number, row, itinerary.get_aircraft_range())
+
+    @staticmethod
+    def __save_solution(checkpoint, row_number, row, itinerary):
+        if checkpoint is not None:
+            checkpoint.save(row_number, row, itinerary.get_aircraft_range(), itinerary.get_solution())
+
+    @staticmethod
+    def __restore_solution(itinerary, solution):
+        itinerary.set_solution(solution)
+        print("Solved by an earlier run (restored from the checkpoint)")
 
     def make_output_filename(self, output_file, append_date_time):
         """
@@ -69,14 +346,63 @@ class ItineraryRoster:
             return new_output_file
 
     def write_to_csv(self):
+        self.itineraries_managed = 0
+        self.itineraries_not_completed = 0
         with open(os.path.join(self.output_file), "wt", newline="") as f:
             writer = csv.writer(f, delimiter=",")
-            writer.writerow(["Net fuel cost", "Value of fuel brought home", "Total cost of stopovers",
-                             "Total fuel purchase", "Home airport", "Fuel purchase", "Airport", "Fuel purchase",
-                             "Airport", "Fuel purchase", "Airport", "Fuel purchase", "Airport", "Fuel purchase"])
+            self.__write_header(writer)
             for itinerary in self.itinerary_list:
-                if itinerary.get_error_message() is not None:
-                    writer.writerow([itinerary.get_error_message().replace("\n", " ")])
-                else:
-                    writer.writerow(itinerary.cheapest_route.make_csv_row())
+                self.__write_itinerary(writer, itinerary)
         print("Report successfully saved to", self.output_file)
+
+    @staticmethod
+    def __write_header(writer):
+        writer.writerow(["Net fuel cost", "Value of fuel brought home", "Total cost of stopovers",
+                         "Total fuel purchase", "Home airport", "Fuel purchase", "Airport", "Fuel purchase",
+                         "Airport", "Fuel purchase", "Airport", "Fuel purchase", "Airport", "Fuel purchase"])
+
+    def __write_itinerary(self, writer, itinerary):
+        self.itineraries_managed += 1
+        if itinerary.get_error_message() is not None:
+            self.itineraries_not_completed += 1
+            writer.writerow([itinerary.get_error_message().replace("\n", " ")])
+        else:
+            writer.writerow(itinerary.cheapest_route.make_csv_row())
+
+
+def start_worker(itineraries):
+    """ Stores the roster's itineraries in a worker process. """
+    global worker_itineraries
+    worker_itineraries = itineraries
+
+
+def solve_itinerary(index, solver):
+    """
+    Finds the cheapest route for one of the roster's itineraries in a worker process.
+    Returns the itinerary's solution (see Itinerary.get_solution()) and what it printed to the console.
+    """
+    itinerary = worker_itineraries[index]
+    console_output = io.StringIO()
+    with redirect_stdout(console_output):
+        itinerary.get_cheapest_route(solver)
+    return itinerary.get_solution(), console_output.getvalue()
+
+
+def start_streaming_worker(roster):
+    """ Stores a streaming roster in a worker process. """
+    global worker_roster
+    worker_roster = roster
+
+
+def solve_row(row, solver, real_time_rates):
+    """
+    Makes an itinerary from a row of the roster's csv file and finds its cheapest route in a worker process,
+    using the real-time exchange rates already downloaded (see CurrencyTable.get_real_time_rates()).
+    Returns the itinerary's solution and what it printed to the console.
+    """
+    worker_roster.currency_table.set_real_time_rates(real_time_rates)
+    itinerary = worker_roster.make_itinerary(row)
+    console_output = io.StringIO()
+    with redirect_stdout(console_output):
+        itinerary.get_cheapest_route(solver)
+    return itinerary.get_solution(), console_output.getvalue()
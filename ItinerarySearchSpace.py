@@ -0,0 +1,136 @@
+from fuel_window import buy_fuel_for_leg, buy_fuel_to_bring_home, get_net_cost
+from array import array
+
+
+class ItinerarySearchSpace:
+    """
+    ItinerarySearchSpace: a compact description of every route that can be built for an itinerary.
+
+    Each airport is identified by its integer id in the itinerary's DistanceMatrix:
+    id 0 is the home airport, ids 1 to n - 1 are the other airports in the itinerary and any
+    remaining ids are hubs.  Fuel prices are held in an array indexed by airport id.
+
+    A route starts at the home airport, visits every other airport in the itinerary and returns home.
+    As in Itinerary.add_an_optional_extra_stop(), one extra stop may be made at any hub or at any
+    airport in the itinerary (including the home airport), provided that the aircraft does not fly
+    from an airport to itself and the route does not end with an extra visit to the home airport.
+
+    Constraints are compiled into bit flags.  A two-airport constraint [a, b] is met as soon as b is
+    visited after a; a three-airport constraint [a, b, c] needs b to be visited after a (the first flag)
+    and then c to be visited after that (the second flag).  This is equivalent to the checks made by
+    Itinerary.apply_constraints().
+    """
+
+    def __init__(self, airport_codes, itinerary_size, fuel_prices, distance_matrix, fuel_capacity,
+                 empty_tank=False, stopover_cost=0, constraints=[]):
+        self.airport_codes = airport_codes
+        self.size = len(airport_codes)
+        self.itinerary_size = itinerary_size
+        self.fuel_prices = array('d', fuel_prices)
+        self.distances = distance_matrix.rows
+        self.fuel_capacity = fuel_capacity
+        self.empty_tank = empty_tank
+        self.stopover_cost = stopover_cost
+        self.home_fuel_price = self.fuel_prices[0]
+
+        # a bit for every airport in the itinerary; the home airport is visited at the start
+        self.all_visited = (1 << itinerary_size) - 1
+
+        self.__constraint_updates, self.all_constraints_met = self.__compile_constraints(constraints)
+
+        # the shortest flight within range into each airport (infinite if the airport can't be reached)
+        self.shortest_leg_to = array('d', [min([self.distances[airport][destination] for airport in range(self.size)
+                                                if airport != destination
+                                                and self.distances[airport][destination] <= fuel_capacity],
+                                               default=float("inf"))
+                                           for destination in range(self.size)])
+
+    def __compile_constraints(self, constraints):
+        """
+        Returns, for each airport id, a list of (required airport, required flag, flag to set) tuples,
+        and the combination of flags that shows every constraint has been met.
+        """
+        updates = [[] for _ in range(self.size)]
+        all_constraints_met = 0
+        bit = 1
+        for constraint in constraints:
+            ids = [self.airport_codes.index(airport) for airport in constraint]
+            if len(ids) == 2:
+                updates[ids[1]].append((1 << ids[0], 0, bit))
+                all_constraints_met |= bit
+                bit <<= 1
+            else:
+                updates[ids[1]].append((1 << ids[0], 0, bit))
+                updates[ids[2]].append((0, bit, bit << 1))
+                all_constraints_met |= bit << 1
+                bit <<= 2
+        return updates, all_constraints_met
+
+    def get_constraint_flags(self, airport, visited, flags):
+        """ Returns the constraint flags after visiting an airport, given the airports visited before it. """
+        new_flags = flags
+        for required_airport, required_flag, flag in self.__constraint_updates[airport]:
+            if visited & required_airport or flags & required_flag:
+                new_flags |= flag
+        return new_flags
+
+    def get_next_stops(self, airport, visited, extra_stop_made):
+        """
+        Yields (next airport, is extra stop) for every airport that can follow the given airport.
+        Flights beyond the aircraft's range are not included.
+        """
+        distances = self.distances[airport]
+        fuel_capacity = self.fuel_capacity
+        for next_airport in range(self.size):
+            if next_airport == airport or distances[next_airport] > fuel_capacity:
+                continue
+            if next_airport < self.itinerary_size and not visited & (1 << next_airport):
+                yield next_airport, False
+            elif not extra_stop_made:
+                yield next_airport, True
+
+    def can_return_home(self, airport, visited, flags):
+        """ Returns True if a route that has reached this state can finish with a flight home. """
+        return airport != 0 and visited == self.all_visited \
+            and flags & self.all_constraints_met == self.all_constraints_met \
+            and self.distances[airport][0] <= self.fuel_capacity
+
+    def get_shortest_remaining_distance(self, visited):
+        """
+        Returns a lower bound on the distance still to be flown: every airport that hasn't been visited,
+        and the home airport, must still be flown into at least once.
+        """
+        distance = self.shortest_leg_to[0]
+        for airport in range(1, self.itinerary_size):
+            if not visited & (1 << airport):
+                distance += self.shortest_leg_to[airport]
+        return distance
+
+    def get_lowest_remaining_fuel_price(self, visited, extra_stop_made):
+        """ Returns the lowest fuel price at any airport that may still be visited. """
+        if not extra_stop_made:
+            return min(self.fuel_prices)
+        return min([self.fuel_prices[airport] for airport in range(1, self.itinerary_size)
+                    if not visited & (1 << airport)], default=float("inf"))
+
+    def get_net_cost_of_route(self, airport, extra_stop_made, cost, window):
+        """
+        Returns the net cost of a route that flies home from the given airport, given the cost so far
+        and the window on departure.
+        """
+        leg_cost, window = buy_fuel_for_leg(window, self.distances[airport][0])
+        cost += leg_cost
+        if self.empty_tank:
+            extra_fuel = 0
+        else:
+            extra_cost, extra_fuel = buy_fuel_to_bring_home(window, self.home_fuel_price)
+            cost += extra_cost
+        return get_net_cost(cost, extra_fuel, self.home_fuel_price,
+                            self.get_total_cost_of_stopovers(extra_stop_made), self.empty_tank)
+
+    def get_total_cost_of_stopovers(self, extra_stop_made):
+        return self.stopover_cost if extra_stop_made else 0
+
+    def get_route_codes(self, route):
+        """ Converts a list of airport ids into a list of IATA airport codes. """
+        return [self.airport_codes[airport] for airport in route]
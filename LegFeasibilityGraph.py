@@ -0,0 +1,74 @@
+class LegFeasibilityGraph:
+    """
+    LegFeasibilityGraph: shows which legs between the airports in a DistanceMatrix an aircraft can fly without
+    refuelling, i.e. the legs no longer than its range.  Routes with a leg beyond the range can't be completed
+    (see Route), so they can be skipped before a Route is built, and an itinerary in which an airport can't be
+    reached at all can be rejected without searching it.
+
+    The legs from each airport are held as a bit mask over the airport ids in the DistanceMatrix (bit j is set if
+    the aircraft can fly to the airport with id j), and the legs into each airport likewise.
+
+    A graph is built for each range by DistanceMatrix.get_feasibility_graph(), so it is shared by every
+    itinerary with the same airports and hubs and the same aircraft range.
+    """
+
+    def __init__(self, distance_matrix, aircraft_range):
+        self.__distance_matrix = distance_matrix
+        self.aircraft_range = aircraft_range
+        rows = distance_matrix.rows
+        size = len(distance_matrix)
+        # staying at the same airport counts as a leg that can be flown, as it does in Route
+        self.__legs_from = [sum(1 << j for j in range(size) if j == i or rows[i][j] <= aircraft_range)
+                            for i in range(size)]
+        self.__legs_to = [sum(1 << i for i in range(size) if i == j or rows[i][j] <= aircraft_range)
+                          for j in range(size)]
+        codes = distance_matrix.get_airport_codes()
+        self.__destinations = {code: frozenset(self.__get_codes(self.__legs_from[i])) for i, code in enumerate(codes)}
+        self.__origins = {code: frozenset(self.__get_codes(self.__legs_to[i])) for i, code in enumerate(codes)}
+
+    def is_feasible(self, code1, code2):
+        """ Returns True if the aircraft can fly from one airport to the other without refuelling. """
+        return code2 in self.__destinations[code1]
+
+    def can_be_bridged(self, code1, code2):
+        """ Returns True if the aircraft can fly from one airport to the other via one other airport. """
+        return not self.__destinations[code1].isdisjoint(self.__origins[code2])
+
+    def get_destinations(self, airport_code):
+        """ Returns the set of airports that the aircraft can fly to from an airport without refuelling. """
+        return self.__destinations[airport_code]
+
+    def get_unreachable_airports(self, home_airport, airport_codes):
+        """
+        Returns the airports in a list that the aircraft can't reach from the home airport, or can't get back
+        to the home airport from, however many stops it makes at the airports in the graph.  If there are any,
+        no route can visit them all.
+        """
+        home = self.__distance_matrix.get_index(home_airport)
+        reachable_from_home = self.__get_reachable(home, self.__legs_from)
+        can_reach_home = self.__get_reachable(home, self.__legs_to)
+        return [code for code in airport_codes
+                if not reachable_from_home & can_reach_home & (1 << self.__distance_matrix.get_index(code))]
+
+    def __get_codes(self, airports):
+        """ Returns the codes of the airports in a bit mask. """
+        return [self.__distance_matrix.get_code(i) for i in range(airports.bit_length()) if airports & (1 << i)]
+
+    @staticmethod
+    def __get_reachable(start, legs):
+        """ Returns a bit mask of the airports connected to start by a chain of legs, including start itself. """
+        reached = 1 << start
+        to_visit = [start]
+        while to_visit:
+            new = legs[to_visit.pop()] & ~reached
+            reached |= new
+            while new:
+                lowest_bit = new & -new
+                to_visit.append(lowest_bit.bit_length() - 1)
+                new ^= lowest_bit
+        return reached
+
+    def __str__(self):
+        feasible_legs = sum(bin(legs).count("1") for legs in self.__legs_from)
+        return "Leg feasibility graph for a range of " + "{:,.0f}".format(self.aircraft_range) + " km: " + \
+               str(feasible_legs) + " legs between " + str(len(self.__legs_from)) + " airports"
@@ -0,0 +1,302 @@
+from SolverSession import SolverSession
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from collections import deque
+from time import perf_counter
+import asyncio
+import io
+import json
+import sys
+
+MAX_REQUEST_SIZE = 1024 * 1024                          # the largest request body accepted, in bytes
+MAX_HEADER_LINES = 100                                  # the most header lines accepted in a request
+RECENT_LATENCIES = 1000                                 # the number of recent requests used for the percentiles
+INVALID_REQUEST_LINE = "(invalid request line)"        # the path under which unreadable requests are counted
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 422: "Unprocessable Entity", 431: "Request Header Fields Too Large",
+           500: "Internal Server Error"}
+
+worker_session = None                                   # the SolverSession in each worker process
+
+
+class QuotingService:
+    """
+    QuotingService: a small HTTP service that quotes the cheapest fuel plan for itineraries sent as JSON.
+
+    The service keeps a SolverSession, so the input files are loaded once and kept (with their caches) for as
+    long as the service runs.  Itineraries are solved by a pool of worker processes, each of which keeps its own
+    copy of the session, so the event loop only reads requests and writes replies.
+
+    It listens on the local machine only (127.0.0.1) and answers:
+        POST /quote     one itinerary, e.g.
+                        {"home": "DUB", "airports": ["LHR", "JFK"], "aircraft": "777", "hubs": ["MHP"],
+                         "constraints": [["JFK", "LHR"]], "stopover_cost": 100, "empty_tank": false}
+                        Only home, airports and aircraft are required.  The reply holds the plan from
+                        Route.make_csv_row(), or an error message (with status 422) if the itinerary can't be
+                        completed.
+        POST /roster    {"itineraries": [...]}, a list of itineraries like the above, which are solved
+                        concurrently.  The reply holds a result for each itinerary, in the same order.
+        GET /metrics    the number of requests and their latency (mean, percentiles and maximum) for each path,
+                        including requests that were refused because of their headers (e.g. too large).
+        GET /health     {"status": "ok"}.
+    """
+
+    def __init__(self, session, workers=1, solver="enumerate", port=8080):
+        self.__session = session
+        self.__workers = workers
+        self.__solver = solver
+        self.__executor = None
+        self.__server = None
+        self.host = "127.0.0.1"
+        self.port = port
+        self.__metrics = {}
+
+    async def start(self):
+        """ Loads the input files, starts the worker processes and starts listening for requests. """
+        self.__session.load()
+        self.__executor = ProcessPoolExecutor(self.__workers, initializer=start_worker,
+                                              initargs=(self.__session,))
+        self.__server = await asyncio.start_server(self.__handle_connection, self.host, self.port)
+        self.port = self.__server.sockets[0].getsockname()[1]             # in case port 0 was given
+        print("Quoting service listening on http://" + self.host + ":" + str(self.port))
+
+    async def stop(self):
+        self.__server.close()
+        await self.__server.wait_closed()
+        # wait for the solves in progress without blocking the event loop
+        await asyncio.get_running_loop().run_in_executor(None, self.__executor.shutdown)
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self.__server.serve_forever()
+        finally:
+            await self.stop()
+
+    def get_metrics(self):
+        """ Returns the number of requests, errors and the latency in milliseconds of recent requests, by path. """
+        metrics = {}
+        for path, (count, errors, total_time, latencies) in self.__metrics.items():
+            ordered = sorted(latencies)
+            metrics[path] = {"requests": count,
+                             "errors": errors,
+                             "mean_ms": round(total_time / count * 1000, 3),
+                             "p50_ms": round(self.__get_percentile(ordered, 50) * 1000, 3),
+                             "p95_ms": round(self.__get_percentile(ordered, 95) * 1000, 3),
+                             "p99_ms": round(self.__get_percentile(ordered, 99) * 1000, 3),
+                             "max_ms": round(ordered[-1] * 1000, 3)}
+        return metrics
+
+    @staticmethod
+    def __get_percentile(ordered, percentile):
+        return ordered[min(len(ordered) - 1, len(ordered) * percentile // 100)]
+
+    def __record_request(self, path, status, latency):
+        if path not in self.__metrics:
+            self.__metrics[path] = [0, 0, 0.0, deque(maxlen=RECENT_LATENCIES)]
+        metrics = self.__metrics[path]
+        metrics[0] += 1
+        if status >= 400:
+            metrics[1] += 1
+        metrics[2] += latency
+        metrics[3].append(latency)
+
+    async def __handle_connection(self, reader, writer):
+        """ Answers the requests on one connection, which is kept open unless the client asks to close it. """
+        try:
+            while True:
+                try:
+                    request_line = await reader.readline()
+                except ValueError:                          # longer than the stream's limit
+                    request_line = b"?"
+                if not request_line:
+                    break
+                start_time = perf_counter()
+                headers = await self.__read_headers(reader)
+                try:
+                    method, path, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self.__send(writer, 400, {"error": "Invalid request line"}, False)
+                    self.__record_request(INVALID_REQUEST_LINE, 400, perf_counter() - start_time)
+                    break
+                if headers is None:
+                    await self.__send(writer, 431, {"error": "The request headers are too large"}, False)
+                    self.__record_request(path, 431, perf_counter() - start_time)
+                    break
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                try:
+                    length = int(headers.get("content-length", 0) or 0)
+                    if length < 0:
+                        raise ValueError
+                except ValueError:
+                    await self.__send(writer, 400, {"error": "Invalid Content-Length"}, False)
+                    self.__record_request(path, 400, perf_counter() - start_time)
+                    break
+                if length > MAX_REQUEST_SIZE:
+                    await self.__send(writer, 413, {"error": "The request is too large"}, False)
+                    self.__record_request(path, 413, perf_counter() - start_time)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                status, reply = await self.__respond(method, path, body)
+                await self.__send(writer, status, reply, keep_alive)
+                self.__record_request(path, status, perf_counter() - start_time)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def __read_headers(reader):
+        """
+        Reads the header lines of a request into a dictionary.  Returns None if a line is longer than the stream's
+        limit or there are more than MAX_HEADER_LINES of them.
+        """
+        headers = {}
+        for _ in range(MAX_HEADER_LINES + 1):
+            try:
+                line = await reader.readline()
+            except ValueError:                              # asyncio.LimitOverrunError, re-raised by readline()
+                return None
+            if line in (b"\r\n", b"\n", b""):
+                return headers
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return None
+
+    @staticmethod
+    async def __send(writer, status, reply, keep_alive):
+        body = json.dumps(reply).encode("utf8")
+        head = "HTTP/1.1 " + str(status) + " " + REASONS[status] + "\r\n" \
+               "Content-Type: application/json\r\n" \
+               "Content-Length: " + str(len(body)) + "\r\n" \
+               "Connection: " + ("keep-alive" if keep_alive else "close") + "\r\n\r\n"
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def __respond(self, method, path, body):
+        """ Returns the status and the reply (a dictionary) for a request. """
+        if path == "/health":
+            return (200, {"status": "ok"}) if method == "GET" else (405, {"error": "Use GET"})
+        if path == "/metrics":
+            return (200, self.get_metrics()) if method == "GET" else (405, {"error": "Use GET"})
+        if path not in ("/quote", "/roster"):
+            return 404, {"error": "Unknown path: " + path}
+        if method != "POST":
+            return 405, {"error": "Use POST"}
+        try:
+            request = json.loads(body.decode("utf8"))
+            if path == "/quote":
+                itineraries = [parse_itinerary(request)]
+            elif not isinstance(request, dict) or not isinstance(request.get("itineraries"), list):
+                raise ValueError("A roster should be an object with a list of itineraries")
+            else:
+                itineraries = [parse_itinerary(itinerary) for itinerary in request["itineraries"]]
+        except ValueError as error:                         # includes errors decoding the JSON
+            return 400, {"error": str(error)}
+
+        loop = asyncio.get_running_loop()
+        try:
+            results = await asyncio.gather(*[loop.run_in_executor(self.__executor, quote_itinerary,
+                                                                  itinerary, self.__solver)
+                                             for itinerary in itineraries])
+        except Exception as error:
+            return 500, {"error": "Unable to solve the itinerary: " + repr(error)}
+        if path == "/roster":
+            return 200, {"results": results}
+        return (422 if "error" in results[0] else 200), results[0]
+
+
+def parse_itinerary(request):
+    """
+    Checks an itinerary sent as JSON and returns it as a dictionary of the arguments of
+    SolverSession.solve_itinerary().  Raises ValueError if the itinerary is invalid.
+    """
+    if not isinstance(request, dict):
+        raise ValueError("An itinerary should be a JSON object")
+    for field in ("home", "airports", "aircraft"):
+        if field not in request:
+            raise ValueError("Missing field: " + field)
+    home_airport = parse_airport_code(request["home"])
+    other_airports = parse_airport_codes(request["airports"], "airports")
+    if not other_airports:
+        raise ValueError("An itinerary should have at least one airport apart from home")
+    aircraft_code = request["aircraft"]
+    if not isinstance(aircraft_code, str) or not aircraft_code.isalnum():
+        raise ValueError("Invalid aircraft code: " + str(aircraft_code))
+    constraints = request.get("constraints", [])
+    if not isinstance(constraints, list):
+        raise ValueError("constraints should be a list of lists of airport codes")
+    stopover_cost = request.get("stopover_cost", 0)
+    if isinstance(stopover_cost, bool) or not isinstance(stopover_cost, (int, float)):
+        raise ValueError("Invalid stopover cost: " + str(stopover_cost))
+    empty_tank = request.get("empty_tank", False)
+    if not isinstance(empty_tank, bool):
+        raise ValueError("empty_tank should be true or false")
+    return {"home_airport": home_airport,
+            "other_airports": other_airports,
+            "aircraft_code": aircraft_code.upper(),
+            "empty_tank": empty_tank,
+            "hubs": parse_airport_codes(request.get("hubs", []), "hubs"),
+            "stopover_cost": float(stopover_cost),
+            "constraints": [parse_constraint(constraint) for constraint in constraints]}
+
+
+def parse_constraint(constraint):
+    """ A constraint is the order of two or more airports, so an empty or one-airport constraint is refused. """
+    codes = parse_airport_codes(constraint, "constraints")
+    if len(codes) < 2:
+        raise ValueError("A constraint should have at least two airports: " + str(constraint))
+    return codes
+
+
+def parse_airport_codes(codes, field):
+    if not isinstance(codes, list):
+        raise ValueError(field + " should be a list of airport codes")
+    return [parse_airport_code(code) for code in codes]
+
+
+def parse_airport_code(code):
+    if not isinstance(code, str) or len(code) != 3 or not code.isalnum():
+        raise ValueError("Invalid airport code: " + str(code))
+    return code.upper()
+
+
+def start_worker(session):
+    global worker_session
+    worker_session = session
+
+
+def quote_itinerary(itinerary, solver):
+    """
+    Solves an itinerary (see parse_itinerary()) in a worker process and returns the plan: the costs and the
+    fuel to buy at each stop, as in Route.make_csv_row(), or the error message.
+    """
+    start_time = perf_counter()
+    with redirect_stdout(io.StringIO()):                # the service has no console to print the route on
+        solved_itinerary = worker_session.solve_itinerary(solver=solver, **itinerary)
+    if solved_itinerary.get_error_message() is not None:
+        return {"error": solved_itinerary.get_error_message(),
+                "solve_time_ms": round((perf_counter() - start_time) * 1000, 3)}
+    row = solved_itinerary.cheapest_route.make_csv_row()
+    return {"net_fuel_cost": row[0],
+            "value_of_fuel_brought_home": row[1],
+            "total_cost_of_stopovers": row[2],
+            "total_fuel_purchase": row[3],
+            "stops": [{"airport": row[i], "fuel_purchase": row[i + 1]} for i in range(4, len(row), 2)],
+            "csv_row": row,
+            "solve_time_ms": round((perf_counter() - start_time) * 1000, 3)}
+
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    session = SolverSession(real_exch_rates=False)          # real-time rates would need the internet
+    try:
+        asyncio.run(QuotingService(session, workers, port=port).serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+import json
+import sqlite3
+from collections import OrderedDict
+from contextlib import contextmanager
+from hashlib import sha256
+
+COMMIT_INTERVAL = 1000                                  # the most results stored in a batch before they are committed
+
+
+class ResultCache:
+    """
+    ResultCache: remembers the cheapest route found for an itinerary, so that the same itinerary is not solved
+    again.  Itineraries are looked up by their signature (see Itinerary.get_signature()), which includes the
+    aircraft's range, the fuel prices and the distances, so a result is only reused while they are unchanged.
+
+    The results are kept in memory, up to max_entries of them; the least recently used result is forgotten
+    first.  If a filename is given, the results are also kept in an SQLite file, so that they are remembered
+    between program runs (a result found in the file is brought back into memory).  The file is opened when it
+    is first needed and kept open until close() is called.  Each result stored is committed to the file
+    straight away, except within batched_commits() (e.g. while a roster is solved), where they are committed
+    every COMMIT_INTERVAL results and at the end.
+
+    A result is a solution as returned by Itinerary.get_solution().
+    """
+
+    def __init__(self, max_entries=10000, filename=None):
+        self.max_entries = max_entries
+        self.filename = filename
+        self.__results = OrderedDict()
+        self.__connection = None
+        self.__batch_depth = 0                          # the number of batched_commits() blocks being run
+        self.__uncommitted = 0                          # the number of results stored but not yet committed
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.__results)
+
+    def get_result(self, signature):
+        """ Returns the result stored for an itinerary signature, or None. """
+        result = self.__find(self.get_key(signature))
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def has_result(self, signature):
+        return self.__find(self.get_key(signature)) is not None
+
+    def store_result(self, signature, solution):
+        key = self.get_key(signature)
+        self.__remember(key, tuple(solution))
+        if self.filename is not None:
+            self.__connect().execute("INSERT OR REPLACE INTO results (signature, solution) VALUES (?, ?)",
+                                     (key, json.dumps(list(solution))))
+            self.__uncommitted += 1
+            if self.__batch_depth == 0 or self.__uncommitted >= COMMIT_INTERVAL:
+                self.commit()
+
+    @contextmanager
+    def batched_commits(self):
+        """ Commits the results stored within a with block together, rather than one at a time. """
+        self.__batch_depth += 1
+        try:
+            yield self
+        finally:
+            self.__batch_depth -= 1
+            if self.__batch_depth == 0:
+                self.commit()
+
+    def commit(self):
+        """ Commits the results stored in the file since the last commit. """
+        if self.__connection is not None and self.__uncommitted:
+            self.__connection.commit()
+            self.__uncommitted = 0
+
+    def close(self):
+        """ Commits the stored results and closes the file (which is opened again if it is needed). """
+        self.commit()
+        if self.__connection is not None:
+            self.__connection.close()
+            self.__connection = None
+
+    def clear(self):
+        """ Forgets the results in memory (but not those in the file). """
+        self.__results.clear()
+
+    @staticmethod
+    def get_key(signature):
+        """ Returns the key for a signature: a hash of its JSON representation. """
+        return sha256(json.dumps(signature, separators=(",", ":")).encode("utf8")).hexdigest()
+
+    def __find(self, key):
+        if key in self.__results:
+            self.__results.move_to_end(key)
+            return self.__results[key]
+        if self.filename is not None:
+            row = self.__connect().execute("SELECT solution FROM results WHERE signature = ?", (key,)).fetchone()
+            if row is not None:
+                result = tuple(json.loads(row[0]))
+                self.__remember(key, result)
+                return result
+        return None
+
+    def __remember(self, key, result):
+        self.__results[key] = result
+        self.__results.move_to_end(key)
+        if len(self.__results) > self.max_entries:
+            self.__results.popitem(last=False)
+
+    def __connect(self):
+        if self.__connection is None:
+            self.__connection = sqlite3.connect(self.filename, timeout=10)
+            with self.__connection:
+                self.__connection.execute("CREATE TABLE IF NOT EXISTS results "
+                                          "(signature TEXT PRIMARY KEY, solution TEXT)")
+        return self.__connection
+
+    def __getstate__(self):
+        # a copy sent to another process opens the file for itself
+        self.commit()
+        state = self.__dict__.copy()
+        state["_ResultCache__connection"] = None
+        state["_ResultCache__batch_depth"] = 0
+        return state
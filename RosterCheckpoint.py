@@ -0,0 +1,95 @@
+from time import monotonic
+import json
+import os
+
+SYNC_INTERVAL = 1.0                                     # the least seconds between syncs to the disk
+
+
+class RosterCheckpoint:
+    """
+    RosterCheckpoint: saves the solution of each itinerary in a roster as soon as it is found, so that a roster
+    that is interrupted can be resumed without solving the same itineraries again.
+
+    The checkpoint file has one line of JSON for the settings of the run (the input file, hubs, stopover cost
+    etc.), followed by one line for each solved itinerary: its row number in the input file, the row itself,
+    the aircraft's range and the solution (see Itinerary.get_solution()).  Each line is flushed as soon as it
+    is written, so a crash of the program loses nothing.  The file is synced to the disk when the checkpoint is
+    closed, and when a line is saved SYNC_INTERVAL seconds or more after the last sync, so a crash of the
+    computer can lose the lines saved since the last sync.
+
+    If resume is False, the file is started again.  If resume is True, the solutions already in the file are
+    used, as long as the settings, the row and the aircraft's range are unchanged (the range can change if the
+    aircraft file is edited); a half-written last line is ignored.  Only the routes are saved, so the costs of
+    a resumed itinerary are calculated again with the current exchange rates.
+    """
+
+    def __init__(self, filename, resume=False):
+        self.filename = filename
+        self.resume = resume
+        self.__file = None
+        self.__last_sync = 0.0
+
+    def start(self, settings):
+        """
+        Opens the checkpoint for a run with the given settings (a dictionary that can be saved as JSON) and
+        returns the saved solutions that can be reused, as a dictionary from row number to
+        (row, aircraft range, solution).
+        """
+        settings = json.loads(json.dumps(settings))      # e.g. tuples become lists, as when they are read back
+        solutions = self.__read_solutions(settings) if self.resume else {}
+        temporary_file = self.filename + ".tmp"
+        with open(temporary_file, "wt") as f:
+            f.write(json.dumps({"settings": settings}) + "\n")
+            for row_number, (row, aircraft_range, solution) in sorted(solutions.items()):
+                f.write(self.__make_line(row_number, row, aircraft_range, solution))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary_file, self.filename)
+        self.__file = open(self.filename, "at")
+        self.__last_sync = monotonic()
+        return solutions
+
+    def get_solution(self, solutions, row_number, row, aircraft_range):
+        """ Returns the saved solution for a row (see start()), or None if it has to be solved. """
+        if row_number in solutions and solutions[row_number][:2] == (row, aircraft_range):
+            route, error, statistics = solutions[row_number][2]
+            return route, error, statistics
+        return None
+
+    def save(self, row_number, row, aircraft_range, solution):
+        """ Appends the solution for a row, found with an aircraft of the given range, to the checkpoint. """
+        self.__file.write(self.__make_line(row_number, row, aircraft_range, list(solution)))
+        self.__file.flush()
+        if monotonic() - self.__last_sync >= SYNC_INTERVAL:
+            os.fsync(self.__file.fileno())
+            self.__last_sync = monotonic()
+
+    def close(self):
+        if self.__file is not None:
+            self.__file.flush()
+            os.fsync(self.__file.fileno())
+            self.__file.close()
+            self.__file = None
+
+    @staticmethod
+    def __make_line(row_number, row, aircraft_range, solution):
+        return json.dumps({"row": row_number, "itinerary": row, "range": aircraft_range, "solution": solution}) + "\n"
+
+    def __read_solutions(self, settings):
+        solutions = {}
+        try:
+            with open(self.filename, "rt") as f:
+                lines = iter(f)
+                header = json.loads(next(lines))
+                if header.get("settings") != settings:
+                    print("The checkpoint", self.filename, "is for a different run, so it has been restarted")
+                    return {}
+                for line in lines:
+                    try:
+                        entry = json.loads(line)
+                        solutions[entry["row"]] = (entry["itinerary"], entry["range"], entry["solution"])
+                    except (ValueError, KeyError):
+                        break                           # a line that was being written when the program stopped
+        except (OSError, ValueError, StopIteration):
+            return {}
+        return solutions
@@ -1,4 +1,5 @@
 from AirportVisit import AirportVisit
+from fuel_window import plan_refuelling
 
 
 class ImpossibleRouteError(Exception):
@@ -12,16 +13,25 @@ class Route:
     Includes a method for calculating the cheapest places to refuel along the route.
     Also includes a method that generates a line for the csv file, and methods for
     printing information to the console.
+
+    The refuelling_algorithm parameter chooses how the refuelling plan is calculated: "greedy" uses
+    calculate_cheapest_place_to_refuel() and "linear" uses calculate_cheapest_place_to_refuel_in_linear_time(),
+    which makes the same purchases in time proportional to the number of stops.
     """
     def __init__(self, route, aircraft_range, airport_atlas, currency_table,
-                 empty_tank=False, total_cost_of_stopovers=0):
+                 empty_tank=False, total_cost_of_stopovers=0, distance_matrix=None, refuelling_algorithm="greedy"):
         self.__fuel_capacity = aircraft_range
         self.airport_atlas = airport_atlas
         self.currency_table = currency_table
+        self.distance_matrix = distance_matrix      # if given, leg distances are read from the matrix
         self.__empty_tank = empty_tank
         self.__total_cost_of_stopovers = total_cost_of_stopovers
         self.__list_of_stops = self.__build_list_of_stops(route)
-        self.__total_cost, self.__unused_fuel, self.__net_cost = self.calculate_cheapest_place_to_refuel()
+        if refuelling_algorithm == "linear":
+            self.__total_cost, self.__unused_fuel, self.__net_cost = \
+                self.calculate_cheapest_place_to_refuel_in_linear_time()
+        else:
+            self.__total_cost, self.__unused_fuel, self.__net_cost = self.calculate_cheapest_place_to_refuel()
 
     def __build_list_of_stops(self, route):
         output = []
@@ -30,9 +40,9 @@ class Route:
             country = self.airport_atlas.get_country(airport_code)
             fuel_price = self.currency_table.get_exchange_rate(country)
             if i == len(route) - 1:
-                distance_to_next_airport = self.airport_atlas.get_distance_between_airports(route[i], route[0])
+                distance_to_next_airport = self.__get_distance(route[i], route[0])
             else:
-                distance_to_next_airport = self.airport_atlas.get_distance_between_airports(route[i], route[i + 1])
+                distance_to_next_airport = self.__get_distance(route[i], route[i + 1])
             if distance_to_next_airport > self.__fuel_capacity:
                 return []
             output.append(AirportVisit(airport_code, fuel_price, distance_to_next_airport, self.__fuel_capacity))
@@ -40,6 +50,11 @@ class Route:
             raise ImpossibleRouteError("Cannot complete this route")
         return output
 
+    def __get_distance(self, code1, code2):
+        if self.distance_matrix is None:
+            return self.airport_atlas.get_distance_between_airports(code1, code2)
+        return self.distance_matrix.get_distance(code1, code2)
+
     def calculate_cheapest_place_to_refuel(self):
         if self.__list_of_stops == []:
             raise ImpossibleRouteError("Cannot complete this route")
@@ -111,9 +126,30 @@ class Route:
             net_cost = total_cost - (extra_fuel * home_airport.fuel_price) + self.__total_cost_of_stopovers
             return total_cost, extra_fuel, net_cost
 
+    def calculate_cheapest_place_to_refuel_in_linear_time(self):
+        """
+        Makes the same purchases as calculate_cheapest_place_to_refuel(), using fuel_window.plan_refuelling()
+        to keep the airports that are still within range in a deque rather than rescanning them for every leg.
+        """
+        if self.__list_of_stops == []:
+            raise ImpossibleRouteError("Cannot complete this route")
+        purchases, total_cost, extra_fuel, net_cost = \
+            plan_refuelling([stop.fuel_price for stop in self.__list_of_stops],
+                            [stop.distance_to_next_airport for stop in self.__list_of_stops],
+                            float(self.__fuel_capacity),
+                            self.__empty_tank,
+                            self.__total_cost_of_stopovers)
+        for stop, quantity_purchased in zip(self.__list_of_stops, purchases):
+            stop.buy_fuel(quantity_purchased)
+        return total_cost, extra_fuel, net_cost
+
     def get_cost_of_route(self):
         return self.__net_cost
 
+    def get_airport_codes(self):
+        """ Returns the airport codes of the stops on the route, in order. """
+        return [airport.airport_code for airport in self.__list_of_stops]
+
     def __str__(self):
         output = "\n              Distance to          Fuel             Fuel           Total Fuel  \n"
         output += "  Airport     Next Airport       Purchase           Price            Spend\n"
@@ -0,0 +1,82 @@
+from fuel_window import get_net_cost
+
+
+class RouteKernel:
+    """
+    RouteKernel: calculates the net cost of a route without building Route and AirportVisit objects.
+
+    A route is a list of integer airport ids from an ItinerarySearchSpace.  Distances and fuel prices are
+    read from the search space's arrays, and the refuelling plan is worked out in the same way as
+    fuel_window.plan_refuelling(), but only the cost is kept.  This makes it cheap to price a large number
+    of candidate routes; a full Route is only needed for the cheapest one.
+    """
+    __slots__ = ("fuel_prices", "distances", "fuel_capacity", "empty_tank", "stopover_cost", "itinerary_size")
+
+    def __init__(self, search_space):
+        self.fuel_prices = search_space.fuel_prices
+        self.distances = search_space.distances
+        self.fuel_capacity = float(search_space.fuel_capacity)
+        self.empty_tank = search_space.empty_tank
+        self.stopover_cost = search_space.stopover_cost
+        self.itinerary_size = search_space.itinerary_size
+
+    def get_cost_of_route(self, route):
+        """
+        Returns the net cost of a route (a list of airport ids), or None if one of its legs is beyond the
+        aircraft's range.
+        """
+        fuel_prices = self.fuel_prices
+        distances = self.distances
+        fuel_capacity = self.fuel_capacity
+        last_stop = len(route) - 1
+        for stop in range(last_stop + 1):
+            if distances[route[stop]][route[stop + 1] if stop < last_stop else route[0]] > fuel_capacity:
+                return None
+
+        # the window of airports that are still within range, cheapest first; entries before window_start
+        # have been used up
+        window_prices = []
+        window_joined_at = []
+        window_start = 0
+        fuel_bought = 0.0
+        total_cost = 0.0
+        for stop in range(last_stop + 1):
+            airport = route[stop]
+            fuel_price = fuel_prices[airport]
+            while len(window_prices) > window_start and window_prices[-1] >= fuel_price:
+                window_prices.pop()
+                window_joined_at.pop()
+            window_prices.append(fuel_price)
+            window_joined_at.append(fuel_bought)
+
+            fuel_needed = distances[airport][route[stop + 1] if stop < last_stop else route[0]]
+            # when a leg is as long as the range, rounding can leave a tiny amount still needed once every airport
+            # in the window has been used up
+            while fuel_needed > 0 and window_start < len(window_prices):
+                spare_fuel_capacity = fuel_capacity - (fuel_bought - window_joined_at[window_start])
+                if spare_fuel_capacity <= 0:
+                    window_start += 1
+                    continue
+                cheapest_fuel_price = window_prices[window_start]
+                if spare_fuel_capacity > fuel_needed:
+                    quantity_purchased = fuel_needed
+                else:
+                    quantity_purchased = spare_fuel_capacity
+                    window_start += 1                                     # the tank is full at this airport
+                total_cost += quantity_purchased * cheapest_fuel_price
+                fuel_bought += quantity_purchased
+                fuel_needed -= quantity_purchased
+
+        extra_fuel = 0
+        home_fuel_price = fuel_prices[route[0]]
+        if not self.empty_tank:
+            while window_start < len(window_prices) and window_prices[window_start] < home_fuel_price:
+                spare_fuel_capacity = fuel_capacity - (fuel_bought - window_joined_at[window_start])
+                if spare_fuel_capacity > 0:
+                    total_cost += spare_fuel_capacity * window_prices[window_start]
+                    fuel_bought += spare_fuel_capacity
+                    extra_fuel += spare_fuel_capacity
+                window_start += 1
+
+        total_cost_of_stopovers = self.stopover_cost * (len(route) - self.itinerary_size)
+        return get_net_cost(total_cost, extra_fuel, home_fuel_price, total_cost_of_stopovers, self.empty_tank)
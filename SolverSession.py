@@ -0,0 +1,165 @@
+from AirportAtlas import AirportAtlas
+from AircraftCatalog import AircraftCatalog
+from CurrencyTable import CurrencyTable
+from ExchangeRateCache import ExchangeRateCache
+from ResultCache import ResultCache
+from ItineraryRoster import ItineraryRoster
+from Itinerary import Itinerary
+from FleetEvaluator import FleetEvaluator
+import os
+
+
+class SolverSession:
+    """
+    SolverSession: loads the input files once and uses them to solve any number of itineraries.
+
+    The airport atlas, aircraft catalog and currency table are loaded the first time they are needed and
+    kept, together with the caches they build up (the atlas's distance matrices and the currency table's
+    real-time exchange rates).  Before each use, the session checks whether the input files have changed
+    (by size and modification time) and reloads only the data that came from a changed file.
+    invalidate() forces data to be reloaded.  The real-time exchange rates are not kept for longer than the
+    rate cache's time to live (see ExchangeRateCache); after that they are downloaded again.
+
+    The cheapest routes found are kept in a ResultCache (and in result_cache_file, if one is given), so an
+    itinerary that is solved again is looked up instead, unless its prices or distances have changed.
+
+    Loading errors are raised when the data is first needed: FileNotFoundError for the airport and
+    aircraft files, and CountryCurrencyFileError or ExchangeRateFileError for the currency files.
+    """
+
+    def __init__(self, airport_file="input files/airport.csv",
+                 aircraft_file="input files/aircraft.csv",
+                 currency_file="input files/countrycurrency.csv",
+                 exchange_rate_file="input files/currencyrates.csv",
+                 real_exch_rates=True,
+                 rate_cache_file="exchangeratecache.sqlite",
+                 result_cache_file=None):
+        self.__airport_atlas = None
+        self.__aircraft_catalog = None
+        self.__currency_table = None
+        self.__fingerprints = {}                     # the size and modification time of each file when loaded
+        self.airport_file = airport_file
+        self.aircraft_file = aircraft_file
+        self.currency_file = currency_file
+        self.exchange_rate_file = exchange_rate_file
+        self.real_exch_rates = real_exch_rates
+        self.rate_cache = ExchangeRateCache(rate_cache_file)
+        self.result_cache = ResultCache(filename=result_cache_file)
+
+    def set_input_files(self, airport_file, aircraft_file, currency_file, exchange_rate_file, real_exch_rates=True):
+        """ Changes the input files (and the exchange rate option), invalidating the data that depends on them. """
+        if airport_file != self.airport_file:
+            self.__airport_atlas = None
+        if aircraft_file != self.aircraft_file:
+            self.__aircraft_catalog = None
+        if currency_file != self.currency_file or exchange_rate_file != self.exchange_rate_file \
+                or real_exch_rates != self.real_exch_rates:
+            self.__currency_table = None
+        self.airport_file = airport_file
+        self.aircraft_file = aircraft_file
+        self.currency_file = currency_file
+        self.exchange_rate_file = exchange_rate_file
+        self.real_exch_rates = real_exch_rates
+
+    def invalidate(self, filename=None):
+        """ Discards the data loaded from a file (or from every file), so that it is loaded again when needed. """
+        if filename is None or filename == self.airport_file:
+            self.__airport_atlas = None
+        if filename is None or filename == self.aircraft_file:
+            self.__aircraft_catalog = None
+        if filename is None or filename in (self.currency_file, self.exchange_rate_file):
+            self.__currency_table = None
+
+    def get_airport_atlas(self):
+        if self.__airport_atlas is None or self.__has_changed(self.airport_file):
+            self.__airport_atlas = AirportAtlas(self.airport_file, columnar=True)
+            self.__save_fingerprint(self.airport_file)
+        return self.__airport_atlas
+
+    def get_aircraft_catalog(self):
+        if self.__aircraft_catalog is None or self.__has_changed(self.aircraft_file):
+            self.__aircraft_catalog = AircraftCatalog(self.aircraft_file, use_snapshot=True)
+            self.__save_fingerprint(self.aircraft_file)
+        return self.__aircraft_catalog
+
+    def get_currency_table(self):
+        if self.__currency_table is None or self.__has_changed(self.currency_file) \
+                or self.__has_changed(self.exchange_rate_file):
+            self.__currency_table = CurrencyTable(self.currency_file, self.exchange_rate_file, self.real_exch_rates,
+                                                  rate_cache=self.rate_cache, use_snapshot=True)
+            self.__save_fingerprint(self.currency_file)
+            self.__save_fingerprint(self.exchange_rate_file)
+        return self.__currency_table
+
+    def load(self):
+        """ Loads (or reloads if necessary) all of the input files. """
+        self.get_airport_atlas()
+        self.get_currency_table()
+        self.get_aircraft_catalog()
+
+    def solve_itinerary(self, home_airport, other_airports, aircraft_code, empty_tank=False, hubs=[],
+                        stopover_cost=0, constraints=[], solver="enumerate", workers=1):
+        """
+        Finds the cheapest route for an itinerary and returns the Itinerary.  If the itinerary cannot be
+        completed (or the aircraft code is unknown), itinerary.get_error_message() explains why.
+        """
+        airport_atlas = self.get_airport_atlas()
+        currency_table = self.get_currency_table()
+        try:
+            aircraft_range = self.get_aircraft_catalog().get_aircraft_range(aircraft_code)
+        except KeyError:
+            aircraft_range = None
+        itinerary = Itinerary(airport_atlas, currency_table, [home_airport] + other_airports, aircraft_code,
+                              aircraft_range, empty_tank, hubs, stopover_cost, constraints)
+        print(itinerary)
+        itinerary.get_cheapest_route(solver, workers, self.result_cache)
+        return itinerary
+
+    def solve_fleet(self, home_airport, other_airports, aircraft_codes=None, empty_tank=False, hubs=[],
+                    stopover_cost=0, constraints=[]):
+        """
+        Finds the cheapest route for an itinerary with each of the aircraft (every aircraft in the catalog if no
+        codes are given) and prints them ranked by net cost.  Returns the list of (aircraft code, Itinerary) from
+        FleetEvaluator.evaluate() and the rows of the table.
+        """
+        fleet_evaluator = FleetEvaluator(self.get_airport_atlas(), self.get_currency_table(),
+                                         self.get_aircraft_catalog())
+        results = fleet_evaluator.evaluate([home_airport] + other_airports, aircraft_codes, empty_tank, hubs,
+                                           stopover_cost, constraints, self.result_cache)
+        print(fleet_evaluator.format_table(results))
+        critical_range = self.get_critical_range(home_airport, other_airports, hubs, constraints)
+        if critical_range is not None:
+            print("Shortest range that can complete this itinerary: " + "{:,.0f}".format(critical_range) + " km")
+        return results, fleet_evaluator.make_table_rows(results)
+
+    def get_critical_range(self, home_airport, other_airports, hubs=[], constraints=[]):
+        """
+        Returns the shortest range (km) with which an aircraft can complete an itinerary, or None if it can't be
+        completed (see Itinerary.get_critical_range()).  Any aircraft with at least this range can complete it.
+        """
+        itinerary = Itinerary(self.get_airport_atlas(), self.get_currency_table(), [home_airport] + other_airports,
+                              None, 0, hubs=hubs, constraints=constraints)
+        if itinerary.get_error_message() is not None:
+            return None
+        return itinerary.get_critical_range()
+
+    def solve_roster(self, itinerary_file, output_file="bestroutes/bestroutes.csv", append_date_time=True,
+                     empty_tank=False, hubs=[], stopover_cost=0, workers=1, solver="enumerate"):
+        """ Finds the cheapest route for every itinerary in a csv file, writes the report and returns the roster. """
+        itinerary_roster = ItineraryRoster(self.get_airport_atlas(), self.get_currency_table(),
+                                           self.get_aircraft_catalog(), itinerary_file, output_file,
+                                           append_date_time, empty_tank, hubs, stopover_cost)
+        itinerary_roster.get_cheapest_routes(workers, solver, result_cache=self.result_cache)
+        itinerary_roster.write_to_csv()
+        return itinerary_roster
+
+    def __has_changed(self, filename):
+        try:
+            status = os.stat(filename)
+        except OSError:
+            return True
+        return self.__fingerprints.get(filename) != (status.st_size, status.st_mtime_ns)
+
+    def __save_fingerprint(self, filename):
+        status = os.stat(filename)
+        self.__fingerprints[filename] = (status.st_size, status.st_mtime_ns)
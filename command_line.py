@@ -0,0 +1,205 @@
+"""
+The command-line version of Fuel Manager, which doesn't need tkinter or a display.
+
+    python command_line.py single DUB LHR JFK --aircraft 777 --hubs MHP --constraints "JFK LHR"
+    python command_line.py roster "input files/testroutes.csv" --workers 4
+    python command_line.py fleet DUB LHR JFK --aircraft 777 A330 747
+
+"single" manages one itinerary (the home airport followed by the other airports) and "roster" manages every
+itinerary in a csv file, as in the GUI.  "fleet" ranks the aircraft (all of those in the aircraft file, unless
+some are given) by the cost of flying one itinerary.  Run with --help for the other options.
+
+The program exits with one of the exit codes below.  Errors are printed to stderr as "fuelmanager: title: message".
+With --json, the result is printed to stdout as a single JSON object instead, with the fields "status",
+"exit_code", "results" (one per itinerary, or per aircraft for "fleet": the route and the csv row, or an error)
+and "error" (the title and message of an input error), and everything else that the program prints goes to stderr.
+
+The modules that do the work are only imported once the arguments have been read, so --help and argument
+errors are quick.
+"""
+from time import perf_counter
+import argparse
+import json
+import sys
+
+START_TIME = perf_counter()
+
+EXIT_SUCCESS = 0
+EXIT_ROUTE_NOT_FOUND = 1                              # an itinerary could not be completed
+EXIT_INVALID_INPUT = 2                                # invalid arguments, airport codes etc.
+EXIT_FILE_ERROR = 3                                   # an input file could not be read
+STATUSES = {EXIT_SUCCESS: "ok", EXIT_ROUTE_NOT_FOUND: "route_not_found", EXIT_INVALID_INPUT: "invalid_input",
+            EXIT_FILE_ERROR: "file_error"}
+
+
+def build_argument_parser():
+    parser = argparse.ArgumentParser(prog="fuelmanager", description="Finds the cheapest way to buy fuel for "
+                                                                     "an aircraft's itinerary.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    single = commands.add_parser("single", help="manage a single itinerary")
+    single.add_argument("airports", nargs="+", metavar="AIRPORT",
+                        help="the home airport followed by the other airports to visit")
+    single.add_argument("--aircraft", required=True, help="the aircraft code")
+    single.add_argument("--constraints", default="",
+                        help="airports to visit in order, e.g. \"JFK AAL / JFK CDG\" (' / ' separates constraints)")
+    single.add_argument("--solver", default="enumerate",
+                        choices=["enumerate", "kernel", "batch", "dynamic", "branch_and_bound"])
+
+    roster = commands.add_parser("roster", help="manage a list of itineraries in a csv file")
+    roster.add_argument("itinerary_file", help="the csv file of itineraries")
+    roster.add_argument("--stream", action="store_true",
+                        help="read, solve and write the itineraries a few at a time (the results aren't printed "
+                             "with --json)")
+    roster.add_argument("--checkpoint", metavar="FILE", help="save each solution in a checkpoint file")
+    roster.add_argument("--resume", action="store_true",
+                        help="don't solve the itineraries already solved in the checkpoint file again")
+
+    fleet = commands.add_parser("fleet", help="rank the aircraft by the cost of flying one itinerary")
+    fleet.add_argument("airports", nargs="+", metavar="AIRPORT",
+                       help="the home airport followed by the other airports to visit")
+    fleet.add_argument("--aircraft", nargs="+", metavar="CODE",
+                       help="the aircraft codes to compare (every aircraft in the aircraft file if not given)")
+    fleet.add_argument("--constraints", default="",
+                       help="airports to visit in order, e.g. \"JFK AAL / JFK CDG\" (' / ' separates constraints)")
+
+    for command in (single, roster):
+        command.add_argument("--workers", type=int, default=1, help="the number of worker processes")
+    for command in (single, roster, fleet):
+        command.add_argument("--hubs", nargs="*", default=[], metavar="AIRPORT", help="airports for extra stops")
+        command.add_argument("--stopover-cost", default="0", help="the cost of each extra stop (euros)")
+        command.add_argument("--empty-tank", action="store_true", help="always return home with an empty tank")
+        command.add_argument("--no-real-time-rates", action="store_true",
+                             help="use the exchange rates from the file only")
+        command.add_argument("--output", default="bestroutes/bestroutes.csv", help="the output csv file")
+        command.add_argument("--no-date-time", action="store_true",
+                             help="don't append the date and time to the output filename")
+        command.add_argument("--airport-file", default="input files/airport.csv")
+        command.add_argument("--aircraft-file", default="input files/aircraft.csv")
+        command.add_argument("--currency-file", default="input files/countrycurrency.csv")
+        command.add_argument("--exchange-rate-file", default="input files/currencyrates.csv")
+        command.add_argument("--result-cache", metavar="FILE",
+                             help="remember the cheapest routes in this file, so they aren't solved again")
+        command.add_argument("--json", action="store_true", help="print the result as JSON")
+    fleet.set_defaults(output="bestroutes/fleet.csv")
+    return parser
+
+
+def manage_single_itinerary(arguments):
+    """ Returns the exit code and the results for the "single" command. """
+    from validate_inputs import validate_inputs_for_single_itinerary
+    from main import manage_single_route
+    hubs, stopover_cost, constraints, home_airport, other_airports, aircraft_code = \
+        validate_inputs_for_single_itinerary([hub.upper() for hub in arguments.hubs],
+                                             arguments.stopover_cost,
+                                             arguments.constraints.upper().split(),
+                                             arguments.airports[0].upper(),
+                                             [airport.upper() for airport in arguments.airports[1:]],
+                                             arguments.aircraft.upper())
+    itinerary = manage_single_route(home_airport, other_airports, aircraft_code,
+                                    not arguments.no_real_time_rates, not arguments.no_date_time,
+                                    arguments.empty_tank, hubs, stopover_cost, constraints,
+                                    arguments.airport_file, arguments.aircraft_file, arguments.currency_file,
+                                    arguments.exchange_rate_file, arguments.output, arguments.solver,
+                                    arguments.workers, result_cache_file=arguments.result_cache)
+    result = get_result(itinerary)
+    return (EXIT_SUCCESS if "error" not in result else EXIT_ROUTE_NOT_FOUND), [result]
+
+
+def manage_roster(arguments):
+    """ Returns the exit code and the results for the "roster" command. """
+    from validate_inputs import validate_inputs_for_list_of_itineraries
+    from main import manage_list_of_routes
+    hubs, stopover_cost = validate_inputs_for_list_of_itineraries([hub.upper() for hub in arguments.hubs],
+                                                                  arguments.stopover_cost)
+    itinerary_roster = manage_list_of_routes(not arguments.no_real_time_rates, not arguments.no_date_time,
+                                             arguments.empty_tank, hubs, stopover_cost, arguments.itinerary_file,
+                                             arguments.airport_file, arguments.aircraft_file,
+                                             arguments.currency_file, arguments.exchange_rate_file,
+                                             arguments.output, arguments.workers, streaming=arguments.stream,
+                                             checkpoint_file=arguments.checkpoint, resume=arguments.resume,
+                                             result_cache_file=arguments.result_cache)
+    results = [get_result(itinerary) for itinerary in itinerary_roster.itinerary_list]
+    if itinerary_roster.itineraries_not_completed > 0:
+        return EXIT_ROUTE_NOT_FOUND, results
+    return EXIT_SUCCESS, results
+
+
+def manage_fleet(arguments):
+    """ Returns the exit code and the results for the "fleet" command. """
+    from validate_inputs import validate_inputs_for_fleet
+    from main import manage_fleet
+    hubs, stopover_cost, constraints, home_airport, other_airports, aircraft_codes = \
+        validate_inputs_for_fleet([hub.upper() for hub in arguments.hubs],
+                                  arguments.stopover_cost,
+                                  arguments.constraints.upper().split(),
+                                  arguments.airports[0].upper(),
+                                  [airport.upper() for airport in arguments.airports[1:]],
+                                  [code.upper() for code in arguments.aircraft or []])
+    ranked_itineraries = manage_fleet(home_airport, other_airports, aircraft_codes or None,
+                                      not arguments.no_real_time_rates, not arguments.no_date_time,
+                                      arguments.empty_tank, hubs, stopover_cost, constraints,
+                                      arguments.airport_file, arguments.aircraft_file, arguments.currency_file,
+                                      arguments.exchange_rate_file, arguments.output,
+                                      result_cache_file=arguments.result_cache)
+    results = [dict(aircraft=aircraft_code, **get_result(itinerary))
+               for aircraft_code, itinerary in ranked_itineraries]
+    if all("error" in result for result in results):
+        return EXIT_ROUTE_NOT_FOUND, results
+    return EXIT_SUCCESS, results
+
+
+def get_result(itinerary):
+    """ Returns the cheapest route of a managed itinerary (or its error) as a dictionary. """
+    if itinerary.get_error_message() is not None:
+        return {"error": itinerary.get_error_message()}
+    return {"route": itinerary.cheapest_route.get_airport_codes(),
+            "csv_row": itinerary.cheapest_route.make_csv_row()}
+
+
+def run(arguments):
+    """ Manages the itineraries and returns the exit code, the results and the input error (or None). """
+    from validate_inputs import InvalidInputError, InputFileError
+    try:
+        if arguments.command == "single":
+            exit_code, results = manage_single_itinerary(arguments)
+        elif arguments.command == "fleet":
+            exit_code, results = manage_fleet(arguments)
+        else:
+            exit_code, results = manage_roster(arguments)
+    except InputFileError as error:
+        return EXIT_FILE_ERROR, [], error
+    except InvalidInputError as error:
+        return EXIT_INVALID_INPUT, [], error
+    except OSError as error:                          # e.g. the output directory doesn't exist
+        return EXIT_FILE_ERROR, [], InputFileError("Unable to write the output file", str(error))
+    return exit_code, results, None
+
+
+def main(argv=None):
+    """ Runs the command line and returns the exit code. """
+    parser = build_argument_parser()
+    arguments = parser.parse_args(argv)
+    if arguments.command == "roster" and arguments.resume and arguments.checkpoint is None:
+        parser.error("--resume needs a --checkpoint file")
+    if arguments.json:
+        # keep stdout for the JSON result
+        stdout = sys.stdout
+        sys.stdout = sys.stderr
+        try:
+            exit_code, results, error = run(arguments)
+        finally:
+            sys.stdout = stdout
+        output = {"status": STATUSES[exit_code], "exit_code": exit_code, "results": results,
+                  "elapsed_seconds": round(perf_counter() - START_TIME, 3)}
+        if error is not None:
+            output["error"] = {"title": error.title, "message": error.message}
+        print(json.dumps(output))
+    else:
+        exit_code, results, error = run(arguments)
+        if error is not None:
+            print("fuelmanager:", error.title + ":", error.message.replace("\n", " "), file=sys.stderr)
+    return exit_code
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""
+Functions for pricing a route one leg at a time.
+
+Route.calculate_cheapest_place_to_refuel() buys the fuel for each leg at the cheapest airport that is
+still within range, i.e. at the cheapest airport whose spare fuel capacity has not yet been used up.
+Because airports that are visited later always have more spare capacity than airports visited
+earlier, an airport that is dearer than a later airport is never used again.  The airports that can
+still matter therefore form a "window": a tuple of (fuel price, remaining capacity) pairs in which the
+prices rise and the remaining capacities rise from the front of the window to the back.
+
+The cost of the rest of a route depends only on the window and on the legs still to be flown, so these
+functions let the route solvers extend a partial route leg by leg and compare partial routes by their
+windows.  The purchases and costs are the same as those calculated by Route.
+
+plan_refuelling() uses the same idea to work out the purchases for a whole route in linear time.
+"""
+from collections import deque
+INFINITY = float("inf")
+
+
+def add_airport(window, fuel_price, fuel_capacity):
+    """
+    Adds an airport to the back of the window when the aircraft lands there.
+
+    Airports at the back of the window whose fuel is at least as expensive are removed, since the new
+    airport will always have more spare capacity than they have.
+    """
+    end = len(window)
+    while end > 0 and window[end - 1][0] >= fuel_price:
+        end -= 1
+    return window[:end] + ((fuel_price, fuel_capacity),)
+
+
+def buy_fuel_for_leg(window, distance):
+    """
+    Buys enough fuel to fly a leg of the given distance at the cheapest airports in the window.
+
+    Returns the cost of the fuel and the window on arrival at the next airport.
+    """
+    cost = 0
+    bought = 0
+    i = 0
+    while True:
+        fuel_price, remaining_capacity = window[i]
+        if remaining_capacity >= distance:
+            cost += (distance - bought) * fuel_price
+            break
+        cost += (remaining_capacity - bought) * fuel_price
+        bought = remaining_capacity
+        i += 1
+    return cost, tuple((fuel_price, remaining_capacity - distance)
+                       for fuel_price, remaining_capacity in window[i:] if remaining_capacity > distance)
+
+
+def buy_fuel_to_bring_home(window, home_fuel_price):
+    """
+    Fills the tank at every airport in the window where fuel is cheaper than at the home airport.
+
+    Returns the cost of the extra fuel and the quantity of extra fuel brought home.
+    """
+    cost = 0
+    extra_fuel = 0
+    for fuel_price, remaining_capacity in window:
+        if fuel_price >= home_fuel_price:
+            break
+        cost += (remaining_capacity - extra_fuel) * fuel_price
+        extra_fuel = remaining_capacity
+    return cost, extra_fuel
+
+
+def plan_refuelling(fuel_prices, distances, fuel_capacity, empty_tank=False, total_cost_of_stopovers=0):
+    """
+    Works out where to buy fuel on a route, making the same purchases as
+    Route.calculate_cheapest_place_to_refuel().
+
+    The airports whose spare capacity can still be used are kept in a deque, cheapest (and earliest)
+    first, as in a sliding-window minimum.  Each airport joins and leaves the deque at most once, so the
+    plan takes time proportional to the number of stops rather than to its square.
+
+    Inputs: the fuel price at each stop, the distance from each stop to the next (the last distance is
+    the flight home) and the aircraft's fuel capacity.
+    Output: a list of the quantity of fuel to buy at each stop, the total fuel spend, the quantity of
+    extra fuel brought home and the net cost.
+    """
+    purchases = [0] * len(fuel_prices)
+    window = deque()
+    joined_at = [0] * len(fuel_prices)        # the fuel bought before each stop, i.e. its distance from home
+    fuel_bought = 0
+    total_cost = 0
+
+    for stop in range(len(fuel_prices)):
+        fuel_price = fuel_prices[stop]
+        while window and fuel_prices[window[-1]] >= fuel_price:
+            window.pop()
+        window.append(stop)
+        joined_at[stop] = fuel_bought
+
+        # buy enough fuel for the next leg
+        fuel_needed = distances[stop]
+        while fuel_needed > 0:
+            cheapest_stop = window[0]
+            spare_fuel_capacity = fuel_capacity - (fuel_bought - joined_at[cheapest_stop])
+            if spare_fuel_capacity <= 0:
+                window.popleft()
+                continue
+            quantity_purchased = min(spare_fuel_capacity, fuel_needed)
+            purchases[cheapest_stop] += quantity_purchased
+            total_cost += quantity_purchased * fuel_prices[cheapest_stop]
+            fuel_bought += quantity_purchased
+            fuel_needed -= quantity_purchased
+            if quantity_purchased == spare_fuel_capacity:
+                window.popleft()                                           # the tank is full at this stop
+
+    extra_fuel = 0
+    if not empty_tank:
+        # buy extra fuel at any stop within range where it is cheaper than at home
+        home_fuel_price = fuel_prices[0]
+        while window and fuel_prices[window[0]] < home_fuel_price:
+            cheapest_stop = window.popleft()
+            spare_fuel_capacity = fuel_capacity - (fuel_bought - joined_at[cheapest_stop])
+            if spare_fuel_capacity > 0:
+                purchases[cheapest_stop] += spare_fuel_capacity
+                total_cost += spare_fuel_capacity * fuel_prices[cheapest_stop]
+                fuel_bought += spare_fuel_capacity
+                extra_fuel += spare_fuel_capacity
+
+    net_cost = get_net_cost(total_cost, extra_fuel, fuel_prices[0], total_cost_of_stopovers, empty_tank)
+    return purchases, total_cost, extra_fuel, net_cost
+
+
+def get_net_cost(total_cost, extra_fuel, home_fuel_price, total_cost_of_stopovers, empty_tank):
+    """ Returns the net cost of a route in the same way as Route.calculate_cheapest_place_to_refuel(). """
+    if empty_tank:
+        return total_cost + total_cost_of_stopovers + total_cost_of_stopovers
+    return total_cost - (extra_fuel * home_fuel_price) + total_cost_of_stopovers
+
+
+def get_extra_cost_limit(window1, window2, highest_fuel_price):
+    """
+    Returns the most that the rest of any route could cost in addition if it started from window1 rather
+    than from window2.  For every future kilometer, the fuel from window1 can cost no more than the
+    difference between its price in the two windows (or the price of the dearest airport, if window1
+    has run out of fuel that window2 still has).
+
+    If a partial route with window1 cost this much less than a partial route at the same airport with
+    window2, the second partial route can never lead to a cheaper route than the first.
+    """
+    limit = 0
+    i = 0
+    start = 0
+    for fuel_price, remaining_capacity in window2:
+        # compare the two windows over each stretch in which their prices don't change
+        while start < remaining_capacity:
+            while i < len(window1) and window1[i][1] <= start:
+                i += 1
+            if i < len(window1):
+                price1, end = window1[i][0], min(window1[i][1], remaining_capacity)
+            else:
+                price1, end = highest_fuel_price, remaining_capacity
+            if price1 > fuel_price:
+                limit += (end - start) * (price1 - fuel_price)
+            start = end
+    return limit
+
+
+def get_lowest_possible_cost(window, distance, fuel_price, home_fuel_price, fuel_capacity, empty_tank):
+    """
+    Returns a lower bound on the net cost of the rest of a route, given the window on departure from the
+    current airport, a lower bound on the distance still to be flown, and the lowest fuel price at any
+    airport that may still be visited.
+
+    Every future kilometer costs at least the lower of the window price and fuel_price.  Unless the tank
+    must be empty on the return home, up to a full tank of fuel may be brought home and is valued at the
+    home airport's fuel price.
+    """
+    cost = 0
+    start = 0
+    for window_fuel_price, remaining_capacity in window + ((INFINITY, INFINITY),):
+        lowest_price = min(window_fuel_price, fuel_price)
+        end = min(remaining_capacity, distance)
+        if end > start:
+            cost += (end - start) * lowest_price
+        if not empty_tank and lowest_price < home_fuel_price:
+            extra_start, extra_end = max(start, distance), min(remaining_capacity, distance + fuel_capacity)
+            if extra_end > extra_start:
+                cost -= (extra_end - extra_start) * (home_fuel_price - lowest_price)
+        start = remaining_capacity
+        if start >= distance + fuel_capacity:
+            break
+    return cost
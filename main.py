@@ -1,17 +1,21 @@
 """
-This is the mainline program, which is launched from the GUI.
-It has two main functions:
+This is the mainline program, which is launched from the GUI or from the command line (see command_line).
+It has three main functions:
     * manage_single_route() takes an itinerary that was input via the GUI and calculates the fuel purchase strategy.
     * manage_list_of_routes() takes a list of itineraries as its input and manages the fuel purchase strategy for all
     itineraries in the list.
+    * manage_fleet() takes an itinerary and ranks the aircraft in the aircraft file by the cost of flying it.
+Each function can be given a SolverSession, so that the input files are only loaded again when they change.
+If an input file can't be read, they raise an InputFileError (and if the aircraft code is unknown, an
+InvalidInputError), which the GUI shows in a dialog box.
 """
-from CurrencyTable import CurrencyTable, CountryCurrencyFileError, ExchangeRateFileError
-from AirportAtlas import AirportAtlas
+from CurrencyTable import CountryCurrencyFileError, ExchangeRateFileError
+from SolverSession import SolverSession
 from ItineraryRoster import ItineraryRoster
+from RosterCheckpoint import RosterCheckpoint
 from Itinerary import Itinerary
-from AircraftCatalog import AircraftCatalog
+from validate_inputs import InvalidInputError, InputFileError
 from time import strftime
-from tkinter import messagebox
 import os, csv
 
 
@@ -25,48 +29,46 @@ def manage_list_of_routes(real_exch_rates=True,
                           aircraft_file="input files/aircraft.csv",
                           currency_file="input files/countrycurrency.csv",
                           exchange_rate_file="input files/currencyrates.csv",
-                          output_file="bestroutes/bestroutes.csv"):
+                          output_file="bestroutes/bestroutes.csv",
+                          workers=1,
+                          rate_cache_file="exchangeratecache.sqlite",
+                          session=None,
+                          streaming=False,
+                          checkpoint_file=None,
+                          resume=False,
+                          result_cache_file=None):
+    """
+    The workers parameter is the number of processes used to solve the itineraries (see ItineraryRoster).
+    If streaming is True, the itineraries are read, solved and written a few at a time instead of all at once
+    (see ItineraryRoster.stream_cheapest_routes()), and the roster that is returned holds no itineraries.
+    If a checkpoint_file is given, each solution is saved in it as soon as it is found, and if resume is True,
+    the itineraries already solved in the checkpoint are not solved again (see RosterCheckpoint).
+    Itineraries that have been solved before are looked up in the session's ResultCache, which is kept in
+    result_cache_file if one is given (and there is no session).
+    Real-time exchange rates are kept in rate_cache_file between runs (see ExchangeRateCache).
+    If a SolverSession is given, the data it has already loaded is reused (and rate_cache_file is ignored).
+    """
+    session = get_session(session, airport_file, aircraft_file, currency_file, exchange_rate_file,
+                          real_exch_rates, rate_cache_file, result_cache_file)
 
     # read data from input files and handle errors reading the files
-    try:
-        airport_atlas = AirportAtlas(airport_file)
-    except FileNotFoundError:
-        title = "File not found"
-        message = "Unable to open the file: " + str(airport_file) + "\nPlease check the file path and try again"
-        messagebox.showerror(title, message)
-        return None
-    try:
-        currency_table = CurrencyTable(currency_file, exchange_rate_file,
-                                   real_exch_rates)
-    except CountryCurrencyFileError:
-        title = "Unable to find the currency file"
-        message = "Unable to open the file: " + str(currency_file) + "\nPlease check the file path and try again"
-        messagebox.showerror(title, message)
-        return None
-    except ExchangeRateFileError:
-        title = "Unable to find the currency file"
-        message = "Unable to open the file: " + str(exchange_rate_file) + "\nPlease check the file path and try again"
-        messagebox.showerror(title, message)
-        return None
-    try:
-        aircraft_catalogue = AircraftCatalog(aircraft_file)
-    except FileNotFoundError:
-        title = "File not found"
-        message = "Unable to open the file: " + str(aircraft_file) + "\nPlease check the file path and try again"
-        messagebox.showerror(title, message)
-        return None
+    airport_atlas, currency_table, aircraft_catalogue = load_input_files(session)
     try:
         itinerary_roster = ItineraryRoster(airport_atlas, currency_table, aircraft_catalogue, itinerary_file, output_file,
-                                       append_date_time, empty_tank, hubs, stopover_cost)
+                                       append_date_time, empty_tank, hubs, stopover_cost, streaming)
     except FileNotFoundError:
         title = "File not found"
         message = "Unable to open the file: " + str(itinerary_file) + "\nPlease check the file path and try again"
-        messagebox.showerror(title, message)
-        return None
+        raise InputFileError(title, message)
 
     # calculate the best routes and output the results
-    itinerary_roster.get_cheapest_routes()
-    itinerary_roster.write_to_csv()
+    checkpoint = None if checkpoint_file is None else RosterCheckpoint(checkpoint_file, resume)
+    if streaming:
+        itinerary_roster.stream_cheapest_routes(workers, checkpoint=checkpoint, result_cache=session.result_cache)
+    else:
+        itinerary_roster.get_cheapest_routes(workers, checkpoint=checkpoint, result_cache=session.result_cache)
+        itinerary_roster.write_to_csv()
+    return itinerary_roster
 
 
 def manage_single_route(home_airport,
@@ -82,52 +84,133 @@ def manage_single_route(home_airport,
                         aircraft_file="input files/aircraft.csv",
                         currency_file="input files/countrycurrency.csv",
                         exchange_rate_file="input files/currencyrates.csv",
-                        output_file="bestroutes/bestroutes.csv"):
+                        output_file="bestroutes/bestroutes.csv",
+                        solver="enumerate",
+                        workers=1,
+                        rate_cache_file="exchangeratecache.sqlite",
+                        session=None,
+                        result_cache_file=None):
+    """
+    The solver and workers parameters are passed to Itinerary.get_cheapest_route(); with the "branch_and_bound"
+    solver, a single large itinerary can be searched by several worker processes.
+    Real-time exchange rates are kept in rate_cache_file between runs (see ExchangeRateCache).
+    If a SolverSession is given, the data it has already loaded is reused (and rate_cache_file is ignored).
+    An itinerary that has been solved before is looked up in the session's ResultCache, which is kept in
+    result_cache_file if one is given (and there is no session).
+    """
+    session = get_session(session, airport_file, aircraft_file, currency_file, exchange_rate_file,
+                          real_exch_rates, rate_cache_file, result_cache_file)
     airport_list = [home_airport] + other_airports
 
     # read data from input files and handle errors reading the files
-    try:
-        airport_atlas = AirportAtlas(airport_file)
-    except FileNotFoundError:
-        title = "File not found"
-        message = "Unable to open the file: " + str(airport_file) + "\nPlease check the file path and try again"
-        messagebox.showerror(title, message)
-        return None
-    try:
-        currency_table = CurrencyTable(currency_file, exchange_rate_file, real_exch_rates)
-    except CountryCurrencyFileError:
-        title = "Unable to find the currency file"
-        message = "Unable to open the file: " + str(currency_file) + "\nPlease check the file path and try again"
-        messagebox.showerror(title, message)
-        return None
-    except ExchangeRateFileError:
-        title = "Unable to find the currency file"
-        message = "Unable to open the file: " + str(exchange_rate_file) + "\nPlease check the file path and try again"
-        messagebox.showerror(title, message)
-        return None
-    try:
-        aircraft_catalogue = AircraftCatalog(aircraft_file)
-    except FileNotFoundError:
-        title = "File not found"
-        message = "Unable to open the file: " + str(aircraft_file) + "\nPlease check the file path and try again"
-        messagebox.showerror(title, message)
-        return None
+    airport_atlas, currency_table, aircraft_catalogue = load_input_files(session)
     try:
         aircraft_range = aircraft_catalogue.get_aircraft_range(aircraft_code)
     except KeyError:
         title = "Invalid aircraft code"
         message = "Unable to find the aircraft code " + str(aircraft_code) + "\nPlease check the code and try again"
-        messagebox.showerror(title, message)
-        return None
+        raise InvalidInputError(title, message)
 
     # calculate the best route and output the result
     itinerary = Itinerary(airport_atlas, currency_table, airport_list, aircraft_code,
                           aircraft_range, empty_tank, hubs, stopover_cost, constraints)
     print(itinerary)
-    itinerary.get_cheapest_route()
+    itinerary.get_cheapest_route(solver, workers, session.result_cache)
     if itinerary.get_error_message() is None:
         output_file = make_output_filename(output_file, append_date_time)
         write_to_csv(output_file, itinerary.cheapest_route.make_csv_row())
+    return itinerary
+
+
+def manage_fleet(home_airport,
+                 other_airports,
+                 aircraft_codes=None,
+                 real_exch_rates=True,
+                 append_date_time=True,
+                 empty_tank=False,
+                 hubs=[],
+                 stopover_cost=0,
+                 constraints=[],
+                 airport_file="input files/airport.csv",
+                 aircraft_file="input files/aircraft.csv",
+                 currency_file="input files/countrycurrency.csv",
+                 exchange_rate_file="input files/currencyrates.csv",
+                 output_file="bestroutes/fleet.csv",
+                 rate_cache_file="exchangeratecache.sqlite",
+                 session=None,
+                 result_cache_file=None):
+    """
+    Finds the cheapest route for an itinerary with each of the aircraft (every aircraft in the aircraft file if
+    no codes are given), in one pass (see FleetEvaluator), and saves the aircraft ranked by net cost in a csv file.
+    Returns a list of (aircraft code, Itinerary), the cheapest first.  The other parameters are as for
+    manage_single_route().
+    """
+    session = get_session(session, airport_file, aircraft_file, currency_file, exchange_rate_file,
+                          real_exch_rates, rate_cache_file, result_cache_file)
+    airport_atlas, currency_table, aircraft_catalogue = load_input_files(session)
+    for aircraft_code in aircraft_codes or []:
+        try:
+            aircraft_catalogue.get_aircraft_range(aircraft_code)
+        except KeyError:
+            title = "Invalid aircraft code"
+            message = "Unable to find the aircraft code " + str(aircraft_code) + \
+                      "\nPlease check the code and try again"
+            raise InvalidInputError(title, message)
+
+    # rank the aircraft and output the result
+    results, table_rows = session.solve_fleet(home_airport, other_airports, aircraft_codes, empty_tank, hubs,
+                                              stopover_cost, constraints)
+    output_file = make_output_filename(output_file, append_date_time)
+    with open(output_file, "wt", newline="") as f:
+        writer = csv.writer(f, delimiter=",")
+        writer.writerow(["Rank", "Aircraft", "Range (km)", "Net fuel cost", "Route"])
+        writer.writerows(table_rows)
+    print("Report successfully saved to", output_file)
+    return results
+
+
+def load_input_files(session):
+    """
+    Returns the airport atlas, currency table and aircraft catalog of a session.  Raises an InputFileError if
+    an input file can't be read.
+    """
+    try:
+        airport_atlas = session.get_airport_atlas()
+    except FileNotFoundError:
+        title = "File not found"
+        message = "Unable to open the file: " + str(session.airport_file) + \
+                  "\nPlease check the file path and try again"
+        raise InputFileError(title, message)
+    try:
+        currency_table = session.get_currency_table()
+    except CountryCurrencyFileError:
+        title = "Unable to find the currency file"
+        message = "Unable to open the file: " + str(session.currency_file) + \
+                  "\nPlease check the file path and try again"
+        raise InputFileError(title, message)
+    except ExchangeRateFileError:
+        title = "Unable to find the currency file"
+        message = "Unable to open the file: " + str(session.exchange_rate_file) + \
+                  "\nPlease check the file path and try again"
+        raise InputFileError(title, message)
+    try:
+        aircraft_catalogue = session.get_aircraft_catalog()
+    except FileNotFoundError:
+        title = "File not found"
+        message = "Unable to open the file: " + str(session.aircraft_file) + \
+                  "\nPlease check the file path and try again"
+        raise InputFileError(title, message)
+    return airport_atlas, currency_table, aircraft_catalogue
+
+
+def get_session(session, airport_file, aircraft_file, currency_file, exchange_rate_file, real_exch_rates,
+                rate_cache_file, result_cache_file=None):
+    """ Returns the session pointed at the given input files, or a new session if there isn't one. """
+    if session is None:
+        return SolverSession(airport_file, aircraft_file, currency_file, exchange_rate_file, real_exch_rates,
+                             rate_cache_file, result_cache_file)
+    session.set_input_files(airport_file, aircraft_file, currency_file, exchange_rate_file, real_exch_rates)
+    return session
 
 
 def make_output_filename(output_file, append_date_time):
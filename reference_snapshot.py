@@ -0,0 +1,155 @@
+"""
+Binary snapshots of the reference data read from the input csv files.
+
+Parsing airport.csv and the other input files is most of the start-up time of the program.  A snapshot holds
+the data that AirportAtlas, AircraftCatalog or CurrencyTable builds from its csv file(s), so that it can be
+loaded without parsing them again.
+
+A snapshot file contains:
+    * an 8-byte magic string, the format version and the length of the header;
+    * a JSON header, which records the size, modification time and SHA-256 hash of each source file, the
+      lists of strings (airport codes, country names etc.) and the position of each array of numbers;
+    * the arrays of numbers (coordinates, ranges, exchange rates and indices into the lists of strings),
+      each aligned to 8 bytes, so that they can be used directly from a memory-mapped file.
+
+A snapshot is only used if it has the current version and its source files are unchanged: a file whose size
+and modification time are unchanged is assumed to be unchanged, otherwise its hash is checked.
+load_or_compile_snapshot() rebuilds a snapshot automatically when this is not the case.
+
+Run this module to compile snapshots of the default input files.
+"""
+from array import array
+from hashlib import sha256
+import json
+import mmap
+import os
+import struct
+import sys
+
+MAGIC = b"FMSNAP\x00\x00"
+SNAPSHOT_VERSION = 1
+PREAMBLE = struct.Struct("<8sIQ")                      # magic string, version, length of the JSON header
+
+
+def get_snapshot_filename(source_file):
+    """ Returns the name of the snapshot of a csv file, which is kept next to it. """
+    return source_file + ".snapshot"
+
+
+def get_fingerprint(source_file, with_hash=True):
+    """ Returns the size, modification time and (optionally) SHA-256 hash of a file. """
+    status = os.stat(source_file)
+    fingerprint = {"size": status.st_size, "mtime_ns": status.st_mtime_ns}
+    if with_hash:
+        with open(source_file, "rb") as f:
+            fingerprint["sha256"] = sha256(f.read()).hexdigest()
+    return fingerprint
+
+
+def is_unchanged(source_file, fingerprint):
+    """ Checks whether a file still matches the fingerprint recorded in a snapshot. """
+    try:
+        current = get_fingerprint(source_file, with_hash=False)
+    except OSError:
+        return False
+    if current["size"] == fingerprint["size"] and current["mtime_ns"] == fingerprint["mtime_ns"]:
+        return True
+    return get_fingerprint(source_file)["sha256"] == fingerprint["sha256"]
+
+
+def save_snapshot(snapshot_file, source_files, strings, arrays):
+    """
+    Writes a snapshot.
+
+    strings is a dictionary of lists of strings and arrays is a dictionary of arrays (from the array module).
+    The snapshot is written to a temporary file first, so that a snapshot that is being read is never
+    left half-written.
+    """
+    header = {"byteorder": sys.byteorder,
+              "sources": [dict(get_fingerprint(source_file), path=os.path.basename(source_file))
+                          for source_file in source_files],
+              "strings": strings,
+              "arrays": {}}
+
+    # the arrays' positions depend on the length of the header, which depends on their positions, so the
+    # header is padded to a fixed length that leaves room for the offsets
+    offset = 0
+    for name, values in arrays.items():
+        header["arrays"][name] = {"typecode": values.typecode, "count": len(values), "offset": offset}
+        offset += align(len(values) * values.itemsize)
+    header_length = align(PREAMBLE.size + len(json.dumps(header).encode("utf8")) + 20 * len(arrays)) \
+        - PREAMBLE.size
+    for description in header["arrays"].values():
+        description["offset"] += PREAMBLE.size + header_length
+    encoded_header = json.dumps(header).encode("utf8")
+    encoded_header += b" " * (header_length - len(encoded_header))
+
+    temporary_file = snapshot_file + ".tmp"
+    with open(temporary_file, "wb") as f:
+        f.write(PREAMBLE.pack(MAGIC, SNAPSHOT_VERSION, header_length))
+        f.write(encoded_header)
+        for values in arrays.values():
+            data = values.tobytes()
+            f.write(data + bytes(align(len(data)) - len(data)))
+    os.replace(temporary_file, snapshot_file)
+
+
+def load_snapshot(snapshot_file, source_files):
+    """
+    Returns the strings and arrays in a snapshot, or None, None if there is no up-to-date snapshot.
+    The arrays are read-only memoryviews of the memory-mapped file.
+    """
+    try:
+        with open(snapshot_file, "rb") as f:
+            magic, version, header_length = PREAMBLE.unpack(f.read(PREAMBLE.size))
+            if magic != MAGIC or version != SNAPSHOT_VERSION:
+                return None, None
+            header = json.loads(f.read(header_length).decode("utf8"))
+            if header["byteorder"] != sys.byteorder or len(header["sources"]) != len(source_files):
+                return None, None
+            for source_file, fingerprint in zip(source_files, header["sources"]):
+                if not is_unchanged(source_file, fingerprint):
+                    return None, None
+            snapshot = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError, KeyError, struct.error):
+        return None, None
+    arrays = {}
+    for name, description in header["arrays"].items():
+        size = description["count"] * array(description["typecode"]).itemsize
+        arrays[name] = memoryview(snapshot)[description["offset"]:description["offset"] + size] \
+            .cast(description["typecode"])
+    return header["strings"], arrays
+
+
+def load_or_compile_snapshot(snapshot_file, source_files, compile_snapshot):
+    """
+    Returns the strings and arrays in a snapshot of the source files.  If there is no up-to-date snapshot,
+    compile_snapshot() is called to read the source files and return the strings and arrays, and the
+    snapshot is saved for next time (unless it can't be written).
+    """
+    strings, arrays = load_snapshot(snapshot_file, source_files)
+    if strings is None:
+        strings, arrays = compile_snapshot()
+        try:
+            save_snapshot(snapshot_file, source_files, strings, arrays)
+        except OSError:
+            pass
+    return strings, arrays
+
+
+def align(length):
+    """ Rounds a length up to a multiple of 8 bytes. """
+    return (length + 7) // 8 * 8
+
+
+def main():
+    from AirportAtlas import AirportAtlas
+    from AircraftCatalog import AircraftCatalog
+    from CurrencyTable import CurrencyTable
+    print(AirportAtlas("input files/airport.csv", use_snapshot=True))
+    AircraftCatalog("input files/aircraft.csv", use_snapshot=True)
+    CurrencyTable("input files/countrycurrency.csv", "input files/currencyrates.csv", False, use_snapshot=True)
+    print("Snapshots saved in the input files directory")
+
+if __name__ == '__main__':
+    main()
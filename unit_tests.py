@@ -1,10 +1,36 @@
-from Itinerary import Itinerary
+from Itinerary import Itinerary, INSUFFICIENT_RANGE_ERROR
 from AirportAtlas import AirportAtlas
 from CurrencyTable import CurrencyTable, CountryCurrencyFileError
 from AircraftCatalog import AircraftCatalog
+from ItineraryRoster import ItineraryRoster
+from ExchangeRateCache import ExchangeRateCache
+from reference_snapshot import get_snapshot_filename, load_snapshot
 from main import manage_single_route
-from Route import ImpossibleRouteError
+from Route import Route, ImpossibleRouteError
+from RouteKernel import RouteKernel
+from fuel_window import plan_refuelling
+from ConstraintChecker import ConstraintChecker
+from SolverSession import SolverSession
+from RosterCheckpoint import RosterCheckpoint
+from ResultCache import ResultCache
+from CandidateRoutes import TooManyCandidateRoutesError
+from FleetEvaluator import FleetEvaluator
+from QuotingService import QuotingService
+from validate_inputs import validate_inputs_for_single_itinerary, InvalidInputError
+import command_line
 import unittest
+import unittest.mock
+import os, pickle, shutil, tempfile, threading, time, asyncio, json, subprocess, sys, io, csv, socket
+import random, types
+from contextlib import redirect_stdout, redirect_stderr
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from urllib.error import HTTPError
+import urllib.request
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 class TestAirportAtlas(unittest.TestCase):
     test_atlas = AirportAtlas('input files/airport.csv')
@@ -80,5 +106,913 @@ class TestAirportAtlas(unittest.TestCase):
         result = self.test_itinerary.build_route_list()
         self.assertEqual(len(result), 384)
 
+
+class TestRouteGeneration(unittest.TestCase):
+    test_atlas = AirportAtlas('input files/airport.csv')
+    test_currency_table = CurrencyTable(real_exch_rates=False)
+    airport_list = ['JAA', 'AAL', 'DUB', 'JFK', 'SYD']
+
+    def test_routes_are_generated_lazily_in_the_same_order(self):
+        itinerary = Itinerary(self.test_atlas, self.test_currency_table, self.airport_list, '737', 15000,
+                              hubs=['MHP'], constraints=[['JFK', 'AAL']])
+        routes = itinerary.iter_routes()
+        first_route = next(routes)
+        self.assertEqual([first_route] + list(routes), itinerary.build_route_list())
+
+    @staticmethod
+    def filter_routes_as_originally(route_list, constraints):
+        """ The filtering done by the original Itinerary.apply_constraints(), before ConstraintChecker. """
+        valid_route_list = route_list
+        for constraint in constraints:
+            new_route_list = []
+            if len(constraint) == 2:
+                for route in valid_route_list:
+                    airport0 = route.index(constraint[0])
+                    airport1 = (len(route) - 1) - route[::-1].index(constraint[1])
+                    if airport0 < airport1:
+                        new_route_list.append(route)
+            elif len(constraint) == 3:
+                for route in valid_route_list:
+                    airport0 = route.index(constraint[0])
+                    airport2 = (len(route) - 1) - route[::-1].index(constraint[2])
+                    if airport0 < airport2:
+                        if constraint[1] in route[airport0 + 1:airport2]:
+                            new_route_list.append(route)
+            valid_route_list = new_route_list
+        return valid_route_list
+
+    def test_constraints_filter_routes_in_the_same_way_as_the_original_filter(self):
+        unconstrained_itinerary = Itinerary(self.test_atlas, self.test_currency_table, self.airport_list, '737', 15000)
+        all_routes = unconstrained_itinerary.build_route_list()
+        for constraints in ([['JFK', 'AAL']], [['JFK', 'AAL'], ['SYD', 'DUB', 'JFK']], [['AAL', 'JAA', 'DUB']]):
+            itinerary = Itinerary(self.test_atlas, self.test_currency_table, self.airport_list, '737', 15000,
+                                  constraints=constraints)
+            expected_routes = self.filter_routes_as_originally(all_routes, constraints)
+            self.assertEqual(itinerary.build_route_list(), expected_routes)
+            checker = ConstraintChecker(constraints)
+            self.assertEqual([route for route in all_routes if checker.is_met(route)], expected_routes)
+
+    def test_constraint_checker_abandons_partial_routes_that_cannot_meet_the_constraints(self):
+        checker = ConstraintChecker([['JFK', 'AAL'], ['SYD', 'DUB']])
+        # an extra stop at JFK or AAL could still meet the first constraint
+        self.assertTrue(checker.can_be_met(['JAA', 'AAL'], ['DUB', 'JFK', 'SYD']))
+        # but one extra stop can't meet both constraints
+        self.assertFalse(checker.can_be_met(['JAA', 'AAL', 'DUB'], ['JFK', 'SYD']))
+        self.assertTrue(checker.is_met(['JAA', 'JFK', 'SYD', 'AAL', 'DUB']))
+
+    def test_feasible_routes_are_the_routes_the_aircraft_can_fly(self):
+        for aircraft_range in (1200, 2909, 8000):
+            itinerary = Itinerary(self.test_atlas, self.test_currency_table, ['DUB', 'LHR', 'CDG', 'AMS', 'MAD'],
+                                  'TEST', aircraft_range, hubs=['MUC'], constraints=[['AMS', 'CDG']])
+            expected_routes = []
+            for route in itinerary.iter_routes():
+                try:
+                    Route(route, aircraft_range, self.test_atlas, self.test_currency_table)
+                    expected_routes.append(route)
+                except ImpossibleRouteError:
+                    pass
+            self.assertEqual(list(itinerary.iter_feasible_routes()), expected_routes)
+
+    def test_an_airport_that_cannot_be_reached_is_found_without_searching(self):
+        itinerary = Itinerary(self.test_atlas, self.test_currency_table, ['JFK', 'ICN', 'SYD'], 'BAE146', 2909,
+                              hubs=['LHR'])
+        self.assertEqual(itinerary.get_unreachable_airports(), ['ICN', 'SYD'])
+        self.assertEqual(list(itinerary.iter_feasible_routes()), [])
+        with redirect_stdout(io.StringIO()):
+            self.assertEqual(itinerary.get_cheapest_route("dynamic"), (None, 10 ** 10))
+        self.assertEqual(itinerary.search_statistics, {})
+
+    def test_the_route_list_is_not_kept_after_solving(self):
+        itinerary = Itinerary(self.test_atlas, self.test_currency_table, self.airport_list, '737', 15000)
+        itinerary.get_cheapest_route()
+        self.assertFalse(hasattr(itinerary, "route_list"))
+
+
+class TestCurrencyTable(unittest.TestCase):
+    def test_the_last_exchange_rate_for_a_currency_is_used(self):
+        with tempfile.TemporaryDirectory() as directory:
+            exchange_rate_file = os.path.join(directory, "currencyrates.csv")
+            with open('input files/currencyrates.csv', 'rt') as f, open(exchange_rate_file, 'wt') as g:
+                g.write(f.read())
+                g.write("Pound Sterling,GBP,2.0,0.5\n")
+            currency_table = CurrencyTable('input files/countrycurrency.csv', exchange_rate_file, False)
+        self.assertEqual(currency_table.get_exchange_rate("United Kingdom"), 2.0)
+        self.assertEqual(currency_table.get_exchange_rate("Ireland"), 1)
+        self.assertGreaterEqual(currency_table.load_time, 0)
+
+
+class StandInExchangeRateHandler(BaseHTTPRequestHandler):
+    """ Answers exchange rate requests like the real-time exchange rate website, and counts them. """
+    requests = []
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        self.requests.append(query["from"][0])
+        if query["from"][0] == "CHF":
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(b"<div><span class=bld>2.5000 EUR</span></div>")
+
+    def log_message(self, *args):
+        pass
+
+
+class TestRealTimeExchangeRates(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StandInExchangeRateHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        StandInExchangeRateHandler.requests = []
+        url = "http://127.0.0.1:" + str(self.server.server_address[1]) + "/finance/converter?a=1&from="
+        self.currency_table = CurrencyTable(exchange_rate_url=url, timeout=5)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_each_currency_is_downloaded_once(self):
+        self.currency_table.prefetch_real_time_rates(["United States", "Ecuador", "Panama", "United Kingdom",
+                                                      "Ireland", "France", "Atlantis"])
+        self.assertEqual(sorted(StandInExchangeRateHandler.requests), ["GBP", "USD"])
+        self.assertEqual(self.currency_table.get_exchange_rate("Ecuador"), 2.5)
+        self.assertEqual(self.currency_table.get_exchange_rate("Ireland"), 1)
+        self.currency_table.get_exchange_rate("Guam")
+        self.assertEqual(len(StandInExchangeRateHandler.requests), 2)
+
+    def test_streaming_workers_are_given_the_rates_downloaded_for_each_window(self):
+        with tempfile.TemporaryDirectory() as directory:
+            input_file = os.path.join(directory, 'roster.csv')
+            with open(input_file, 'wt') as f:
+                f.write("DUB,LHR,JFK,777\nDUB,JFK,SYD,777\nDUB,NRT,DEL,777\nDUB,GRU,CPT,777\n")
+            roster = ItineraryRoster(AirportAtlas('input files/airport.csv'), self.currency_table,
+                                     AircraftCatalog('input files/aircraft.csv'), input_file,
+                                     os.path.join(directory, 'output.csv'), False, streaming=True)
+            with redirect_stdout(io.StringIO()):
+                roster.stream_cheapest_routes(workers=2, batch_size=2)
+        self.assertEqual(sorted(StandInExchangeRateHandler.requests),
+                         ["AUD", "BRL", "GBP", "INR", "JPY", "USD", "ZAR"])
+
+    def test_the_rate_from_the_file_is_used_if_the_download_fails(self):
+        self.assertEqual(self.currency_table.get_exchange_rate("Switzerland"),
+                         CurrencyTable(real_exch_rates=False).get_exchange_rate("Switzerland"))
+
+    def get_currency_table_with_cache(self, directory, **cache_options):
+        rate_cache = ExchangeRateCache(os.path.join(directory, "rates.sqlite"), **cache_options)
+        url = "http://127.0.0.1:" + str(self.server.server_address[1]) + "/finance/converter?a=1&from="
+        return CurrencyTable(exchange_rate_url=url, timeout=5, rate_cache=rate_cache)
+
+    def test_cached_rates_are_not_downloaded_again(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.get_currency_table_with_cache(directory).get_exchange_rate("United States")
+            self.assertEqual(self.get_currency_table_with_cache(directory).get_exchange_rate("Ecuador"), 2.5)
+        self.assertEqual(StandInExchangeRateHandler.requests, ["USD"])
+
+    def test_failed_downloads_are_tried_again_when_they_expire(self):
+        with tempfile.TemporaryDirectory() as directory:
+            currency_table = self.get_currency_table_with_cache(directory, failed_time_to_live=0.2)
+            currency_table.get_exchange_rate("Switzerland")
+            currency_table.get_exchange_rate("Switzerland")
+            self.assertEqual(StandInExchangeRateHandler.requests, ["CHF"])
+            time.sleep(0.3)
+            currency_table.get_exchange_rate("Switzerland")
+        self.assertEqual(StandInExchangeRateHandler.requests, ["CHF", "CHF"])
+
+    def test_rates_are_downloaded_again_when_they_expire(self):
+        with tempfile.TemporaryDirectory() as directory:
+            currency_table = self.get_currency_table_with_cache(directory, time_to_live=0.2)
+            currency_table.get_exchange_rate("United States")
+            self.assertEqual(currency_table.get_exchange_rate("Ecuador"), 2.5)
+            self.assertEqual(StandInExchangeRateHandler.requests, ["USD"])
+            time.sleep(0.3)
+            currency_table.get_exchange_rate("United States")
+        self.assertEqual(StandInExchangeRateHandler.requests, ["USD", "USD"])
+
+    def test_rates_that_expire_during_a_solve_are_kept_until_it_ends(self):
+        with tempfile.TemporaryDirectory() as directory:
+            currency_table = self.get_currency_table_with_cache(directory, time_to_live=0.2)
+            itinerary = Itinerary(TestAirportAtlas.test_atlas, currency_table, ['DUB', 'LHR', 'JFK'], '777', 15000)
+            get_signature = itinerary.get_signature
+
+            def get_signature_slowly():
+                signature = get_signature()
+                time.sleep(0.3)                                   # the rates expire before any route is priced
+                return signature
+
+            result_cache = ResultCache(filename=os.path.join(directory, "results.sqlite"))
+            with unittest.mock.patch.object(itinerary, "get_signature", get_signature_slowly):
+                itinerary.get_cheapest_route(result_cache=result_cache)
+            self.assertEqual(sorted(StandInExchangeRateHandler.requests), ["GBP", "USD"])
+            currency_table.get_exchange_rate("United Kingdom")
+        self.assertEqual(sorted(StandInExchangeRateHandler.requests), ["GBP", "GBP", "USD"])
+
+    def test_stale_rates_are_used_while_they_are_downloaded_again(self):
+        with tempfile.TemporaryDirectory() as directory:
+            rate_cache = ExchangeRateCache(os.path.join(directory, "rates.sqlite"), time_to_live=0,
+                                           stale_while_revalidate=True)
+            rate_cache.store_rate("GBP", 1.25)
+            currency_table = self.get_currency_table_with_cache(directory, time_to_live=0,
+                                                                stale_while_revalidate=True)
+            self.assertEqual(currency_table.get_exchange_rate("United Kingdom"), 1.25)
+            for _ in range(50):
+                if rate_cache.get_rate("GBP")[0] == 2.5:
+                    break
+                time.sleep(0.05)
+            self.assertEqual(rate_cache.get_rate("GBP")[0], 2.5)
+
+
+class TestReferenceSnapshot(unittest.TestCase):
+    test_aircraft_catalog = AircraftCatalog('input files/aircraft.csv')
+
+    def test_snapshots_give_the_same_data_as_the_csv_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for filename in ('airport.csv', 'aircraft.csv', 'countrycurrency.csv', 'currencyrates.csv'):
+                shutil.copy(os.path.join('input files', filename), directory)
+            files = [os.path.join(directory, filename) for filename in ('airport.csv', 'aircraft.csv',
+                                                                       'countrycurrency.csv', 'currencyrates.csv')]
+            for _ in range(2):                                      # compile the snapshots, then load them
+                atlas = AirportAtlas(files[0], use_snapshot=True)
+                aircraft_catalog = AircraftCatalog(files[1], use_snapshot=True)
+                currency_table = CurrencyTable(files[2], files[3], False, use_snapshot=True)
+                self.assertEqual(atlas.get_distance_between_airports('DUB', 'SYD'),
+                                 AirportAtlas('input files/airport.csv').get_distance_between_airports('DUB', 'SYD'))
+                self.assertEqual(atlas.get_country('KBL'), 'Afghanistan')
+                self.assertEqual(aircraft_catalog.get_aircraft_range('777'),
+                                 self.test_aircraft_catalog.get_aircraft_range('777'))
+                self.assertEqual(currency_table.get_exchange_rate('United Kingdom'), 1.4029)
+            self.assertIsNotNone(load_snapshot(get_snapshot_filename(files[0]), [files[0]])[0])
+
+    def test_snapshot_is_rebuilt_when_the_csv_file_changes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            currency_file = os.path.join(directory, 'countrycurrency.csv')
+            exchange_rate_file = os.path.join(directory, 'currencyrates.csv')
+            shutil.copy('input files/countrycurrency.csv', currency_file)
+            shutil.copy('input files/currencyrates.csv', exchange_rate_file)
+            CurrencyTable(currency_file, exchange_rate_file, False, use_snapshot=True)
+            with open(exchange_rate_file, 'at') as f:
+                f.write("Pound Sterling,GBP,2.0,0.5\n")
+            currency_table = CurrencyTable(currency_file, exchange_rate_file, False, use_snapshot=True)
+        self.assertEqual(currency_table.get_exchange_rate('United Kingdom'), 2.0)
+
+
+class TestAirportColumns(unittest.TestCase):
+    test_atlas = AirportAtlas('input files/airport.csv')
+
+    def test_columnar_atlas_gives_the_same_answers(self):
+        with tempfile.TemporaryDirectory() as directory:
+            airport_file = os.path.join(directory, 'airport.csv')
+            shutil.copy('input files/airport.csv', airport_file)
+            atlas = AirportAtlas(airport_file, columnar=True)
+            copied_atlas = pickle.loads(pickle.dumps(atlas))
+            for columnar_atlas in (atlas, copied_atlas):
+                self.assertEqual(str(columnar_atlas), str(self.test_atlas))
+                self.assertTrue(columnar_atlas.is_in_airport_dictionary('DUB'))
+                self.assertFalse(columnar_atlas.is_in_airport_dictionary('ZZZ'))
+                self.assertEqual(columnar_atlas.get_country('JFK'), 'United States')
+                self.assertEqual(columnar_atlas.get_distance_between_airports('SYD', 'LHR'),
+                                 self.test_atlas.get_distance_between_airports('SYD', 'LHR'))
+            del atlas, copied_atlas, columnar_atlas                 # unmap the snapshot before it is deleted
+
+
+class TestDistanceMatrix(unittest.TestCase):
+    test_atlas = AirportAtlas('input files/airport.csv')
+    airport_codes = ['JAA', 'AAL', 'DUB', 'JFK', 'SYD', 'LHR', 'JAA']
+
+    def test_matrix_distances_match_the_atlas(self):
+        """
+        Every distance in the matrix should be identical to the distance calculated by the atlas.
+        """
+        matrix = self.test_atlas.get_distance_matrix(self.airport_codes)
+        for airport1 in self.airport_codes:
+            for airport2 in self.airport_codes:
+                if airport1 != airport2:
+                    result = matrix.get_distance(airport1, airport2)
+                    self.assertEqual(result, self.test_atlas.get_distance_between_airports(airport1, airport2))
+
+    def test_matrix_ids_are_positions_in_the_list_of_unique_codes(self):
+        matrix = self.test_atlas.get_distance_matrix(self.airport_codes)
+        self.assertEqual(len(matrix), 6)
+        self.assertEqual(matrix.get_index('DUB'), 2)
+        self.assertEqual(matrix.get_code(5), 'LHR')
+        self.assertEqual(matrix.get_distance_by_index(3, 3), 0)
+
+
+class TestRouteSolvers(unittest.TestCase):
+    test_atlas = AirportAtlas('input files/airport.csv')
+    test_currency_table = CurrencyTable(real_exch_rates=False)
+    solvers = ("kernel", "dynamic", "branch_and_bound")
+    itineraries = ((['DUB', 'LHR', 'SYD', 'JFK', 'AAL'], 15000, False, [], 0, []),
+                   (['JAA', 'AAL', 'DUB', 'JFK', 'SYD'], 15000, True, ['MHP'], 0, [['SYD', 'DUB', 'JFK']]),
+                   (['DUB', 'CDG', 'JFK', 'AAL', 'AMS', 'ORK'], 9000, False, ['MHP', 'KBL'], 200, [['JFK', 'AAL']]),
+                   (['SSN', 'ORK', 'MAN', 'CDG', 'SIN'], 5000, False, ['IST'], 0, []))
+
+    def get_itinerary(self, airport_list, aircraft_range, empty_tank, hubs, stopover_cost, constraints):
+        return Itinerary(self.test_atlas, self.test_currency_table, airport_list, 'TEST', aircraft_range,
+                         empty_tank, hubs, stopover_cost, constraints)
+
+    def test_solvers_find_a_route_as_cheap_as_the_enumerated_routes(self):
+        for itinerary_details in self.itineraries:
+            expected_route, expected_cost = self.get_itinerary(*itinerary_details).get_cheapest_route("enumerate")
+            for solver in self.solvers:
+                route, cost = self.get_itinerary(*itinerary_details).get_cheapest_route(solver)
+                if expected_route is None:
+                    self.assertIsNone(route)
+                else:
+                    self.assertAlmostEqual(cost, expected_cost, places=6)
+
+    def test_solvers_report_an_impossible_itinerary(self):
+        for solver in self.solvers:
+            itinerary = self.get_itinerary(['DUB', 'LHR', 'SYD'], 2909, False, [], 0, [])
+            route, cost = itinerary.get_cheapest_route(solver)
+            self.assertIsNone(route)
+            self.assertEqual(cost, 10 ** 10)
+            self.assertIsNotNone(itinerary.get_error_message())
+
+    def test_parallel_branch_and_bound_finds_the_same_route(self):
+        for itinerary in self.itineraries:
+            expected_route, expected_cost = self.get_itinerary(*itinerary).get_cheapest_route("branch_and_bound")
+            route, cost = self.get_itinerary(*itinerary).get_cheapest_route("branch_and_bound", 3)
+            self.assertEqual(cost, expected_cost)
+            if expected_route is not None:
+                self.assertEqual(route.get_airport_codes(), expected_route.get_airport_codes())
+
+    def test_branch_and_bound_reports_pruning_statistics(self):
+        itinerary = self.get_itinerary(*self.itineraries[2])
+        itinerary.get_cheapest_route("branch_and_bound")
+        self.assertGreater(itinerary.search_statistics["nodes expanded"], 0)
+        self.assertGreater(itinerary.search_statistics["nodes pruned"], 0)
+
+
+class TestLinearTimeRefuelling(unittest.TestCase):
+    test_atlas = AirportAtlas('input files/airport.csv')
+    test_currency_table = CurrencyTable(real_exch_rates=False)
+    routes = ((['DUB', 'LHR', 'SYD', 'JFK', 'AAL'], 17500),
+              (['DUB', 'MHP', 'CDG', 'KBL', 'JFK', 'AAL', 'KBL', 'AMS'], 11000),
+              (['JFK', 'ICN', 'LAX', 'DXB', 'SIN', 'MAD'], 15610),
+              (['ORK', 'MAN', 'CDG', 'IST', 'ATH', 'FCO', 'ZRH'], 2909))
+
+    def test_linear_time_refuelling_makes_the_same_purchases(self):
+        for route, aircraft_range in self.routes:
+            for empty_tank in (False, True):
+                greedy_route = Route(route, aircraft_range, self.test_atlas, self.test_currency_table,
+                                     empty_tank, 100)
+                linear_route = Route(route, aircraft_range, self.test_atlas, self.test_currency_table,
+                                     empty_tank, 100, refuelling_algorithm="linear")
+                self.assertEqual(linear_route.make_csv_row(), greedy_route.make_csv_row())
+                self.assertAlmostEqual(linear_route.get_cost_of_route(), greedy_route.get_cost_of_route(), places=6)
+
+
+class TestRouteKernel(unittest.TestCase):
+    test_atlas = AirportAtlas('input files/airport.csv')
+    test_currency_table = CurrencyTable(real_exch_rates=False)
+
+    def test_kernel_cost_matches_the_cost_of_a_route(self):
+        for empty_tank in (False, True):
+            itinerary = Itinerary(self.test_atlas, self.test_currency_table, ['DUB', 'LHR', 'SYD', 'JFK', 'AAL'],
+                                  'TEST', 11000, empty_tank, ['MHP'], 150)
+            search_space = itinerary.get_search_space()
+            kernel = RouteKernel(search_space)
+            for route in itinerary.build_route_list():
+                cost = kernel.get_cost_of_route([search_space.airport_codes.index(airport) for airport in route])
+                try:
+                    expected_cost = Route(route, 11000, self.test_atlas, self.test_currency_table, empty_tank,
+                                          150 * (len(route) - 5)).get_cost_of_route()
+                except ImpossibleRouteError:
+                    self.assertIsNone(cost)
+                else:
+                    self.assertAlmostEqual(cost, expected_cost, places=6)
+
+    def test_kernel_cost_matches_plan_refuelling_on_random_routes(self):
+        generator = random.Random(2017)
+        for _ in range(500):
+            size = generator.randint(2, 8)
+            fuel_capacity = generator.choice([1000, 2500, 6000])
+            # some legs are exactly as long as the range, and some are too long to fly
+            distances = [[0 if i == j else generator.choice([generator.randint(1, fuel_capacity)] * 8
+                                                               + [fuel_capacity, fuel_capacity + 1])
+                          for j in range(size)] for i in range(size)]
+            search_space = types.SimpleNamespace(fuel_prices=[generator.uniform(0.5, 2) for _ in range(size)],
+                                                 distances=distances, fuel_capacity=fuel_capacity,
+                                                 empty_tank=generator.random() < 0.5, stopover_cost=100,
+                                                 itinerary_size=size - 1)
+            route = [0] + generator.sample(range(1, size), size - 1)
+            legs = [distances[route[stop]][route[(stop + 1) % size]] for stop in range(size)]
+            cost = RouteKernel(search_space).get_cost_of_route(route)
+            if max(legs) > fuel_capacity:
+                self.assertIsNone(cost)
+                continue
+            purchases, total_cost, extra_fuel, net_cost = plan_refuelling(
+                [search_space.fuel_prices[airport] for airport in route], legs, float(fuel_capacity),
+                search_space.empty_tank, search_space.stopover_cost * (size - search_space.itinerary_size))
+            self.assertAlmostEqual(cost, net_cost, places=6)
+
+
+@unittest.skipIf(numpy is None, "the batch solver needs NumPy")
+class TestBatchRouteEvaluator(unittest.TestCase):
+    test_atlas = AirportAtlas('input files/airport.csv')
+    test_currency_table = CurrencyTable(real_exch_rates=False)
+
+    def test_batch_costs_match_the_costs_of_routes(self):
+        from BatchRouteEvaluator import BatchRouteEvaluator
+        for empty_tank in (False, True):
+            itinerary = Itinerary(self.test_atlas, self.test_currency_table, ['DUB', 'LHR', 'SYD', 'JFK', 'AAL'],
+                                  'TEST', 11000, empty_tank, ['MHP'], 150)
+            search_space = itinerary.get_search_space()
+            routes = [route for route in itinerary.build_route_list() if len(route) == 6]
+            costs = BatchRouteEvaluator(search_space).get_costs_of_routes(
+                [[search_space.airport_codes.index(airport) for airport in route] for route in routes])
+            for route, cost in zip(routes, costs):
+                try:
+                    expected_cost = Route(route, 11000, self.test_atlas, self.test_currency_table, empty_tank,
+                                          150).get_cost_of_route()
+                except ImpossibleRouteError:
+                    self.assertEqual(cost, float("inf"))
+                else:
+                    self.assertAlmostEqual(cost, expected_cost, places=6)
+
+    def test_batch_solver_finds_the_cheapest_route(self):
+        for airport_list, aircraft_range in ((['DUB', 'CDG', 'JFK', 'AAL', 'AMS', 'ORK'], 9000),
+                                             (['DUB', 'LHR', 'SYD'], 2909)):
+            expected_route, expected_cost = Itinerary(self.test_atlas, self.test_currency_table, airport_list,
+                                                      'TEST', aircraft_range, hubs=['MHP']).get_cheapest_route()
+            route, cost = Itinerary(self.test_atlas, self.test_currency_table, airport_list,
+                                    'TEST', aircraft_range, hubs=['MHP']).get_cheapest_route("batch")
+            self.assertAlmostEqual(cost, expected_cost, places=6)
+
+
+class TestItineraryRoster(unittest.TestCase):
+    test_atlas = AirportAtlas('input files/airport.csv')
+    test_aircraft_catalog = AircraftCatalog('input files/aircraft.csv')
+    test_currency_table = CurrencyTable(real_exch_rates=False)
+    itineraries = ("DUB,LHR,JFK,777,\n"
+                   "DUB,ZZZ,777,,\n"
+                   "DUB,LHR,SYD,A319,\n"
+                   "BOS,DFW,ORD,SFO,737\n"
+                   "DUB,CDG,XXXX,,\n")
+
+    def get_results(self, workers):
+        with tempfile.TemporaryDirectory() as directory:
+            itinerary_file = os.path.join(directory, "itineraries.csv")
+            with open(itinerary_file, "wt") as f:
+                f.write(self.itineraries)
+            roster = ItineraryRoster(self.test_atlas, self.test_currency_table, self.test_aircraft_catalog,
+                                     itinerary_file, os.path.join(directory, "bestroutes.csv"), False)
+        roster.get_cheapest_routes(workers)
+        return [itinerary.get_error_message() if itinerary.get_error_message() is not None
+                else itinerary.cheapest_route.make_csv_row() for itinerary in roster.itinerary_list]
+
+    def test_parallel_roster_gives_the_same_results_in_the_same_order(self):
+        expected_results = self.get_results(1)
+        self.assertEqual(self.get_results(3), expected_results)
+        self.assertEqual(expected_results[1], "Unable to find the airport code ZZZ.\nPlease check the code and try again.")
+
+    def test_streamed_roster_writes_the_same_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            itinerary_file = os.path.join(directory, "itineraries.csv")
+            with open(itinerary_file, "wt") as f:
+                f.write(self.itineraries)
+            output_files = []
+            for streaming, workers in ((False, 1), (True, 1), (True, 2)):
+                output_files.append(os.path.join(directory, "bestroutes" + str(len(output_files)) + ".csv"))
+                roster = ItineraryRoster(self.test_atlas, self.test_currency_table, self.test_aircraft_catalog,
+                                         itinerary_file, output_files[-1], False, streaming=streaming)
+                if streaming:
+                    self.assertEqual(roster.itinerary_list, [])
+                    roster.stream_cheapest_routes(workers, batch_size=2)
+                else:
+                    roster.get_cheapest_routes()
+                    roster.write_to_csv()
+                self.assertEqual((roster.itineraries_managed, roster.itineraries_not_completed), (5, 3))
+            contents = []
+            for output_file in output_files:
+                with open(output_file) as f:
+                    contents.append(f.read())
+        self.assertEqual(contents[1], contents[0])
+        self.assertEqual(contents[2], contents[0])
+
+    def test_resumed_roster_only_solves_the_remaining_itineraries(self):
+        with tempfile.TemporaryDirectory() as directory:
+            itinerary_file = os.path.join(directory, "itineraries.csv")
+            checkpoint_file = os.path.join(directory, "checkpoint.jsonl")
+            with open(itinerary_file, "wt") as f:
+                f.write(self.itineraries)
+            expected_results = self.get_results(1)
+            for streaming, workers in ((False, 1), (False, 2), (True, 1), (True, 2)):
+                roster = ItineraryRoster(self.test_atlas, self.test_currency_table, self.test_aircraft_catalog,
+                                         itinerary_file, os.path.join(directory, "bestroutes.csv"), False)
+                roster.get_cheapest_routes(checkpoint=RosterCheckpoint(checkpoint_file))
+                # simulate a run that stopped while it was saving the fourth solution
+                with open(checkpoint_file) as f:
+                    lines = f.readlines()
+                with open(checkpoint_file, "wt") as f:
+                    f.writelines(lines[:4] + [lines[4][:20]])
+
+                roster = ItineraryRoster(self.test_atlas, self.test_currency_table, self.test_aircraft_catalog,
+                                         itinerary_file, os.path.join(directory, "bestroutes.csv"), False,
+                                         streaming=streaming)
+                console_output = io.StringIO()
+                with redirect_stdout(console_output):
+                    if streaming:
+                        roster.stream_cheapest_routes(workers, checkpoint=RosterCheckpoint(checkpoint_file, True))
+                    else:
+                        roster.get_cheapest_routes(workers, checkpoint=RosterCheckpoint(checkpoint_file, True))
+                        roster.write_to_csv()
+                self.assertEqual(console_output.getvalue().count("restored from the checkpoint"), 3)
+                with open(checkpoint_file) as f:
+                    self.assertEqual(len(f.readlines()), 6)
+                with open(os.path.join(directory, "bestroutes.csv")) as f:
+                    rows = list(csv.reader(f))[1:]
+                self.assertEqual([row[0] if len(row) == 1 else row for row in rows],
+                                 [result.replace("\n", " ") if isinstance(result, str) else result
+                                  for result in expected_results])
+
+    def test_saved_solutions_for_a_different_aircraft_range_are_solved_again(self):
+        with tempfile.TemporaryDirectory() as directory:
+            itinerary_file = os.path.join(directory, "itineraries.csv")
+            checkpoint_file = os.path.join(directory, "checkpoint.jsonl")
+            with open(itinerary_file, "wt") as f:
+                f.write("DUB,LHR,JFK,777\n")
+            roster = ItineraryRoster(self.test_atlas, self.test_currency_table, self.test_aircraft_catalog,
+                                     itinerary_file, os.path.join(directory, "bestroutes.csv"), False)
+            with redirect_stdout(io.StringIO()):
+                roster.get_cheapest_routes(checkpoint=RosterCheckpoint(checkpoint_file))
+            # the aircraft file is edited, so that the 777 can no longer fly the saved route
+            aircraft_file = os.path.join(directory, "aircraft.csv")
+            with open('input files/aircraft.csv', 'rt') as f, open(aircraft_file, 'wt') as g:
+                g.write(f.read().replace("777,jet,imperial,Boeing,9700", "777,jet,metric,Boeing,2000"))
+            aircraft_catalog = AircraftCatalog(aircraft_file)
+            roster = ItineraryRoster(self.test_atlas, self.test_currency_table, aircraft_catalog,
+                                     itinerary_file, os.path.join(directory, "bestroutes.csv"), False)
+            console_output = io.StringIO()
+            with redirect_stdout(console_output):
+                roster.get_cheapest_routes(checkpoint=RosterCheckpoint(checkpoint_file, True))
+        self.assertNotIn("restored from the checkpoint", console_output.getvalue())
+        self.assertEqual(roster.itinerary_list[0].get_error_message(), INSUFFICIENT_RANGE_ERROR)
+
+    def test_a_solution_that_cannot_be_flown_is_not_completed(self):
+        itinerary = Itinerary(self.test_atlas, self.test_currency_table, ['DUB', 'JFK'], '777', 2000)
+        itinerary.set_solution((['DUB', 'JFK'], None, {}))
+        self.assertIsNone(itinerary.cheapest_route)
+        self.assertEqual(itinerary.get_error_message(), INSUFFICIENT_RANGE_ERROR)
+
+
+class TestFleetEvaluator(unittest.TestCase):
+    test_atlas = AirportAtlas('input files/airport.csv')
+    test_currency_table = CurrencyTable(real_exch_rates=False)
+    test_catalog = AircraftCatalog('input files/aircraft.csv')
+
+    def test_each_aircraft_gets_the_route_it_would_get_on_its_own(self):
+        airport_list = ['DUB', 'LHR', 'CDG', 'JFK', 'SYD']
+        aircraft_codes = ['BAE146', '737', 'A320', 'A321', '777', 'MD11']
+        results = FleetEvaluator(self.test_atlas, self.test_currency_table, self.test_catalog).evaluate(
+            airport_list, aircraft_codes, hubs=['SIN', 'MHP'], stopover_cost=50)
+        self.assertEqual(sorted(aircraft_code for aircraft_code, itinerary in results), sorted(aircraft_codes))
+        costs = []
+        for aircraft_code, itinerary in results:
+            expected_itinerary = Itinerary(self.test_atlas, self.test_currency_table, airport_list, aircraft_code,
+                                           self.test_catalog.get_aircraft_range(aircraft_code), hubs=['SIN', 'MHP'],
+                                           stopover_cost=50)
+            with redirect_stdout(io.StringIO()):
+                expected_route, expected_cost = expected_itinerary.get_cheapest_route("kernel")
+            if expected_route is None:
+                self.assertIsNotNone(itinerary.get_error_message())
+                costs.append(10 ** 10)
+            else:
+                self.assertEqual(itinerary.cheapest_route.get_airport_codes(), expected_route.get_airport_codes())
+                costs.append(itinerary.cheapest_route.get_cost_of_route())
+        self.assertEqual(costs, sorted(costs))
+        self.assertEqual(results[0][0], 'MD11')
+
+    def test_the_fleet_command_ranks_the_aircraft(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output_file = os.path.join(directory, "fleet.csv")
+            output = io.StringIO()
+            with redirect_stdout(output), redirect_stderr(io.StringIO()):
+                exit_code = command_line.main(["fleet", "DUB", "JFK", "--aircraft", "BAE146", "777", "747",
+                                               "--output", output_file, "--no-real-time-rates", "--no-date-time",
+                                               "--json"])
+            with open(output_file, "rt", newline="") as f:
+                rows = list(csv.reader(f))
+        self.assertEqual(exit_code, command_line.EXIT_SUCCESS)
+        results = json.loads(output.getvalue())["results"]
+        self.assertEqual([result["aircraft"] for result in results][-1], "BAE146")
+        self.assertIn("error", results[-1])
+        self.assertEqual([row[1] for row in rows[1:]], [result["aircraft"] for result in results])
+        self.assertEqual(rows[1][0], "1")
+
+    def test_the_critical_range_is_the_shortest_range_that_can_complete_the_itinerary(self):
+        itinerary = Itinerary(self.test_atlas, self.test_currency_table, ['DUB', 'LHR', 'SYD', 'JFK', 'AAL'], None,
+                              0, hubs=['MHP', 'SIN'], constraints=[['JFK', 'AAL']])
+        distance_matrix = itinerary.get_distance_matrix()
+        expected_range = min(max(distance_matrix.get_distance(route[i - 1], route[i]) for i in range(len(route)))
+                             for route in itinerary.iter_routes())
+        critical_range = itinerary.get_critical_range()
+        self.assertEqual(critical_range, expected_range)
+        self.assertEqual(itinerary.get_range_breakpoints()[0], critical_range)
+        self.assertEqual(list(itinerary.iter_feasible_routes(critical_range - 1)), [])
+        self.assertNotEqual(list(itinerary.iter_feasible_routes(critical_range)), [])
+
+    def test_an_itinerary_that_stays_at_home_has_a_critical_range_of_zero(self):
+        itinerary = Itinerary(self.test_atlas, self.test_currency_table, ['DUB'], None, 0, hubs=['LHR'])
+        self.assertEqual(itinerary.get_critical_range(), 0)
+        self.assertEqual(itinerary.get_range_breakpoints()[0], 0)
+
+    def test_the_cost_curve_matches_solving_at_each_range(self):
+        airport_list = ['DUB', 'LHR', 'CDG', 'AMS', 'FRA']
+        curve = FleetEvaluator(self.test_atlas, self.test_currency_table, self.test_catalog).get_cost_curve(
+            airport_list, hubs=['MAD'])
+        self.assertGreater(len(curve), 1)
+        for aircraft_range, itinerary in curve:
+            expected_itinerary = Itinerary(self.test_atlas, self.test_currency_table, airport_list, None,
+                                           aircraft_range, hubs=['MAD'])
+            with redirect_stdout(io.StringIO()):
+                expected_route, expected_cost = expected_itinerary.get_cheapest_route()
+            self.assertAlmostEqual(itinerary.cheapest_route.get_cost_of_route(), expected_cost, places=6)
+
+
+class TestRepricing(unittest.TestCase):
+    test_atlas = AirportAtlas('input files/airport.csv')
+    test_aircraft_catalog = AircraftCatalog('input files/aircraft.csv')
+
+    def test_repricing_finds_the_same_route_as_solving_again(self):
+        currency_table = CurrencyTable(real_exch_rates=False)
+        airport_list = ['DUB', 'LHR', 'CDG', 'AMS', 'FRA']
+        itinerary = Itinerary(self.test_atlas, currency_table, airport_list, 'BAE146', 2909,
+                              hubs=['MUC', 'ZRH', 'CPH'], stopover_cost=20)
+        with redirect_stdout(io.StringIO()):
+            itinerary.get_cheapest_route(keep_candidates=True)
+            for rates in ({"CHF": 0.3}, {"CHF": 0.3, "DKK": 0.05}, {"GBP": 0.4}):
+                self.assertIn("United Kingdom" if "GBP" in rates else "Switzerland",
+                              currency_table.update_exchange_rates(rates))
+                route, cost = itinerary.reprice()
+                expected_route, expected_cost = Itinerary(self.test_atlas, currency_table, airport_list, 'BAE146',
+                                                          2909, hubs=['MUC', 'ZRH', 'CPH'],
+                                                          stopover_cost=20).get_cheapest_route("kernel")
+                self.assertEqual(route.get_airport_codes(), expected_route.get_airport_codes())
+                self.assertAlmostEqual(cost, expected_cost, places=6)
+                if "GBP" not in rates:
+                    # only the routes through the hubs in Switzerland and Denmark are priced again
+                    self.assertLess(itinerary.search_statistics["routes priced again"],
+                                    len(list(itinerary.iter_feasible_routes())))
+
+    def test_a_roster_only_reprices_the_itineraries_in_the_countries(self):
+        currency_table = CurrencyTable(real_exch_rates=False)
+        with tempfile.TemporaryDirectory() as directory:
+            itinerary_file = os.path.join(directory, "itineraries.csv")
+            with open(itinerary_file, "wt") as f:
+                f.write("DUB,LHR,JFK,777\nBOS,DFW,ORD,737\nDUB,JFK,LHR,777\nDUB,SYD,BAE146\n")
+            rosters = [ItineraryRoster(self.test_atlas, currency_table, self.test_aircraft_catalog, itinerary_file,
+                                       os.path.join(directory, "bestroutes.csv"), False) for _ in range(2)]
+        with redirect_stdout(io.StringIO()):
+            rosters[0].get_cheapest_routes()
+            # the two itineraries through London have the same signature, so they are only priced once
+            self.assertEqual(rosters[0].reprice(currency_table.update_exchange_rates({"GBP": 0.1})), 1)
+            rosters[1].get_cheapest_routes()
+        for itinerary, expected_itinerary in zip(*[roster.itinerary_list for roster in rosters]):
+            self.assertEqual(itinerary.get_solution()[:2], expected_itinerary.get_solution()[:2])
+
+    def test_a_roster_can_keep_the_routes_when_it_is_solved(self):
+        currency_table = CurrencyTable(real_exch_rates=False)
+        with tempfile.TemporaryDirectory() as directory:
+            itinerary_file = os.path.join(directory, "itineraries.csv")
+            with open(itinerary_file, "wt") as f:
+                f.write("DUB,LHR,CDG,AMS,FRA,BAE146\n")
+            roster = ItineraryRoster(self.test_atlas, currency_table, self.test_aircraft_catalog, itinerary_file,
+                                     os.path.join(directory, "bestroutes.csv"), False, hubs=['MUC', 'ZRH'])
+        with redirect_stdout(io.StringIO()):
+            roster.get_cheapest_routes(keep_candidates=True)
+            roster.reprice(currency_table.update_exchange_rates({"CHF": 0.3}))
+        itinerary = roster.itinerary_list[0]
+        # only the routes through Zurich are priced, even the first time
+        self.assertLess(itinerary.search_statistics["routes priced again"],
+                        len(list(itinerary.iter_feasible_routes())))
+
+    def test_routes_that_cannot_be_kept_are_not_tried_again(self):
+        currency_table = CurrencyTable(real_exch_rates=False)
+        itinerary = Itinerary(self.test_atlas, currency_table, ['DUB', 'LHR', 'CDG'], '777', 15610, hubs=['MUC'])
+        with redirect_stdout(io.StringIO()), \
+                unittest.mock.patch("Itinerary.CandidateRoutes", side_effect=TooManyCandidateRoutesError) as kept:
+            itinerary.get_cheapest_route(keep_candidates=True)
+            for rate in (0.5, 0.6):
+                currency_table.update_exchange_rates({"GBP": rate})
+                route, cost = itinerary.reprice()
+            expected_route, expected_cost = Itinerary(self.test_atlas, currency_table, ['DUB', 'LHR', 'CDG'], '777',
+                                                      15610, hubs=['MUC']).get_cheapest_route()
+        self.assertEqual(kept.call_count, 1)
+        self.assertEqual(route.get_airport_codes(), expected_route.get_airport_codes())
+
+
+class TestResultCache(unittest.TestCase):
+    test_atlas = AirportAtlas('input files/airport.csv')
+    test_aircraft_catalog = AircraftCatalog('input files/aircraft.csv')
+    test_currency_table = CurrencyTable(real_exch_rates=False)
+    itineraries = ("DUB,LHR,JFK,777\n"
+                   "DUB,CDG,AMS,747\n"
+                   "DUB,JFK,LHR,777\n"
+                   "DUB,ZZZ,777,\n"
+                   "DUB,LHR,JFK,777\n")
+
+    def get_itinerary(self, airport_list, stopover_cost=0):
+        return Itinerary(self.test_atlas, self.test_currency_table, airport_list, '777', 15000, False, ['MHP'],
+                         stopover_cost, [['JFK', 'LHR']])
+
+    def test_signature_ignores_the_order_of_the_other_airports(self):
+        signature = self.get_itinerary(['DUB', 'LHR', 'JFK', 'CDG']).get_signature()
+        self.assertEqual(self.get_itinerary(['DUB', 'CDG', 'JFK', 'LHR']).get_signature(), signature)
+        self.assertNotEqual(self.get_itinerary(['LHR', 'DUB', 'JFK', 'CDG']).get_signature(), signature)
+        self.assertNotEqual(self.get_itinerary(['DUB', 'LHR', 'JFK', 'CDG'], 100).get_signature(), signature)
+
+    def test_duplicate_itineraries_in_a_roster_are_solved_once(self):
+        with tempfile.TemporaryDirectory() as directory:
+            itinerary_file = os.path.join(directory, "itineraries.csv")
+            with open(itinerary_file, "wt") as f:
+                f.write(self.itineraries)
+            for streaming, workers in ((False, 1), (False, 2), (True, 1), (True, 2)):
+                roster = ItineraryRoster(self.test_atlas, self.test_currency_table, self.test_aircraft_catalog,
+                                         itinerary_file, os.path.join(directory, "bestroutes.csv"), False,
+                                         streaming=streaming)
+                console_output = io.StringIO()
+                with redirect_stdout(console_output):
+                    if streaming:
+                        roster.stream_cheapest_routes(workers, batch_size=3)
+                    else:
+                        roster.get_cheapest_routes(workers)
+                        roster.write_to_csv()
+                self.assertEqual(console_output.getvalue().count("Found in the result cache"), 2)
+                with open(os.path.join(directory, "bestroutes.csv")) as f:
+                    rows = list(csv.reader(f))
+                self.assertEqual(rows[3][:4], rows[1][:4])
+                self.assertEqual(rows[5], rows[1])
+
+    def test_results_are_kept_in_the_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "results.sqlite")
+            itinerary = self.get_itinerary(['DUB', 'LHR', 'JFK'])
+            itinerary.get_cheapest_route(result_cache=ResultCache(filename=filename))
+            result_cache = ResultCache(filename=filename)
+            cached_itinerary = self.get_itinerary(['DUB', 'JFK', 'LHR'])
+            route, cost = cached_itinerary.get_cheapest_route(result_cache=result_cache)
+            self.assertEqual(result_cache.hits, 1)
+            self.assertEqual(route.get_airport_codes(), itinerary.cheapest_route.get_airport_codes())
+            self.assertEqual(cost, itinerary.lowest_cost)
+
+    def test_results_stored_in_a_batch_are_committed_together(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "results.sqlite")
+            result_cache = ResultCache(filename=filename)
+            with result_cache.batched_commits():
+                for i in range(3):
+                    result_cache.store_result(["signature", i], (["DUB", "LHR"], None, {}))
+                self.assertFalse(ResultCache(filename=filename).has_result(["signature", 0]))
+            self.assertTrue(ResultCache(filename=filename).has_result(["signature", 2]))
+            result_cache.store_result(["signature", 3], (["DUB", "LHR"], None, {}))
+            self.assertTrue(ResultCache(filename=filename).has_result(["signature", 3]))
+            result_cache.close()
+
+
+class TestSolverSession(unittest.TestCase):
+    def test_data_is_kept_until_an_input_file_changes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            files = []
+            for filename in ('airport.csv', 'aircraft.csv', 'countrycurrency.csv', 'currencyrates.csv'):
+                shutil.copy(os.path.join('input files', filename), directory)
+                files.append(os.path.join(directory, filename))
+            session = SolverSession(*files, real_exch_rates=False,
+                                    rate_cache_file=os.path.join(directory, 'rates.sqlite'))
+            airport_atlas = session.get_airport_atlas()
+            currency_table = session.get_currency_table()
+            itinerary = session.solve_itinerary('DUB', ['LHR', 'JFK'], '777')
+            self.assertIsNone(itinerary.get_error_message())
+            self.assertIs(session.get_airport_atlas(), airport_atlas)
+            self.assertIs(airport_atlas.get_distance_matrix(['DUB', 'LHR', 'JFK']), itinerary.get_distance_matrix())
+
+            with open(files[3], 'at') as f:
+                f.write("Pound Sterling,GBP,2.0,0.5\n")
+            self.assertIsNot(session.get_currency_table(), currency_table)
+            self.assertEqual(session.get_currency_table().get_exchange_rate('United Kingdom'), 2.0)
+            self.assertIs(session.get_airport_atlas(), airport_atlas)
+
+            session.invalidate(files[0])
+            self.assertIsNot(session.get_airport_atlas(), airport_atlas)
+            del airport_atlas, itinerary, session              # unmap the snapshots before they are deleted
+
+
+class TestQuotingService(unittest.TestCase):
+    def setUp(self):
+        self.service = QuotingService(SolverSession(real_exch_rates=False), workers=1, port=0)
+        self.loop = asyncio.new_event_loop()
+        self.loop.run_until_complete(self.service.start())
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        asyncio.run_coroutine_threadsafe(self.service.stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    def request(self, path, data=None):
+        url = "http://127.0.0.1:" + str(self.service.port) + path
+        request = urllib.request.Request(url, None if data is None else json.dumps(data).encode("utf8"))
+        try:
+            with urllib.request.urlopen(request, timeout=30) as f:
+                return f.status, json.load(f)
+        except HTTPError as error:
+            return error.code, json.load(error)
+
+    def test_quotes_match_the_routes_found_by_itinerary(self):
+        itinerary = SolverSession(real_exch_rates=False).solve_itinerary('DUB', ['LHR', 'JFK'], '777', hubs=['MHP'])
+        status, reply = self.request("/quote", {"home": "dub", "airports": ["LHR", "JFK"], "aircraft": "777",
+                                                "hubs": ["MHP"]})
+        self.assertEqual(status, 200)
+        self.assertEqual(reply["csv_row"], itinerary.cheapest_route.make_csv_row())
+
+        status, reply = self.request("/roster", {"itineraries": [{"home": "DUB", "airports": ["ZZZ"],
+                                                                  "aircraft": "777"},
+                                                                 {"home": "DUB", "airports": ["LHR", "JFK"],
+                                                                  "aircraft": "777", "hubs": ["MHP"]}]})
+        self.assertEqual(status, 200)
+        self.assertIn("ZZZ", reply["results"][0]["error"])
+        self.assertEqual(reply["results"][1]["csv_row"], itinerary.cheapest_route.make_csv_row())
+
+    def test_invalid_requests_and_metrics(self):
+        self.assertEqual(self.request("/quote", {"home": "DUB", "aircraft": "777"})[0], 400)
+        self.assertEqual(self.request("/quote", {"home": "DUB", "airports": ["ZZZ"], "aircraft": "777"})[0], 422)
+        self.assertEqual(self.request("/unknown")[0], 404)
+        status, metrics = self.request("/metrics")
+        self.assertEqual(metrics["/quote"]["requests"], 2)
+        self.assertEqual(metrics["/quote"]["errors"], 2)
+        self.assertGreater(metrics["/quote"]["max_ms"], 0)
+
+    def test_empty_or_one_airport_constraints_are_refused(self):
+        for constraints in ([[]], [["DUB"]], [["JFK", "LHR"], ["JFK"]], ["JFK"]):
+            status, reply = self.request("/quote", {"home": "DUB", "airports": ["LHR", "JFK"], "aircraft": "777",
+                                                    "constraints": constraints})
+            self.assertEqual(status, 400, constraints)
+        status, reply = self.request("/quote", {"home": "DUB", "airports": ["LHR", "JFK"], "aircraft": "777",
+                                                "constraints": [["JFK", "LHR"]]})
+        self.assertEqual(status, 200)
+
+    def send_headers(self, headers):
+        with socket.create_connection(("127.0.0.1", self.service.port), timeout=30) as connection:
+            connection.sendall(("POST /quote HTTP/1.1\r\nHost: localhost\r\n" + headers + "\r\n").encode("latin-1"))
+            return connection.makefile("rb").readline().split()[1]
+
+    def test_invalid_request_headers_are_answered_and_counted(self):
+        self.assertEqual(self.send_headers("Content-Length: ten\r\n"), b"400")
+        self.assertEqual(self.send_headers("Content-Length: -5\r\n"), b"400")
+        self.assertEqual(self.send_headers("Content-Length: 99999999\r\n"), b"413")
+        status, metrics = self.request("/metrics")
+        self.assertEqual(metrics["/quote"]["requests"], 3)
+        self.assertEqual(metrics["/quote"]["errors"], 3)
+
+    def test_oversized_or_too_many_headers_are_answered_and_counted(self):
+        self.assertEqual(self.send_headers("X-Padding: " + "a" * 70000 + "\r\n"), b"431")
+        self.assertEqual(self.send_headers("".join("X-Header-%d: 1\r\n" % i for i in range(200))), b"431")
+        self.assertEqual(self.send_headers("".join("X-Header-%d: 1\r\n" % i for i in range(50))
+                                           + "Content-Length: 0\r\n"), b"400")
+        status, metrics = self.request("/metrics")
+        self.assertEqual(metrics["/quote"]["requests"], 3)
+        self.assertEqual(metrics["/quote"]["errors"], 3)
+
+
+class TestCommandLine(unittest.TestCase):
+    def run_command_line(self, *arguments):
+        output = io.StringIO()
+        with redirect_stdout(output), redirect_stderr(io.StringIO()):
+            exit_code = command_line.main(list(arguments) + ["--no-real-time-rates", "--no-date-time", "--json"])
+        return exit_code, json.loads(output.getvalue())
+
+    def test_exit_codes_and_results(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output_file = os.path.join(directory, "bestroutes.csv")
+            exit_code, result = self.run_command_line("single", "DUB", "LHR", "JFK", "--aircraft", "777",
+                                                      "--hubs", "MHP", "--output", output_file)
+            self.assertEqual(exit_code, command_line.EXIT_SUCCESS)
+            self.assertEqual(result["results"][0]["route"], ["DUB", "JFK", "MHP", "LHR"])
+            self.assertTrue(os.path.exists(output_file))
+            exit_code, result = self.run_command_line("single", "DUB", "ZZZ", "--aircraft", "777",
+                                                      "--output", output_file)
+            self.assertEqual(exit_code, command_line.EXIT_ROUTE_NOT_FOUND)
+            exit_code, result = self.run_command_line("single", "DUB", "LHR", "--aircraft", "XYZ9",
+                                                      "--output", output_file)
+            self.assertEqual(exit_code, command_line.EXIT_INVALID_INPUT)
+            self.assertEqual(result["error"]["title"], "Invalid aircraft code")
+            exit_code, result = self.run_command_line("roster", os.path.join(directory, "missing.csv"),
+                                                      "--output", output_file)
+            self.assertEqual(exit_code, command_line.EXIT_FILE_ERROR)
+            self.assertEqual(result["status"], "file_error")
+
+    def test_invalid_inputs_raise_an_error(self):
+        with self.assertRaises(InvalidInputError):
+            validate_inputs_for_single_itinerary([], "ten", [], "DUB", ["LHR"], "777")
+        with self.assertRaises(InvalidInputError):
+            validate_inputs_for_single_itinerary([], "0", [], "DUBLIN", ["LHR"], "777")
+
+    def test_tkinter_is_not_imported(self):
+        check = "import sys, command_line, main; sys.exit('tkinter' in sys.modules)"
+        self.assertEqual(subprocess.run([sys.executable, "-c", check]).returncode, 0)
+
+
 if __name__ == '__main__':
     unittest.main()
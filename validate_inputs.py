@@ -1,28 +1,58 @@
-from tkinter import messagebox
+"""
+Checks the inputs typed into the GUI (or given on the command line) before any itineraries are managed.
+
+Invalid inputs raise an InvalidInputError, whose title and message say what is wrong.  The GUI shows them in a
+dialog box and the command line prints them, so this module doesn't depend on tkinter.
+"""
+
+
+class InvalidInputError(Exception):
+    def __init__(self, title, message):
+        Exception.__init__(self, title + ": " + message.replace("\n", " "))
+        self.title = title
+        self.message = message
+
+
+class InputFileError(InvalidInputError):
+    """ Raised when an input file can't be read. """
+    pass
+
 
 def validate_inputs_for_single_itinerary(hubs, stopover_cost, constraints_list, home_airport, other_airports, aircraft_code):
+    hubs, stopover_cost, list_of_constraints, home_airport, other_airports = \
+        validate_itinerary(hubs, stopover_cost, constraints_list, home_airport, other_airports)
+    validate_aircraft_code(aircraft_code)
+    return hubs, stopover_cost, list_of_constraints, home_airport, other_airports, aircraft_code
+
+
+def validate_inputs_for_fleet(hubs, stopover_cost, constraints_list, home_airport, other_airports, aircraft_codes):
+    hubs, stopover_cost, list_of_constraints, home_airport, other_airports = \
+        validate_itinerary(hubs, stopover_cost, constraints_list, home_airport, other_airports)
+    for aircraft_code in aircraft_codes:
+        validate_aircraft_code(aircraft_code)
+    return hubs, stopover_cost, list_of_constraints, home_airport, other_airports, aircraft_codes
+
+
+def validate_itinerary(hubs, stopover_cost, constraints_list, home_airport, other_airports):
 
     # verify that each hub is a potential airport code
     for i in hubs:
         if len(i) != 3:
             title = "Invalid airport code"
             message = "Invalid hub: " + str(i) + "\nAn airport code should have three characters"
-            messagebox.showerror(title, message)
-            return None
+            raise InvalidInputError(title, message)
         elif not i.isalnum():
             title = "Invalid airport code"
             message = "Invalid hub: " + str(i) + "\nAn airport code should only contain letters and numbers"
-            messagebox.showerror(title, message)
-            return None
+            raise InvalidInputError(title, message)
 
     # verify that stopover_cost is a number
     try:
         stopover_cost = float(stopover_cost)
-    except TypeError:
+    except (TypeError, ValueError):
         title = "Invalid amount"
         message = "Invalid stopover cost: " + str(stopover_cost) + "\nPlease enter a number"
-        messagebox.showerror(title, message)
-        return None
+        raise InvalidInputError(title, message)
 
     # verify that each item in the constraints field is an airport code or separator
     for i in constraints_list:
@@ -31,8 +61,7 @@ def validate_inputs_for_single_itinerary(hubs, stopover_cost, constraints_list,
             message = "Invalid constraint: " + str(i) + \
                       "\nEach constraint should consist of three-letter airport codes separated by spaces" \
                       "\nTo enter more than one constraint, use ' / ' to separate them"
-            messagebox.showerror(title, message)
-            return None
+            raise InvalidInputError(title, message)
 
     # split constraints string into a list of lists, each list being one constraint
     list_of_constraints = []
@@ -51,37 +80,35 @@ def validate_inputs_for_single_itinerary(hubs, stopover_cost, constraints_list,
     if len(home_airport) != 3:
         title = "Invalid airport code"
         message = "Invalid home airport: " + str(home_airport) + "\nAn airport code should have three characters"
-        messagebox.showerror(title, message)
-        return None
+        raise InvalidInputError(title, message)
     elif not home_airport.isalnum():
         title = "Invalid airport code"
         message = "Invalid home airport: " + str(home_airport) + \
                   "\nAn airport code should only contain letters and numbers"
-        messagebox.showerror(title, message)
-        return None
+        raise InvalidInputError(title, message)
 
     # verify that each non-home is a potential airport code
     for i in other_airports:
         if len(i) != 3:
             title = "Invalid airport code"
             message = "Invalid airport: " + str(i) + "\nAn airport code should have three characters"
-            messagebox.showerror(title, message)
-            return None
+            raise InvalidInputError(title, message)
         elif not i.isalnum():
             title = "Invalid airport code"
             message = "Invalid airport code: " + str(i) + "\nAn airport code should only contain letters and numbers"
-            messagebox.showerror(title, message)
-            return None
+            raise InvalidInputError(title, message)
+
+    return hubs, stopover_cost, list_of_constraints, home_airport, other_airports
+
+
+def validate_aircraft_code(aircraft_code):
 
     # verify that aircraft_code makes sense
     if not aircraft_code.isalnum():
         title = "Invalid aircraft code"
         message = "Invalid aircraft code: " + str(aircraft_code) + \
                   "\nAn aircraft code should contain only letters and numbers"
-        messagebox.showerror(title, message)
-        return None
-
-    return hubs, stopover_cost, list_of_constraints, home_airport, other_airports, aircraft_code
+        raise InvalidInputError(title, message)
 
 
 def validate_inputs_for_list_of_itineraries(hubs, stopover_cost):
@@ -91,21 +118,18 @@ def validate_inputs_for_list_of_itineraries(hubs, stopover_cost):
         if len(i) != 3:
             title = "Invalid airport code"
             message = "Invalid hub: " + str(i) + "\nAn airport code should have three characters"
-            messagebox.showerror(title, message)
-            return None
+            raise InvalidInputError(title, message)
         elif not i.isalnum():
             title = "Invalid airport code"
             message = "Invalid hub: " + str(i) + "\nAn airport code should only contain letters and numbers"
-            messagebox.showerror(title, message)
-            return None
+            raise InvalidInputError(title, message)
 
     # verify that stopover_cost is a number
     try:
         stopover_cost = float(stopover_cost)
-    except TypeError:
+    except (TypeError, ValueError):
         title = "Invalid amount"
         message = "Invalid stopover cost: " + str(stopover_cost) + "\nPlease enter a number"
-        messagebox.showerror(title, message)
-        return None
+        raise InvalidInputError(title, message)
 
     return hubs, stopover_cost